@@ -0,0 +1,169 @@
+"""Webex Teams Archiver Compression Benchmark.
+
+Copyright (c) 2018-2021 Cisco and/or its affiliates.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+from run_benchmark import REPO_ROOT, _revision
+
+WORDS = ("budget", "release", "meeting", "deploy", "review", "customer", "forecast", "ticket", "the", "a",
+         "is", "on", "for", "we", "should", "tomorrow", "after", "build", "failed", "approved")
+
+
+def build_folder(folder: str, size: int, image_ratio: float, seed: int) -> dict:
+    """
+    Fills `folder` like an archive folder of about `size` bytes: transcripts, attachments and avatars.
+
+    Images (random bytes, as incompressible as JPEGs) make up `image_ratio` of the
+    attachment bytes, the rest being text-like documents.
+
+    Returns:
+        Bytes written by kind.
+    """
+
+    rng = random.Random(seed)
+    written = {"transcripts": 0, "images": 0, "documents": 0, "avatars": 0}
+
+    os.makedirs(os.path.join(folder, "attachments"))
+    os.makedirs(os.path.join(folder, "avatars"))
+
+    transcript = _text(rng, size // 20)
+    for name in ("Room.html", "Room.txt", "Room.json"):
+        with open(os.path.join(folder, name), "w", encoding="utf-8") as fh:
+            fh.write(transcript)
+        written["transcripts"] += len(transcript)
+
+    for number in range(50):
+        avatar = os.urandom(8 * 1024)
+        with open(os.path.join(folder, "avatars", f"PERSON_{number}"), "wb") as fh:
+            fh.write(avatar)
+        written["avatars"] += len(avatar)
+
+    number = 0
+    while sum(written.values()) < size:
+        file_size = int(2 ** rng.uniform(14, 24))
+        if rng.random() < image_ratio:
+            name, data, kind = f"image_{number}.jpg", os.urandom(file_size), "images"
+        else:
+            name, data, kind = f"document_{number}.pdf", _text(rng, file_size).encode(), "documents"
+
+        with open(os.path.join(folder, "attachments", name), "wb") as fh:
+            fh.write(data)
+        written[kind] += len(data)
+        number += 1
+
+    return written
+
+
+def _text(rng: random.Random, size: int) -> str:
+    # A vocabulary small enough to compress like chat transcripts, shuffled so it is not trivial.
+    block = " ".join(rng.choice(WORDS) for _ in range(20000)) + "\n"
+    return (block * (size // len(block) + 1))[:size]
+
+
+def compress_once(method: str, folder: str, workers: int) -> tuple:
+    """Compresses `folder` with `method` and returns the seconds taken and the archive size."""
+
+    from webexteamsarchiver.compression import compress_folder
+
+    start = time.perf_counter()
+    if method == "make_archive":
+        filename = shutil.make_archive(folder, "gztar", folder)
+    else:
+        filename = compress_folder(folder, method, workers)
+    seconds = time.perf_counter() - start
+
+    size = os.path.getsize(filename)
+    os.remove(filename)
+    return seconds, size
+
+
+def main(argv: list = None) -> dict:
+    parser = argparse.ArgumentParser(description="Measures archive compression throughput in MB/s.")
+    parser.add_argument("--size", type=int, default=500, help="archive folder size in MB (default 500)")
+    parser.add_argument("--image-ratio", type=float, default=0.7,
+                        help="fraction of attachment bytes that are images (default 0.7)")
+    parser.add_argument("--workers", type=int, default=None, help="compression threads (default number of CPUs)")
+    parser.add_argument("--formats", nargs="+", default=["make_archive", "gztar", "zstd", "zip"],
+                        help="make_archive (shutil.make_archive gztar, the baseline) and file_formats to "
+                             "compress with (default %(default)s)")
+    parser.add_argument("--repeat", type=int, default=3, help="number of runs per format (default 3)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed (default 0)")
+    parser.add_argument("--package-path", default=REPO_ROOT,
+                        help="folder holding the webexteamsarchiver package to benchmark (default this checkout)")
+    parser.add_argument("--output", default="compression_results.json", help="results file (default %(default)s)")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, os.path.abspath(args.package_path))
+
+    work_dir = tempfile.mkdtemp(prefix="webexteamsarchiver-compression-")
+    try:
+        folder = os.path.join(work_dir, "Room")
+        written = build_folder(folder, args.size * 1024 * 1024, args.image_ratio, args.seed)
+        total = sum(written.values())
+        print(f"archive folder: {total / 2 ** 20:.1f} MB, "
+              + ", ".join(f"{kind} {size / 2 ** 20:.1f} MB" for kind, size in written.items()))
+
+        results = {}
+        print(f"{'format':14}{'MB/s':>10}{'seconds':>10}{'ratio':>8}")
+        for method in args.formats:
+            runs = [compress_once(method, folder, args.workers) for _ in range(args.repeat)]
+            seconds = statistics.median(run[0] for run in runs)
+            results[method] = {
+                "seconds": [round(run[0], 3) for run in runs],
+                "mb_per_second": round(total / 2 ** 20 / seconds, 1),
+                "archive_bytes": runs[0][1],
+                "ratio": round(runs[0][1] / total, 3),
+            }
+            print(f"{method:14}{results[method]['mb_per_second']:>10.1f}{seconds:>10.2f}"
+                  f"{results[method]['ratio']:>8.3f}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    output = {
+        "created": datetime.datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "revision": _revision(args.package_path),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "scenario": {"size_mb": args.size, "image_ratio": args.image_ratio, "workers": args.workers,
+                     "seed": args.seed},
+        "folder_bytes": written,
+        "results": results,
+    }
+
+    with open(args.output, "w", encoding="utf-8") as fh:
+        json.dump(output, fh, indent=2)
+    print(f"Results written to {args.output}")
+
+    return output
+
+
+if __name__ == "__main__":
+    main()
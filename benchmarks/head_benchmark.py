@@ -0,0 +1,103 @@
+"""Webex Teams Archiver attachment details benchmark.
+
+Copyright (c) 2018-2021 Cisco and/or its affiliates.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import sys
+import time
+
+from mock_api import MockWebexAPI
+from room_generator import generate_room
+from run_benchmark import REPO_ROOT, _revision
+
+
+def probe_once(urls: list, workers: int) -> float:
+    """Retrieves the details of every file in `urls`, `workers` HEAD requests at a time. Returns the seconds."""
+
+    from webexteamsarchiver import WebexTeamsArchiver
+
+    archiver = WebexTeamsArchiver("benchmark-token")
+    archiver._reset_room_information()
+    archiver._journal = None
+    archiver._resize_session_pool(workers)
+
+    start = time.perf_counter()
+    archiver._probe_attachments(urls, workers)
+    seconds = time.perf_counter() - start
+
+    if len(archiver.attachments) != len(urls) or any(f.deleted for f in archiver.attachments.values()):
+        raise RuntimeError("The details of some files could not be retrieved")
+
+    return seconds
+
+
+def main(argv: list = None) -> dict:
+    parser = argparse.ArgumentParser(description="Measures attachment HEAD requests per second by number of workers.")
+    parser.add_argument("--files", type=int, default=1000, help="number of attachments (default 1000)")
+    parser.add_argument("--latency", type=float, default=0.02,
+                        help="seconds added to every request by the mock API (default 0.02)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32],
+                        help="numbers of concurrent requests to measure (default %(default)s)")
+    parser.add_argument("--package-path", default=REPO_ROOT,
+                        help="folder holding the webexteamsarchiver package to benchmark (default this checkout)")
+    parser.add_argument("--output", default="head_results.json", help="results file (default %(default)s)")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, os.path.abspath(args.package_path))
+
+    # A message with an attachment each, every URL unique.
+    synthetic_room = generate_room(messages=args.files, people=1, thread_ratio=0, attachment_ratio=1,
+                                   attachment_size=(1024, 1024), avatars=False)
+
+    results = {}
+    with MockWebexAPI(synthetic_room, latency=args.latency) as mock_api:
+        urls = [mock_api.base_url + path for path in synthetic_room.attachments]
+
+        print(f"{'workers':>8}{'HEAD/s':>10}{'seconds':>10}{'speedup':>10}")
+        for workers in args.workers:
+            seconds = probe_once(urls, workers)
+            results[workers] = {"seconds": round(seconds, 3), "requests_per_second": round(len(urls) / seconds, 1)}
+            speedup = results[args.workers[0]]["seconds"] / seconds
+            print(f"{workers:>8}{len(urls) / seconds:>10.1f}{seconds:>10.2f}{speedup:>10.1f}")
+
+        api_calls = dict(mock_api.calls)
+
+    output = {
+        "created": datetime.datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "revision": _revision(args.package_path),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scenario": {"files": args.files, "latency": args.latency},
+        "mock_api_calls": api_calls,
+        "results": results,
+    }
+
+    with open(args.output, "w", encoding="utf-8") as fh:
+        json.dump(output, fh, indent=2)
+    print(f"Results written to {args.output}")
+
+    return output
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Webex Teams Archiver transcript memory benchmark.
+
+Copyright (c) 2018-2021 Cisco and/or its affiliates.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import tracemalloc
+
+from render_benchmark import TIMESTAMP_FORMAT, load_room
+from room_generator import generate_room
+from run_benchmark import REPO_ROOT, _revision
+
+MODES = ("render", "stream")
+
+
+def write_transcripts(archiver, render_model, mode: str) -> None:
+    """
+    Writes the HTML and text transcripts, with the archiver's streaming methods for "stream", or
+    like they were before, each rendered into one string and then written, for "render".
+    """
+
+    if mode == "stream":
+        archiver._create_html_transcript(render_model, TIMESTAMP_FORMAT)
+        archiver._create_text_transcript(render_model, TIMESTAMP_FORMAT)
+        return
+
+    from webexteamsarchiver.jinja_env import get_env
+
+    for template_name, extension in (("default.html", "html"), ("default.txt", "txt")):
+        transcript = get_env().get_template(template_name).render(
+            room=archiver.room,
+            room_creator=archiver.room_creator,
+            messages=render_model,
+            timestamp_format=TIMESTAMP_FORMAT,
+        )
+        with open(os.path.join(archiver.archive_folder_name, f"{archiver.archive_folder_name}.{extension}"),
+                  "w", encoding="utf-8") as fh:
+            fh.write(transcript)
+
+
+def measure_once(synthetic_room, mode: str) -> dict:
+    """Writes the transcripts of `synthetic_room` once. Returns the peak memory they took and their size."""
+
+    from webexteamsarchiver.records import ReversedView
+
+    archiver = load_room(synthetic_room)
+
+    cwd = os.getcwd()
+    work_dir = tempfile.mkdtemp(prefix="webexteamsarchiver-memory-")
+    os.chdir(work_dir)
+    try:
+        os.makedirs(archiver.archive_folder_name)
+        archiver._organize_by_threads(archiver.messages)
+        render_model = archiver._build_render_model(ReversedView(archiver.messages), False, TIMESTAMP_FORMAT)
+
+        # Only what is allocated while writing the transcripts is counted, not the room itself.
+        tracemalloc.start()
+        write_transcripts(archiver, render_model, mode)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        size = sum(entry.stat().st_size for entry in os.scandir(archiver.archive_folder_name))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {"peak_bytes": peak, "transcript_bytes": size}
+
+
+def main(argv: list = None) -> dict:
+    parser = argparse.ArgumentParser(description="Measures the peak memory of writing the transcripts of a large room.")
+    parser.add_argument("--messages", type=int, default=500000, help="number of messages (default 500000)")
+    parser.add_argument("--people", type=int, default=500, help="number of people (default 500)")
+    parser.add_argument("--thread-ratio", type=float, default=0.3, help="fraction of replies (default 0.3)")
+    parser.add_argument("--attachment-ratio", type=float, default=0.05,
+                        help="fraction of messages with an attachment (default 0.05)")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES),
+                        help="ways of writing the transcripts to measure (default %(default)s)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed (default 0)")
+    parser.add_argument("--package-path", default=REPO_ROOT,
+                        help="folder holding the webexteamsarchiver package to benchmark (default this checkout)")
+    parser.add_argument("--output", default="memory_results.json", help="results file (default %(default)s)")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, os.path.abspath(args.package_path))
+
+    scenario = {"messages": args.messages, "people": args.people, "thread_ratio": args.thread_ratio,
+                "attachment_ratio": args.attachment_ratio, "seed": args.seed}
+    synthetic_room = generate_room(**scenario, room_id="BENCHMARK_ROOM")
+
+    results = {}
+    print(f"{'mode':>8}{'peak MB':>10}{'transcripts MB':>16}")
+    for mode in args.modes:
+        results[mode] = measure_once(synthetic_room, mode)
+        print(f"{mode:>8}{results[mode]['peak_bytes'] / 2 ** 20:>10.1f}"
+              f"{results[mode]['transcript_bytes'] / 2 ** 20:>16.1f}")
+
+    if "render" in results and "stream" in results:
+        saved = results["render"]["peak_bytes"] - results["stream"]["peak_bytes"]
+        print(f"streaming saves {saved / 2 ** 20:.1f} MB of peak memory")
+
+    output = {
+        "created": datetime.datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "revision": _revision(args.package_path),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scenario": scenario,
+        "results": results,
+    }
+
+    with open(args.output, "w", encoding="utf-8") as fh:
+        json.dump(output, fh, indent=2)
+    print(f"Results written to {args.output}")
+
+    return output
+
+
+if __name__ == "__main__":
+    main()
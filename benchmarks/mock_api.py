@@ -0,0 +1,276 @@
+"""Local Mock of the Webex Teams API.
+
+Copyright (c) 2018-2021 Cisco and/or its affiliates.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import json
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+from room_generator import SyntheticRoom
+
+__all__ = ['MockWebexAPI']
+
+# Bytes attachments and avatars are made of, repeated up to their size.
+BODY_BLOCK = bytes(range(256)) * 256
+
+AVATAR_SIZE = 4096
+
+
+class MockWebexAPI:
+    """
+    Serves a SyntheticRoom over HTTP the way the Webex Teams API does: the rooms, people
+    and messages endpoints, with Link header pagination, and the attachment and avatar
+    files, with HEAD and Range support.
+
+    Use it as a context manager and point the SDK at `base_url`:
+    `WebexTeamsAPI(token, base_url=api.base_url)`.
+
+    Args:
+        room: Room to serve.
+        latency: Seconds every request waits before it is answered.
+        page_size: Maximum number of messages per page.
+        rate_limit_every: Answer every Nth request with a 429, 0 to never do so.
+        retry_after: Retry-After header of the 429 responses, in seconds.
+    """
+
+    def __init__(self, room: SyntheticRoom, latency: float = 0.0, page_size: int = 50,
+                 rate_limit_every: int = 0, retry_after: int = 1) -> None:
+        self.room = room
+        self.latency = latency
+        self.page_size = page_size
+        self.rate_limit_every = rate_limit_every
+        self.retry_after = retry_after
+
+        # Requests served, by endpoint, plus "rate_limited" for the 429s: {"endpoint": count}
+        self.calls = Counter()
+
+        self._requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self._server.daemon_threads = True
+        self._server.api = self
+        self._thread = None
+
+        host, port = self._server.server_address
+        self.base_url = f"http://{host}:{port}/v1/"
+
+        # Responses reference files by absolute URL.
+        self._messages = [self._absolute(msg) for msg in room.messages]
+        self._message_index = {msg["id"]: index for index, msg in enumerate(self._messages)}
+        self._people = {person_id: self._absolute(person) for person_id, person in room.people.items()}
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _absolute(self, item: dict) -> dict:
+        item = dict(item)
+        if item.get("files"):
+            item["files"] = [self.base_url + path for path in item["files"]]
+        if item.get("avatar"):
+            item["avatar"] = self.base_url + item["avatar"]
+        return item
+
+    def _rate_limited(self) -> bool:
+        """Counts the request and tells whether it gets a 429."""
+
+        with self._lock:
+            self._requests += 1
+            limited = bool(self.rate_limit_every) and self._requests % self.rate_limit_every == 0
+            if limited:
+                self.calls["rate_limited"] += 1
+            return limited
+
+    def _count(self, endpoint: str) -> None:
+        with self._lock:
+            self.calls[endpoint] += 1
+
+    def route(self, path: str, query: dict) -> tuple:
+        """
+        Answers an API request.
+
+        Returns:
+            Status code, JSON body and extra headers.
+        """
+
+        parts = path.split("/")
+
+        if parts[0] == "rooms" and len(parts) == 2:
+            self._count("rooms.get")
+            if parts[1] != self.room.room["id"]:
+                return 404, {"message": "Room not found"}, {}
+            return 200, self.room.room, {}
+
+        if parts[0] == "people" and parts[1:] == ["me"]:
+            self._count("people.me")
+            return 200, {"id": "BENCHMARK_USER", "emails": ["benchmark@example.com"],
+                         "displayName": "Benchmark", "type": "person"}, {}
+
+        if parts[0] == "people" and len(parts) == 2:
+            self._count("people.get")
+            if parts[1] not in self._people:
+                return 404, {"message": "Person not found"}, {}
+            return 200, self._people[parts[1]], {}
+
+        if parts[0] == "messages" and len(parts) == 1:
+            self._count("messages.list")
+            return self._messages_page(query)
+
+        return 404, {"message": "Not found"}, {}
+
+    def _messages_page(self, query: dict) -> tuple:
+        if query.get("roomId") != self.room.room["id"]:
+            return 404, {"message": "Room not found"}, {}
+
+        if "cursor" in query:
+            start = int(query["cursor"])
+        elif "beforeMessage" in query:
+            start = self._message_index.get(query["beforeMessage"], len(self._messages) - 1) + 1
+        elif "before" in query:
+            start = self._first_before(query["before"])
+        else:
+            start = 0
+
+        size = min(int(query.get("max", self.page_size)), self.page_size)
+        end = start + size
+
+        headers = {}
+        if end < len(self._messages):
+            next_query = {key: value for key, value in query.items() if key not in ("before", "beforeMessage")}
+            next_query["cursor"] = end
+            headers["Link"] = f'<{self.base_url}messages?{urlencode(next_query)}>; rel="next"'
+
+        return 200, {"items": self._messages[start:end]}, headers
+
+    def _first_before(self, before: str) -> int:
+        """Index of the newest message created before `before`. Messages are newest first."""
+
+        low, high = 0, len(self._messages)
+        while low < high:
+            middle = (low + high) // 2
+            if self._messages[middle]["created"] < before:
+                high = middle
+            else:
+                low = middle + 1
+        return low
+
+    def file(self, path: str) -> tuple:
+        """Returns the file name, content type and size of an attachment or avatar, or None."""
+
+        if path.startswith("avatars/") and path[len("avatars/"):] in self._people:
+            return f"{path[len('avatars/'):]}.png", "image/png", AVATAR_SIZE
+
+        attachment = self.room.attachments.get(path)
+        return tuple(attachment) if attachment else None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # headers and body go out as separate writes
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        self._handle(send_body=True)
+
+    def do_HEAD(self) -> None:
+        self._handle(send_body=False)
+
+    def _handle(self, send_body: bool) -> None:
+        api = self.server.api
+        url = urlsplit(self.path)
+        path = url.path[len("/v1/"):] if url.path.startswith("/v1/") else url.path.lstrip("/")
+
+        if api.latency:
+            time.sleep(api.latency)
+
+        if api._rate_limited():
+            self._send_json(429, {"message": "Too many requests"}, {"Retry-After": str(api.retry_after)}, send_body)
+            return
+
+        if path.startswith(("contents/", "avatars/")):
+            self._send_file(api, path, send_body)
+            return
+
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        status, body, headers = api.route(path, query)
+        self._send_json(status, body, headers, send_body)
+
+    def _send_json(self, status: int, body: dict, headers: dict, send_body: bool) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+
+        if send_body:
+            self.wfile.write(data)
+
+    def _send_file(self, api: MockWebexAPI, path: str, send_body: bool) -> None:
+        api._count(f"files.{self.command.lower()}")
+
+        details = api.file(path)
+        if not details:
+            self._send_json(404, {"message": "File not found"}, {}, send_body)
+            return
+
+        filename, content_type, size = details
+        start, end = 0, size - 1
+
+        range_match = re.match(r"bytes=(\d+)-(\d*)$", self.headers.get("Range", ""))
+        if range_match and self.command == "GET":
+            start = int(range_match.group(1))
+            end = min(int(range_match.group(2)), size - 1) if range_match.group(2) else size - 1
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        else:
+            self.send_response(200)
+
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Disposition", f'attachment; filename="{filename}"')
+        self.send_header("Content-Length", str(end + 1 - start))
+        self.end_headers()
+
+        if not send_body:
+            return
+
+        position = start
+        while position <= end:
+            offset = position % len(BODY_BLOCK)
+            chunk = BODY_BLOCK[offset:offset + end + 1 - position]
+            self.wfile.write(chunk)
+            position += len(chunk)
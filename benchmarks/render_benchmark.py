@@ -0,0 +1,154 @@
+"""Webex Teams Archiver transcript rendering benchmark.
+
+Copyright (c) 2018-2021 Cisco and/or its affiliates.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+from room_generator import generate_room
+from run_benchmark import REPO_ROOT, _revision
+
+STAGES = ("threads", "render_model", "html", "text")
+
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+
+def load_room(synthetic_room):
+    """Returns an archiver holding `synthetic_room` as if it had just been retrieved from the API."""
+
+    from webexteamssdk.models.immutable import Person, Room
+    from webexteamsarchiver import WebexTeamsArchiver
+    from webexteamsarchiver.records import MessageRecord
+    from webexteamsarchiver.webexteamsarchiver import File
+
+    archiver = WebexTeamsArchiver("benchmark-token")
+    archiver._reset_room_information()
+    archiver.room = Room(synthetic_room.room)
+    archiver.room_creator = Person(synthetic_room.people[synthetic_room.room["creatorId"]])
+    archiver.people = {person_id: Person(person) for person_id, person in synthetic_room.people.items()}
+    archiver.attachments = {
+        url: File(f'attachment; filename="{f.filename}"', str(f.size), f.content_type, f.filename, False)
+        for url, f in synthetic_room.attachments.items()
+    }
+    archiver.messages = [MessageRecord(msg) for msg in synthetic_room.messages]
+    archiver.archive_folder_name = "Room"
+    archiver._archive_writer = None
+    return archiver
+
+
+def render_once(synthetic_room) -> dict:
+    """Builds the threads and renders the HTML and text transcripts once. Returns the seconds per stage."""
+
+    from webexteamsarchiver.records import ReversedView
+
+    archiver = load_room(synthetic_room)
+    seconds = {}
+
+    cwd = os.getcwd()
+    work_dir = tempfile.mkdtemp(prefix="webexteamsarchiver-render-")
+    os.chdir(work_dir)
+    try:
+        os.makedirs(archiver.archive_folder_name)
+
+        start = time.perf_counter()
+        archiver._organize_by_threads(archiver.messages)
+        seconds["threads"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        render_model = archiver._build_render_model(ReversedView(archiver.messages), False, TIMESTAMP_FORMAT)
+        seconds["render_model"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        archiver._create_html_transcript(render_model, TIMESTAMP_FORMAT)
+        seconds["html"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        archiver._create_text_transcript(render_model, TIMESTAMP_FORMAT)
+        seconds["text"] = time.perf_counter() - start
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return seconds
+
+
+def main(argv: list = None) -> dict:
+    parser = argparse.ArgumentParser(description="Times thread building and transcript rendering of a large room.")
+    parser.add_argument("--messages", type=int, default=100000, help="number of messages (default 100000)")
+    parser.add_argument("--people", type=int, default=200, help="number of people (default 200)")
+    parser.add_argument("--thread-ratio", type=float, default=0.999, help="fraction of replies (default 0.999)")
+    parser.add_argument("--thread-depth", type=int, default=10000,
+                        help="maximum replies per thread (default 10000)")
+    parser.add_argument("--attachment-ratio", type=float, default=0.02,
+                        help="fraction of messages with an attachment (default 0.02)")
+    parser.add_argument("--repeat", type=int, default=3, help="number of runs (default 3)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed (default 0)")
+    parser.add_argument("--package-path", default=REPO_ROOT,
+                        help="folder holding the webexteamsarchiver package to benchmark (default this checkout)")
+    parser.add_argument("--output", default="render_results.json", help="results file (default %(default)s)")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, os.path.abspath(args.package_path))
+
+    scenario = {"messages": args.messages, "people": args.people, "thread_ratio": args.thread_ratio,
+                "thread_depth": args.thread_depth, "attachment_ratio": args.attachment_ratio, "seed": args.seed}
+    synthetic_room = generate_room(**scenario, room_id="BENCHMARK_ROOM")
+
+    replies = sum(1 for msg in synthetic_room.messages if "parentId" in msg)
+    threads = len({msg["parentId"] for msg in synthetic_room.messages if "parentId" in msg})
+    print(f"room: {args.messages} messages, {replies} replies in {threads} threads, "
+          f"{replies / threads if threads else 0:.0f} replies per thread on average")
+
+    runs = []
+    for number in range(args.repeat):
+        runs.append(render_once(synthetic_room))
+        print(f"run {number + 1}/{args.repeat}: " + ", ".join(f"{stage} {runs[-1][stage]:.2f}s" for stage in STAGES))
+
+    stages = {stage: round(statistics.median(run[stage] for run in runs), 3) for stage in STAGES}
+    total = sum(stages.values())
+    print(f"median: {total:.2f}s, {args.messages / total:,.0f} messages/s")
+
+    output = {
+        "created": datetime.datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "revision": _revision(args.package_path),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scenario": scenario,
+        "runs": [{stage: round(seconds, 3) for stage, seconds in run.items()} for run in runs],
+        "stages": stages,
+        "messages_per_second": round(args.messages / total),
+    }
+
+    with open(args.output, "w", encoding="utf-8") as fh:
+        json.dump(output, fh, indent=2)
+    print(f"Results written to {args.output}")
+
+    return output
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Synthetic Webex Teams Room Generator.
+
+Copyright (c) 2018-2021 Cisco and/or its affiliates.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import datetime
+import math
+import random
+from collections import namedtuple
+
+__all__ = ['SyntheticRoom', 'Attachment', 'generate_room']
+
+# Room as the mock API serves it. `messages` are newest first, like the messages endpoint
+# returns them, and attachment URLs are relative to the mock API's base URL.
+SyntheticRoom = namedtuple("SyntheticRoom", "room people messages attachments")
+
+Attachment = namedtuple("Attachment", "filename content_type size")
+
+WORDS = (
+    "budget release meeting review deploy customer roadmap design issue fix update build "
+    "schedule demo draft forecast team partner launch feedback question answer thanks today "
+    "tomorrow please check link report numbers slides call notes agenda priority"
+).split()
+
+ATTACHMENT_TYPES = (
+    ("png", "image/png"),
+    ("jpg", "image/jpeg"),
+    ("pdf", "application/pdf"),
+    ("docx", "application/vnd.openxmlformats-officedocument.wordprocessingml.document"),
+    ("zip", "application/zip"),
+)
+
+
+def generate_room(messages: int = 1000, people: int = 20, thread_ratio: float = 0.2, thread_depth: int = 5,
+                  attachment_ratio: float = 0.05, attachment_size: tuple = (10 * 1024, 5 * 1024 * 1024),
+                  image_ratio: float = 0.5, avatars: bool = True, seed: int = 0,
+                  room_id: str = "BENCHMARK_ROOM") -> SyntheticRoom:
+    """
+    Generates a room with the same random content for the same arguments.
+
+    Args:
+        messages: Number of messages, replies included.
+        people: Number of people posting in the room.
+        thread_ratio: Fraction of the messages that are replies.
+        thread_depth: Maximum number of replies in a thread.
+        attachment_ratio: Fraction of the messages with an attachment.
+        attachment_size: Smallest and largest attachment size in bytes. Sizes are
+                         spread evenly on a log scale in between.
+        image_ratio: Fraction of the attachments that are images.
+        avatars: Give every person an avatar.
+        seed: Random seed.
+        room_id: ID of the room.
+    """
+
+    rng = random.Random(seed)
+    created = datetime.datetime(2020, 1, 1, 9, 0, 0)
+
+    person_list = [
+        {
+            "id": f"PERSON_{index}",
+            "emails": [f"person{index}@example.com"],
+            "displayName": f"Person {index}",
+            "avatar": f"avatars/PERSON_{index}" if avatars else None,
+            "type": "person",
+            "created": "2019-01-01T00:00:00.000Z",
+        }
+        for index in range(people)
+    ]
+
+    room = {
+        "id": room_id,
+        "title": "Benchmark Room",
+        "type": "group",
+        "isLocked": False,
+        "creatorId": person_list[0]["id"],
+        "created": "2019-12-31T09:00:00.000Z",
+    }
+
+    attachments = {}
+    chronological = []
+
+    # Threads that can still take replies: [parent message, replies so far]
+    open_threads = []
+
+    min_size, max_size = attachment_size
+    for index in range(messages):
+        created += datetime.timedelta(seconds=rng.randint(1, 600))
+        author = rng.choice(person_list)
+
+        msg = {
+            "id": f"MESSAGE_{index}",
+            "roomId": room_id,
+            "roomType": "group",
+            "text": " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 40))),
+            "personId": author["id"],
+            "personEmail": author["emails"][0],
+            "created": f"{created.strftime('%Y-%m-%dT%H:%M:%S')}.000Z",
+        }
+
+        if open_threads and rng.random() < thread_ratio:
+            thread = rng.choice(open_threads[-20:])
+            msg["parentId"] = thread[0]["id"]
+            thread[1] += 1
+            if thread[1] >= thread_depth:
+                open_threads.remove(thread)
+        else:
+            open_threads.append([msg, 0])
+            del open_threads[:-100]
+
+        if rng.random() < attachment_ratio:
+            if rng.random() < image_ratio:
+                extension, content_type = rng.choice(ATTACHMENT_TYPES[:2])
+            else:
+                extension, content_type = rng.choice(ATTACHMENT_TYPES[2:])
+
+            path = f"contents/FILE_{index}"
+            size = int(math.exp(rng.uniform(math.log(min_size), math.log(max_size))))
+            attachments[path] = Attachment(f"file_{index}.{extension}", content_type, size)
+            msg["files"] = [path]
+
+        chronological.append(msg)
+
+    if chronological:
+        room["lastActivity"] = chronological[-1]["created"]
+
+    return SyntheticRoom(room, {person["id"]: person for person in person_list},
+                         chronological[::-1], attachments)
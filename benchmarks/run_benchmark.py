@@ -0,0 +1,249 @@
+"""Webex Teams Archiver Benchmark.
+
+Copyright (c) 2018-2021 Cisco and/or its affiliates.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import argparse
+import concurrent.futures
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from mock_api import MockWebexAPI
+from room_generator import generate_room
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def archive_once(package_path: str, base_url: str, room_id: str, options: dict, use_async: bool) -> dict:
+    """
+    Archives the room served at `base_url` once, in a temporary folder that is deleted afterwards.
+    Runs in a process of its own, so its peak RSS is the archiver's alone.
+    """
+
+    sys.path.insert(0, package_path)
+    from webexteamssdk import WebexTeamsAPI
+    from webexteamsarchiver import WebexTeamsArchiver
+
+    archiver = WebexTeamsArchiver("benchmark-token")
+    archiver.sdk = WebexTeamsAPI("benchmark-token", base_url=base_url)
+
+    cwd = os.getcwd()
+    work_dir = tempfile.mkdtemp(prefix="webexteamsarchiver-benchmark-")
+    os.chdir(work_dir)
+    try:
+        baseline_rss = _peak_rss()
+        start = time.perf_counter()
+        if use_async:
+            import asyncio
+            filename = asyncio.run(archiver.archive_room_async(room_id, **options))
+        else:
+            filename = archiver.archive_room(room_id, **options)
+        seconds = time.perf_counter() - start
+
+        result = {
+            "seconds": round(seconds, 3),
+            "peak_rss_bytes": _peak_rss(),
+            "baseline_rss_bytes": baseline_rss,
+            "output_bytes": _size(filename),
+        }
+
+        # Versions before run metrics only count API calls.
+        metrics = getattr(archiver, "metrics", None)
+        if metrics:
+            result.update(metrics.to_dict())
+        else:
+            result["api_calls"] = dict(getattr(archiver, "api_calls", {}))
+
+        return result
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def _peak_rss() -> int:
+    """Peak resident set size of this process in bytes, None where the resource module is missing."""
+
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _size(path: str) -> int:
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(path) for name in files)
+
+
+def _revision(path: str) -> str:
+    try:
+        return subprocess.check_output(["git", "describe", "--always", "--dirty"], cwd=path,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _option(value: str) -> tuple:
+    """Parses KEY=VALUE, VALUE being JSON or else a plain string."""
+
+    key, _, value = value.partition("=")
+    try:
+        return key, json.loads(value)
+    except ValueError:
+        return key, value
+
+
+def _summary(runs: list) -> dict:
+    seconds = [run["seconds"] for run in runs]
+    stages = {}
+    for run in runs:
+        for stage, stage_seconds in run.get("stages", {}).items():
+            stages.setdefault(stage, []).append(stage_seconds)
+
+    peaks = [run["peak_rss_bytes"] for run in runs if run["peak_rss_bytes"] is not None]
+    return {
+        "seconds": {"min": min(seconds), "median": statistics.median(seconds), "max": max(seconds)},
+        "stages": {stage: round(statistics.median(values), 3) for stage, values in stages.items()},
+        "peak_rss_bytes": max(peaks) if peaks else None,
+    }
+
+
+def _print_comparison(summary: dict, baseline: dict) -> None:
+    rows = [("total", baseline["seconds"]["median"], summary["seconds"]["median"])]
+    rows += [(stage, baseline["stages"].get(stage), seconds) for stage, seconds in summary["stages"].items()]
+
+    print(f"{'seconds':16}{'baseline':>12}{'current':>12}{'change':>10}")
+    for name, before, after in rows:
+        if before:
+            print(f"{name:16}{before:>12.3f}{after:>12.3f}{(after - before) / before:>+10.1%}")
+        else:
+            print(f"{name:16}{'-':>12}{after:>12.3f}")
+
+    if baseline["peak_rss_bytes"] and summary["peak_rss_bytes"]:
+        before, after = baseline["peak_rss_bytes"], summary["peak_rss_bytes"]
+        print(f"{'peak rss MB':16}{before / 2 ** 20:>12.1f}{after / 2 ** 20:>12.1f}{(after - before) / before:>+10.1%}")
+
+
+def main(argv: list = None) -> dict:
+    parser = argparse.ArgumentParser(description="Times archive_room against a local mock of the Webex Teams API.")
+    room = parser.add_argument_group("room")
+    room.add_argument("--messages", type=int, default=10000, help="number of messages (default 10000)")
+    room.add_argument("--people", type=int, default=50, help="number of people (default 50)")
+    room.add_argument("--thread-ratio", type=float, default=0.2, help="fraction of replies (default 0.2)")
+    room.add_argument("--thread-depth", type=int, default=5, help="maximum replies per thread (default 5)")
+    room.add_argument("--attachment-ratio", type=float, default=0.05,
+                      help="fraction of messages with an attachment (default 0.05)")
+    room.add_argument("--attachment-size", type=int, nargs=2, default=[10 * 1024, 5 * 1024 * 1024],
+                      metavar=("MIN", "MAX"), help="attachment size range in bytes (default 10 KB to 5 MB)")
+    room.add_argument("--image-ratio", type=float, default=0.5, help="fraction of image attachments (default 0.5)")
+    room.add_argument("--no-avatars", action="store_true", help="people have no avatars")
+    room.add_argument("--seed", type=int, default=0, help="random seed (default 0)")
+
+    api = parser.add_argument_group("mock API")
+    api.add_argument("--latency", type=float, default=0.0, help="seconds added to every request (default 0)")
+    api.add_argument("--page-size", type=int, default=50, help="maximum messages per page (default 50)")
+    api.add_argument("--rate-limit-every", type=int, default=0, help="answer every Nth request with a 429")
+    api.add_argument("--retry-after", type=int, default=1, help="Retry-After of the 429s in seconds (default 1)")
+
+    run = parser.add_argument_group("run")
+    run.add_argument("--option", type=_option, action="append", default=[], metavar="KEY=VALUE",
+                     help="archive_room argument or option, VALUE as JSON, e.g. html_pages=1000 (repeatable)")
+    run.add_argument("--async", dest="use_async", action="store_true", help="benchmark archive_room_async")
+    run.add_argument("--repeat", type=int, default=3, help="number of runs (default 3)")
+    run.add_argument("--package-path", default=REPO_ROOT,
+                     help="folder holding the webexteamsarchiver package to benchmark (default this checkout)")
+    run.add_argument("--output", default="benchmark_results.json", help="results file (default %(default)s)")
+    run.add_argument("--compare", metavar="RESULTS", help="results file of an earlier run to compare with")
+    args = parser.parse_args(argv)
+
+    scenario = {
+        "room": {
+            "messages": args.messages,
+            "people": args.people,
+            "thread_ratio": args.thread_ratio,
+            "thread_depth": args.thread_depth,
+            "attachment_ratio": args.attachment_ratio,
+            "attachment_size": args.attachment_size,
+            "image_ratio": args.image_ratio,
+            "avatars": not args.no_avatars,
+            "seed": args.seed,
+        },
+        "api": {
+            "latency": args.latency,
+            "page_size": args.page_size,
+            "rate_limit_every": args.rate_limit_every,
+            "retry_after": args.retry_after,
+        },
+        "options": dict(args.option),
+        "async": args.use_async,
+    }
+
+    synthetic_room = generate_room(**{**scenario["room"], "attachment_size": tuple(args.attachment_size)})
+    runs = []
+
+    with MockWebexAPI(synthetic_room, **scenario["api"]) as mock_api:
+        for number in range(args.repeat):
+            # A fresh process per run, so every run starts cold and has its own peak RSS.
+            with concurrent.futures.ProcessPoolExecutor(
+                    max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+                result = executor.submit(archive_once, os.path.abspath(args.package_path), mock_api.base_url,
+                                         synthetic_room.room["id"], scenario["options"], args.use_async).result()
+
+            runs.append(result)
+            print(f"run {number + 1}/{args.repeat}: {result['seconds']:.2f}s, "
+                  f"peak RSS {(result['peak_rss_bytes'] or 0) / 2 ** 20:.1f} MB")
+
+        api_calls = dict(mock_api.calls)
+
+    results = {
+        "created": datetime.datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "revision": _revision(args.package_path),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scenario": scenario,
+        "mock_api_calls": api_calls,
+        "runs": runs,
+        "summary": _summary(runs),
+    }
+
+    with open(args.output, "w", encoding="utf-8") as fh:
+        json.dump(results, fh, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as fh:
+            _print_comparison(results["summary"], json.load(fh)["summary"])
+
+    return results
+
+
+if __name__ == "__main__":
+    main()
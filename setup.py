@@ -26,9 +26,11 @@ PACKAGE_CLASSIFIERS = [
     'Natural Language :: English',
     'License :: OSI Approved :: MIT License',
     'Programming Language :: Python :: 3',
-    'Programming Language :: Python :: 3.5',
-    'Programming Language :: Python :: 3.6',
     'Programming Language :: Python :: 3.7',
+    'Programming Language :: Python :: 3.8',
+    'Programming Language :: Python :: 3.9',
+    'Programming Language :: Python :: 3.10',
+    'Programming Language :: Python :: 3.11',
     'Topic :: Communications',
     'Topic :: Communications :: Chat'
 ]
@@ -41,6 +43,11 @@ INSTALLATION_REQUIREMENTS = [
     'bump2version',
 ]
 
+EXTRAS_REQUIREMENTS = {
+    'async': ['aiohttp'],
+    'zstd': ['zstandard'],
+}
+
 long_description = open(
     os.path.join(
         os.path.dirname(__file__),
@@ -58,7 +65,9 @@ setup(
     long_description=long_description,
     packages=find_packages('.'),
     include_package_data=True,
+    python_requires='>=3.7',
     install_requires=INSTALLATION_REQUIREMENTS,
+    extras_require=EXTRAS_REQUIREMENTS,
     keywords=' '.join(PACKAGE_KEYWORDS),
     classifiers=PACKAGE_CLASSIFIERS,
     license='MIT; Copyright (c) 2018 Cisco Systems, Inc.'
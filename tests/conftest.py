@@ -0,0 +1,130 @@
+"""Webex Teams Archiver test fixtures.
+
+Copyright (c) 2018-2021 Cisco and/or its affiliates.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import os
+import re
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+
+class FileServer(ThreadingHTTPServer):
+    """
+    Serves `content` at every path, with Range support, and misbehaves on request.
+
+    Attributes:
+        content: Bytes of the file.
+        ranges: Whether Range requests are honored. Without, the whole file is sent with a 200.
+        drop_after: Number of bytes after which responses are cut off, closing the connection.
+        drops: Number of responses cut off after `drop_after` bytes.
+        statuses: Statuses answered, with an error page, before the file itself is served.
+                  None serves the file in between.
+        retry_after: Retry-After header sent with those statuses.
+        content_length: Whether Content-Length is sent. Without, the connection is closed
+                        after the body.
+        requests: Range header of every request received, None for none.
+    """
+
+    daemon_threads = True
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), _FileHandler)
+        self.content = b""
+        self.ranges = True
+        self.drop_after = None
+        self.drops = 1
+        self.statuses = []
+        self.retry_after = None
+        self.content_length = True
+        self.requests = []
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/file"
+
+
+class _FileHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        server = self.server
+        with server._lock:
+            server.requests.append(self.headers.get("Range"))
+            status = server.statuses.pop(0) if server.statuses else None
+            drop = not status and server.drop_after is not None and server.drops > 0
+            if drop:
+                server.drops -= 1
+
+        if status:
+            self.send_response(status)
+            if server.retry_after is not None:
+                self.send_header("Retry-After", str(server.retry_after))
+            self._send_body(f"<html>Error {status}</html>".encode())
+            return
+
+        start, end = 0, len(server.content) - 1
+        match = re.fullmatch(r"bytes=(\d+)-(\d*)", self.headers.get("Range") or "")
+        if match and server.ranges:
+            start = int(match.group(1))
+            end = min(int(match.group(2)), end) if match.group(2) else end
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(server.content)}")
+        else:
+            self.send_response(200)
+
+        body = server.content[start:end + 1]
+        if drop:
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body[:server.drop_after])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+
+        self._send_body(body)
+
+    def _send_body(self, body: bytes) -> None:
+        if self.server.content_length:
+            self.send_header("Content-Length", str(len(body)))
+        else:
+            self.send_header("Connection", "close")
+            self.close_connection = True
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def file_server():
+    server = FileServer()
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
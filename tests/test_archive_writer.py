@@ -0,0 +1,152 @@
+"""Tests of the direct-to-archive writer.
+
+Copyright (c) 2018-2021 Cisco and/or its affiliates.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import concurrent.futures
+import io
+import os
+import tarfile
+import zipfile
+
+import pytest
+
+from webexteamsarchiver import archive_writer
+from webexteamsarchiver.archive_writer import ArchiveWriter, TarStreamWriter
+
+SPOOL_MAX_SIZE = 1024
+
+FILES = {
+    "small.txt": b"small file",
+    "empty.bin": b"",
+    "attachments/large.png": os.urandom(3 * SPOOL_MAX_SIZE + 7),
+    "attachments/larger.bin": os.urandom(10 * SPOOL_MAX_SIZE),
+}
+
+
+@pytest.fixture(autouse=True)
+def spool_max_size(monkeypatch):
+    monkeypatch.setattr(archive_writer, "SPOOL_MAX_SIZE", SPOOL_MAX_SIZE)
+
+
+def _extract(filename: str) -> dict:
+    """Returns {"arcname": bytes} of the files in the archive."""
+
+    if filename.endswith(".zip"):
+        with zipfile.ZipFile(filename) as archive:
+            assert archive.testzip() is None
+            return {info.filename: archive.read(info) for info in archive.infolist() if not info.is_dir()}
+
+    with tarfile.open(filename) as archive:
+        return {member.name: archive.extractfile(member).read() for member in archive if member.isfile()}
+
+
+@pytest.mark.parametrize("file_format", ["tar", "gztar", "zip", "bztar", "xztar"])
+def test_round_trip(tmp_path, file_format):
+    static = tmp_path / "static" / "css"
+    static.mkdir(parents=True)
+    (static / "style.css").write_bytes(b"body {}")
+
+    writer = ArchiveWriter(str(tmp_path / "Room"), file_format)
+    writer.add(str(tmp_path / "static"), "static")
+
+    def write(arcname: str) -> None:
+        with writer.open(arcname, size=len(FILES[arcname])) as fh:
+            for start in range(0, len(FILES[arcname]), 1000):
+                fh.write(FILES[arcname][start:start + 1000])
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(write, FILES))
+    with writer.open("transcript.txt", text=True) as fh:
+        fh.write("Héllo")
+
+    filename = writer.close()
+
+    assert filename == str(tmp_path / f"Room{archive_writer.ARCHIVE_EXTENSIONS[file_format]}")
+    assert _extract(filename) == {**FILES, "static/css/style.css": b"body {}", "transcript.txt": "Héllo".encode()}
+
+
+@pytest.mark.parametrize("file_format", ["tar", "zip"])
+def test_streamed_size_mismatch(tmp_path, file_format):
+    writer = ArchiveWriter(str(tmp_path / "Room"), file_format)
+
+    with pytest.raises(IOError, match="Wrote 2048 bytes of large.bin into the archive, expected 2049"):
+        with writer.open("large.bin", size=2049) as fh:
+            fh.write(b"x" * 2048)
+
+    writer.discard()
+    assert not os.path.exists(writer.filename)
+
+
+def test_streams():
+    assert ArchiveWriter.streams(SPOOL_MAX_SIZE + 1)
+    assert not ArchiveWriter.streams(SPOOL_MAX_SIZE)
+    assert not ArchiveWriter.streams(None)
+
+
+def test_tar_stream_writer():
+    fh = io.BytesIO()
+    tar = TarStreamWriter(fh)
+
+    tarinfo = tarfile.TarInfo("a.txt")
+    tarinfo.size = 5
+    with tar.open_member(tarinfo) as member:
+        assert not member.seekable()
+        member.write(b"ab")
+        member.write(b"cde")
+        assert member.tell() == 5
+
+    tarinfo = tarfile.TarInfo("b.bin")
+    tarinfo.size = tarfile.BLOCKSIZE
+    tar.addfile(tarinfo, io.BytesIO(b"\1" * tarfile.BLOCKSIZE))
+    tar.close()
+
+    assert len(fh.getvalue()) % tarfile.RECORDSIZE == 0
+    fh.seek(0)
+    with tarfile.open(fileobj=fh) as archive:
+        assert archive.getnames() == ["a.txt", "b.bin"]
+        assert archive.extractfile("a.txt").read() == b"abcde"
+        assert archive.extractfile("b.bin").read() == b"\1" * tarfile.BLOCKSIZE
+
+
+def test_tar_stream_writer_add_folder(tmp_path):
+    (tmp_path / "folder" / "sub").mkdir(parents=True)
+    (tmp_path / "folder" / "b.txt").write_bytes(b"b")
+    (tmp_path / "folder" / "sub" / "a.txt").write_bytes(b"a")
+    os.chmod(tmp_path / "folder" / "b.txt", 0o600)
+
+    fh = io.BytesIO()
+    names = []
+    tar = TarStreamWriter(fh, filter=lambda tarinfo: names.append(tarinfo.name) or tarinfo)
+    tar.add(str(tmp_path / "folder"), "folder")
+    tar.close()
+
+    assert names == ["folder", "folder/b.txt", "folder/sub", "folder/sub/a.txt"]
+    fh.seek(0)
+    with tarfile.open(fileobj=fh) as archive:
+        assert archive.getmember("folder").isdir()
+        assert archive.getmember("folder/b.txt").mode == 0o600
+        assert archive.extractfile("folder/sub/a.txt").read() == b"a"
+
+
+def test_tar_stream_writer_size_mismatch():
+    tarinfo = tarfile.TarInfo("a.txt")
+    tarinfo.size = 5
+
+    with pytest.raises(IOError, match="Wrote 6 bytes of a.txt into the archive, expected 5"):
+        TarStreamWriter(io.BytesIO()).addfile(tarinfo, io.BytesIO(b"abcdef"))
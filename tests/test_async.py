@@ -0,0 +1,118 @@
+"""Tests of the asyncio pipeline of archive_room_async.
+
+Copyright (c) 2018-2021 Cisco and/or its affiliates.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import asyncio
+import os
+import sys
+
+import pytest
+from webexteamssdk import WebexTeamsAPI
+
+from webexteamsarchiver import WebexTeamsArchiver
+
+pytest.importorskip("aiohttp")
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "benchmarks"))
+from mock_api import MockWebexAPI  # noqa: E402
+from room_generator import generate_room  # noqa: E402
+
+
+def _tree(folder: str) -> dict:
+    """Returns {"relative path": bytes} of the files under `folder`, with its name replaced by FOLDER."""
+
+    name = os.path.basename(folder)
+    tree = {}
+    for root, _, files in os.walk(folder):
+        for filename in files:
+            path = os.path.join(root, filename)
+            with open(path, "rb") as fh:
+                tree[os.path.relpath(path, folder).replace(name, "FOLDER")] = fh.read().replace(
+                    name.encode(), b"FOLDER")
+    return tree
+
+
+@pytest.fixture
+def api():
+    room = generate_room(messages=300, people=8, thread_ratio=0.2, thread_depth=4, attachment_ratio=0.1,
+                         attachment_size=(100, 50 * 1024), image_ratio=0.5, seed=1, room_id="ROOM")
+    with MockWebexAPI(room, page_size=40) as api:
+        yield api
+
+
+@pytest.mark.parametrize("options", [
+    {},
+    {"reverse_order": False, "html_pages": 50},
+    {"download_attachments": False, "download_avatars": False, "ndjson": True},
+])
+def test_matches_sync_output(api, tmp_path, monkeypatch, options):
+    archiver = WebexTeamsArchiver("token")
+    archiver.sdk = WebexTeamsAPI("token", base_url=api.base_url)
+
+    (tmp_path / "sync").mkdir()
+    (tmp_path / "async").mkdir()
+
+    monkeypatch.chdir(tmp_path / "sync")
+    sync_folder = archiver.archive_room("ROOM", compress_folder=False, **options)
+    monkeypatch.chdir(tmp_path / "async")
+    async_folder = asyncio.run(archiver.archive_room_async("ROOM", compress_folder=False, **options))
+
+    # The second run gets another folder name, the first one being taken in this process.
+    sync_tree, async_tree = _tree(str(tmp_path / "sync" / sync_folder)), _tree(async_folder)
+    assert "space_details.json" in sync_tree
+    assert sorted(sync_tree) == sorted(async_tree)
+    assert [path for path in sync_tree if sync_tree[path] != async_tree[path]] == []
+
+
+def test_failure_stops_pending_requests(tmp_path, monkeypatch):
+    from webexteamsarchiver.async_client import AsyncWebexClient
+
+    pages, request, aexit = AsyncWebexClient.pages, AsyncWebexClient.request, AsyncWebexClient.__aexit__
+    late_requests = []
+
+    async def failing_pages(self, url, **params):
+        # People and files of the first page are being looked up when the second one fails.
+        async for items in pages(self, url, **params):
+            yield items
+            raise ConnectionError("connection reset")
+
+    def recording_request(self, method, url, **kwargs):
+        if self._session.closed:
+            late_requests.append(url)
+        return request(self, method, url, **kwargs)
+
+    async def closing_aexit(self, *exc_info):
+        # Nothing is left running once the client is closed.
+        assert asyncio.all_tasks() == {asyncio.current_task()}
+        await aexit(self, *exc_info)
+
+    monkeypatch.setattr(AsyncWebexClient, "pages", failing_pages)
+    monkeypatch.setattr(AsyncWebexClient, "request", recording_request)
+    monkeypatch.setattr(AsyncWebexClient, "__aexit__", closing_aexit)
+    monkeypatch.chdir(tmp_path)
+    room = generate_room(messages=100, people=20, attachment_ratio=0.3, attachment_size=(100, 1000), room_id="ROOM")
+
+    with MockWebexAPI(room, latency=0.05, page_size=50) as api:
+        archiver = WebexTeamsArchiver("token")
+        archiver.sdk = WebexTeamsAPI("token", base_url=api.base_url)
+        with pytest.raises(ConnectionError, match="connection reset"):
+            asyncio.run(archiver.archive_room_async("ROOM"))
+
+    assert late_requests == []
+    assert os.listdir(str(tmp_path)) == []
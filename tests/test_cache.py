@@ -0,0 +1,165 @@
+"""Tests of the on-disk file cache.
+
+Copyright (c) 2018-2021 Cisco and/or its affiliates.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import os
+import threading
+
+import pytest
+
+from webexteamsarchiver import FileCache
+
+
+def _write(cache: FileCache, key: str, size: int = 10) -> None:
+    with cache.writer(key) as fh:
+        fh.write(key[0].encode() * size)
+
+
+def _cached(cache: FileCache) -> set:
+    return {key for key in cache._entries if os.path.isfile(cache.path(key))}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return FileCache(str(tmp_path / "cache"), max_size=30)
+
+
+def test_write_and_get(cache):
+    assert cache.get("aaaa") is None
+    _write(cache, "aaaa")
+
+    path = cache.get("aaaa")
+
+    assert path == cache.path("aaaa")
+    with open(path, "rb") as fh:
+        assert fh.read() == b"a" * 10
+    assert (cache.hits, cache.misses, cache.size) == (1, 1, 10)
+    assert not [name for name in os.listdir(os.path.dirname(path)) if name.endswith(".tmp")]
+
+
+def test_failed_write_is_not_cached(cache):
+    with pytest.raises(ValueError):
+        with cache.writer("aaaa") as fh:
+            fh.write(b"partial")
+            raise ValueError("download failed")
+
+    assert cache.get("aaaa") is None
+    assert os.listdir(os.path.dirname(cache.path("aaaa"))) == []
+
+
+def test_evicts_least_recently_used(cache):
+    for key in ("aaaa", "bbbb", "cccc"):
+        _write(cache, key)
+    cache.get("aaaa")
+
+    _write(cache, "dddd")
+
+    assert _cached(cache) == {"aaaa", "cccc", "dddd"}
+    assert not os.path.exists(cache.path("bbbb"))
+    assert cache.size == 30
+
+
+def test_keeps_newest_file_beyond_max_size(cache):
+    _write(cache, "aaaa")
+    _write(cache, "bbbb", size=50)
+
+    assert _cached(cache) == {"bbbb"}
+    assert cache.size == 50
+
+
+def test_pinned_file_is_not_evicted(cache):
+    _write(cache, "aaaa")
+
+    with cache.pinned("aaaa") as path:
+        for key in ("bbbb", "cccc", "dddd", "eeee"):
+            _write(cache, key)
+        assert os.path.isfile(path)
+
+    # The least recently used files that were not pinned went instead.
+    assert _cached(cache) == {"aaaa", "dddd", "eeee"}
+
+
+def test_pinned_file_kept_beyond_max_size_is_evicted_on_release(cache):
+    _write(cache, "aaaa")
+
+    with cache.pinned("aaaa"):
+        _write(cache, "bbbb", size=25)
+        assert _cached(cache) == {"aaaa", "bbbb"}
+        assert cache.size == 35
+
+    assert _cached(cache) == {"bbbb"}
+    assert cache.size == 25
+
+
+def test_file_written_while_pinned_is_not_evicted(cache):
+    with cache.pinned("aaaa") as path:
+        assert path is None
+        _write(cache, "aaaa")
+        for key in ("bbbb", "cccc", "dddd"):
+            _write(cache, key)
+        assert os.path.isfile(cache.path("aaaa"))
+
+
+def test_pinned_file_survives_concurrent_eviction(cache):
+    # Another thread fills the cache between the lookup of a file and its copy.
+    _write(cache, "aaaa")
+    looked_up, filled = threading.Event(), threading.Event()
+
+    def fill() -> None:
+        looked_up.wait()
+        for key in ("bbbb", "cccc", "dddd", "eeee", "ffff"):
+            _write(cache, key)
+        filled.set()
+
+    thread = threading.Thread(target=fill)
+    thread.start()
+    with cache.pinned("aaaa") as path:
+        looked_up.set()
+        filled.wait()
+        with open(path, "rb") as fh:
+            assert fh.read() == b"a" * 10
+    thread.join()
+
+    assert cache.size == 30
+
+
+def test_load_existing_files(tmp_path):
+    directory = str(tmp_path / "cache")
+    cache = FileCache(directory, max_size=100)
+    for mtime, key in enumerate(("cccc", "aaaa", "bbbb")):
+        _write(cache, key)
+        os.utime(cache.path(key), (mtime, mtime))
+    os.makedirs(os.path.dirname(cache.path("dddd")))
+    with open(f"{cache.path('dddd')}.1.tmp", "wb") as fh:
+        fh.write(b"d" * 10)
+
+    cache = FileCache(directory, max_size=20)
+
+    # The oldest file is evicted first, files being written are ignored.
+    assert list(cache._entries) == ["aaaa", "bbbb"]
+    assert cache.size == 20
+    assert not os.path.exists(cache.path("cccc"))
+
+
+def test_get_forgets_removed_file(cache):
+    _write(cache, "aaaa")
+    os.remove(cache.path("aaaa"))
+
+    assert cache.get("aaaa") is None
+    assert cache.size == 0
@@ -0,0 +1,170 @@
+"""Tests of the range-based file downloader.
+
+Copyright (c) 2018-2021 Cisco and/or its affiliates.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import io
+import os
+
+import pytest
+import requests
+
+from webexteamsarchiver.downloader import Downloader
+
+CONTENT = os.urandom(100 * 1024 + 123)
+SEGMENT_SIZE = 16 * 1024
+
+
+class _Unseekable(io.BytesIO):
+    def seekable(self) -> bool:
+        return False
+
+
+@pytest.fixture
+def session():
+    with requests.Session() as session:
+        yield session
+
+
+def _downloader(session, segment_size=None) -> Downloader:
+    return Downloader(session, timeout=5, chunk_size=4096, segment_size=segment_size, retries=2, backoff_factor=0)
+
+
+def test_fetch(file_server, session):
+    file_server.content = CONTENT
+    fh = io.BytesIO()
+
+    assert _downloader(session).fetch(file_server.url, fh, str(len(CONTENT))) == len(CONTENT)
+    assert fh.getvalue() == CONTENT
+    assert file_server.requests == [None]
+
+
+def test_fetch_resumes_dropped_connection(file_server, session):
+    file_server.content = CONTENT
+    file_server.drop_after = 30000
+    fh = io.BytesIO()
+
+    assert _downloader(session).fetch(file_server.url, fh, str(len(CONTENT))) == len(CONTENT)
+    assert fh.getvalue() == CONTENT
+    assert file_server.requests[0] is None
+    assert file_server.requests[1].startswith("bytes=") and file_server.requests[1] != "bytes=0-"
+
+
+def test_fetch_resumes_when_server_ignores_range(file_server, session):
+    file_server.content = CONTENT
+    file_server.ranges = False
+    file_server.drop_after = 30000
+    fh = io.BytesIO()
+
+    assert _downloader(session).fetch(file_server.url, fh, str(len(CONTENT))) == len(CONTENT)
+    assert fh.getvalue() == CONTENT
+    assert len(file_server.requests) == 2
+
+
+def test_fetch_gives_up_after_retries(file_server, session):
+    file_server.content = CONTENT
+    file_server.drop_after = 1000
+    file_server.drops = 10
+    downloader = _downloader(session)
+
+    with pytest.raises(requests.exceptions.ChunkedEncodingError):
+        downloader.fetch(file_server.url, io.BytesIO(), str(len(CONTENT)))
+    assert len(file_server.requests) == downloader.retries + 1
+
+
+def test_fetch_size_mismatch(file_server, session):
+    file_server.content = CONTENT
+
+    with pytest.raises(IOError, match=f"Downloaded {len(CONTENT)} bytes of .*, expected {len(CONTENT) + 1}"):
+        _downloader(session).fetch(file_server.url, io.BytesIO(), str(len(CONTENT) + 1))
+
+
+def test_fetch_without_size_skips_check(file_server, session):
+    file_server.content = CONTENT
+
+    assert _downloader(session).fetch(file_server.url, io.BytesIO(), 0) == len(CONTENT)
+
+
+@pytest.mark.parametrize("status", [403, 404])
+def test_fetch_error_status_without_size(file_server, session, status):
+    file_server.content = CONTENT
+    file_server.statuses = [status]
+    file_server.content_length = False
+    fh = io.BytesIO()
+
+    with pytest.raises(requests.HTTPError) as e:
+        _downloader(session).fetch(file_server.url, fh, 0)
+    assert e.value.response.status_code == status
+    assert fh.getvalue() == b""
+
+
+def test_fetch_error_status_while_resuming(file_server, session):
+    file_server.content = CONTENT
+    file_server.drop_after = 30000
+    file_server.statuses = [None, 500]
+    fh = io.BytesIO()
+
+    with pytest.raises(requests.HTTPError) as e:
+        _downloader(session).fetch(file_server.url, fh, str(len(CONTENT)))
+    assert e.value.response.status_code == 500
+    assert CONTENT.startswith(fh.getvalue())
+    assert len(file_server.requests) == 2
+
+
+def test_fetch_segments(file_server, session):
+    file_server.content = CONTENT
+    fh = io.BytesIO()
+
+    assert _downloader(session, SEGMENT_SIZE).fetch(file_server.url, fh, str(len(CONTENT))) == len(CONTENT)
+    assert fh.getvalue() == CONTENT
+    assert fh.tell() == len(CONTENT)
+
+    ranges = sorted(file_server.requests, key=lambda header: int(header[len("bytes="):].split("-")[0]))
+    assert ranges[0] == f"bytes=0-{SEGMENT_SIZE - 1}"
+    assert ranges[-1] == f"bytes={len(CONTENT) // SEGMENT_SIZE * SEGMENT_SIZE}-{len(CONTENT) - 1}"
+    assert len(ranges) == -(-len(CONTENT) // SEGMENT_SIZE)
+
+
+def test_fetch_segments_resume_dropped_segment(file_server, session):
+    file_server.content = CONTENT
+    file_server.drop_after = 8192  # a whole number of chunks, so the first 8192 bytes are kept
+    fh = io.BytesIO()
+
+    assert _downloader(session, SEGMENT_SIZE).fetch(file_server.url, fh, str(len(CONTENT))) == len(CONTENT)
+    assert fh.getvalue() == CONTENT
+    assert f"bytes=8192-{SEGMENT_SIZE - 1}" in file_server.requests
+
+
+def test_fetch_segments_server_ignores_range(file_server, session):
+    file_server.content = CONTENT
+    file_server.ranges = False
+    fh = io.BytesIO()
+
+    assert _downloader(session, SEGMENT_SIZE).fetch(file_server.url, fh, str(len(CONTENT))) == len(CONTENT)
+    assert fh.getvalue() == CONTENT
+    # The first segment finds out, the rest of the file is then fetched in one go.
+    assert file_server.requests == [f"bytes=0-{SEGMENT_SIZE - 1}", f"bytes={SEGMENT_SIZE}-"]
+
+
+def test_fetch_segments_need_seekable_file(file_server, session):
+    file_server.content = CONTENT
+    fh = _Unseekable()
+
+    assert _downloader(session, SEGMENT_SIZE).fetch(file_server.url, fh, str(len(CONTENT))) == len(CONTENT)
+    assert fh.getvalue() == CONTENT
+    assert file_server.requests == [None]
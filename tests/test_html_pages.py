@@ -0,0 +1,112 @@
+"""Tests of the HTML version split into pages.
+
+Copyright (c) 2018-2021 Cisco and/or its affiliates.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import os
+import re
+import sys
+
+import pytest
+from webexteamssdk import WebexTeamsAPI
+
+from webexteamsarchiver import WebexTeamsArchiver
+from webexteamsarchiver.records import MessageRecord
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "benchmarks"))
+from mock_api import MockWebexAPI  # noqa: E402
+from room_generator import generate_room  # noqa: E402
+
+
+def _message(message_id: str, created: str, parent_id: str = None) -> MessageRecord:
+    data = {"id": message_id, "roomId": "ROOM", "created": f"{created}T12:00:00.000Z"}
+    if parent_id:
+        data["parentId"] = parent_id
+    return MessageRecord(data)
+
+
+MESSAGES = [
+    _message("M1", "2021-01-30"),
+    _message("R1", "2021-01-31", "M1"),
+    _message("M2", "2021-01-31"),
+    _message("M3", "2021-02-01"),
+    _message("R3", "2021-03-02", "M3"),
+    _message("M4", "2021-03-01"),
+    _message("M5", "2021-03-03"),
+]
+
+
+def _pages(pages: list) -> list:
+    return [(label, [msg.id for msg in messages]) for label, messages in pages]
+
+
+def test_paginate_by_count():
+    assert _pages(WebexTeamsArchiver._paginate(MESSAGES, 2)) == [
+        ("1", ["M1", "M2"]),
+        ("2", ["M3", "M4"]),
+        ("3", ["M5"]),
+    ]
+    assert _pages(WebexTeamsArchiver._paginate(MESSAGES, 5)) == [("1", ["M1", "M2", "M3", "M4", "M5"])]
+
+
+def test_paginate_by_month():
+    # Replies are left to the page of their thread, whichever month they were sent in.
+    assert _pages(WebexTeamsArchiver._paginate(MESSAGES, "month")) == [
+        ("2021-01", ["M1", "M2"]),
+        ("2021-02", ["M3"]),
+        ("2021-03", ["M4", "M5"]),
+    ]
+
+
+@pytest.mark.parametrize("html_pages", [True, False, 0, -1, 1.5, "week"])
+def test_invalid_html_pages(html_pages):
+    with pytest.raises(ValueError, match="html_pages must be a positive number of messages or \"month\""):
+        WebexTeamsArchiver("token").archive_room("ROOM", html_pages=html_pages)
+
+
+@pytest.fixture
+def api():
+    room = generate_room(messages=200, people=5, thread_ratio=0.2, thread_depth=3, attachment_ratio=0.2,
+                         attachment_size=(100, 1000), image_ratio=0.8, seed=3, room_id="ROOM")
+    with MockWebexAPI(room) as api:
+        yield api
+
+
+@pytest.mark.parametrize("html_pages", [40, "month"])
+@pytest.mark.parametrize("download_attachments", [True, False])
+def test_index(api, tmp_path, monkeypatch, html_pages, download_attachments):
+    monkeypatch.chdir(tmp_path)
+    archiver = WebexTeamsArchiver("token")
+    archiver.sdk = WebexTeamsAPI("token", base_url=api.base_url)
+
+    folder = archiver.archive_room("ROOM", compress_folder=False, text_format=False, json_format=False,
+                                   html_pages=html_pages, download_attachments=download_attachments)
+
+    with open(os.path.join(folder, f"{folder}.html"), encoding="utf-8") as fh:
+        index = fh.read()
+    pages = re.findall(r'<a href="\./([^"]+\.html)">', index)
+    assert pages and all(os.path.isfile(os.path.join(folder, page)) for page in pages)
+    if html_pages == 40:
+        assert len(pages) == -(-sum(1 for msg in archiver.messages if not msg.parentId) // 40)
+
+    images = re.findall(r'<a href="\./(attachments/[^"]+)">', index)
+    assert "<img" not in index
+    if download_attachments:
+        assert images and all(os.path.isfile(os.path.join(folder, image)) for image in images)
+    else:
+        assert images == []
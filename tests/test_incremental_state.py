@@ -0,0 +1,150 @@
+"""Tests of the incremental state file.
+
+Copyright (c) 2018-2021 Cisco and/or its affiliates.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import json
+import os
+
+import pytest
+from webexteamssdk.models.immutable import Person, Room
+
+from webexteamsarchiver import WebexTeamsArchiver
+from webexteamsarchiver.records import MessageRecord
+from webexteamsarchiver.webexteamsarchiver import File, UserApiFailed, UserNotFound
+
+
+def _message(number: int) -> dict:
+    return {"id": f"M{number}", "roomId": "ROOM", "roomType": "group", "text": f"message {number}",
+            "personId": "P1", "personEmail": "someone@example.com", "created": f"2021-01-01T00:00:{number:02}.000Z"}
+
+
+def _archiver(*numbers) -> WebexTeamsArchiver:
+    """Archiver that just fetched the messages `numbers`, newest first."""
+
+    archiver = WebexTeamsArchiver("token")
+    archiver._reset_room_information()
+    archiver.room = Room({"id": "ROOM", "title": "Room"})
+    archiver.archive_folder_name = "Room"
+    archiver.messages = [MessageRecord(_message(number)) for number in numbers]
+    return archiver
+
+
+def _run(archiver: WebexTeamsArchiver, state_file: str, previous_state: dict = None, keep_folder: bool = False):
+    archiver._save_state(state_file, previous_state, download_attachments=True, download_avatars=True,
+                         keep_folder=keep_folder)
+    return archiver._load_state(state_file, "ROOM")
+
+
+def _ids(messages: list) -> list:
+    return [msg.id for msg in messages]
+
+
+@pytest.fixture(autouse=True)
+def cwd(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+
+def test_round_trip(tmp_path):
+    archiver = _archiver(2, 1)
+    archiver.people = {
+        "P1": Person({"id": "P1", "displayName": "Someone", "emails": ["someone@example.com"]}),
+        "P2": UserNotFound(id="P2", emails=["gone@example.com"], displayName="Person Not Found", avatar=None),
+        "P3": UserApiFailed(id="P3", emails=["failed@example.com"], displayName="User API Failed", avatar=None),
+    }
+    archiver.attachments = {
+        "https://files/1": File("attachment; filename=\"a.png\"", "10", "image/png", "a.png", False),
+        "https://files/2": File("", "", "", "deleted", True),
+    }
+    archiver.avatars = {"https://avatars/P1": File("", "5", "image/jpeg", "P1", False)}
+    os.makedirs("Room/attachments")
+
+    state = _run(archiver, "ROOM.state.json", keep_folder=True)
+
+    restored = _archiver()
+    restored._restore_state(state)
+    assert [msg.to_dict() for msg in restored._load_state_messages(state)] == [_message(2), _message(1)]
+    assert restored.people["P1"].to_dict() == archiver.people["P1"].to_dict()
+    # Looked up again next time.
+    assert set(restored.people) == {"P1", "P2"}
+    assert restored.people["P2"] == archiver.people["P2"]
+    assert restored.attachments == archiver.attachments
+    assert restored.previous_downloads == {
+        "attachments": {"https://files/1": os.path.join(str(tmp_path), "Room", "attachments", "a.png")},
+        "avatars": {"https://avatars/P1": os.path.join(str(tmp_path), "Room", "avatars", "P1")},
+    }
+
+
+def test_runs_append_to_messages_file():
+    state = _run(_archiver(2, 1), "ROOM.state.json")
+    state = _run(_archiver(4, 3, 2, 1), "ROOM.state.json", state)
+    state = _run(_archiver(5, 4, 3, 2, 1), "ROOM.state.json", state)
+
+    assert _ids(_archiver()._load_state_messages(state)) == ["M5", "M4", "M3", "M2", "M1"]
+    assert state["message_count"] == 5
+    with open(state["messages_file"], encoding="utf-8") as fh:
+        assert [json.loads(line)["id"] for line in fh] == ["M1", "M2", "M3", "M4", "M5"]
+
+
+def test_ignores_messages_of_failed_run():
+    state = _run(_archiver(2, 1), "ROOM.state.json")
+
+    # A run that appended its messages, then failed before saving its state.
+    with open(state["messages_file"], "a", encoding="utf-8") as fh:
+        fh.write(json.dumps(_message(3)) + "\n")
+    assert _ids(_archiver()._load_state_messages(state)) == ["M2", "M1"]
+
+    # The next run overwrites them.
+    state = _run(_archiver(4, 3, 2, 1), "ROOM.state.json", state)
+    assert _ids(_archiver()._load_state_messages(state)) == ["M4", "M3", "M2", "M1"]
+
+
+def test_state_without_folder_has_no_previous_downloads():
+    archiver = _archiver(1)
+    archiver.attachments = {"https://files/1": File("", "10", "image/png", "a.png", False)}
+
+    state = _run(archiver, "ROOM.state.json")
+
+    restored = _archiver()
+    restored._restore_state(state)
+    assert state["archive_folder"] is None
+    assert restored.previous_downloads == {}
+
+
+def test_old_state_format():
+    # Written before messages moved to their own file.
+    state = {"room_id": "ROOM", "messages": [_message(2), _message(1)], "message_count": 2, "people": {},
+             "people_not_found": {}, "attachments": {}, "downloads": {}, "archive_folder": None}
+    with open("ROOM.state.json", "w", encoding="utf-8") as fh:
+        json.dump(state, fh)
+
+    state = _archiver()._load_state("ROOM.state.json", "ROOM")
+    assert _ids(_archiver()._load_state_messages(state)) == ["M2", "M1"]
+
+    # The next run moves them to the messages file.
+    state = _run(_archiver(3, 2, 1), "ROOM.state.json", state)
+    assert "messages" not in state
+    assert _ids(_archiver()._load_state_messages(state)) == ["M3", "M2", "M1"]
+
+
+def test_load_state_checks_room():
+    _run(_archiver(1), "ROOM.state.json")
+
+    assert _archiver()._load_state("MISSING.state.json", "ROOM") is None
+    with pytest.raises(ValueError, match="belongs to room ROOM, not OTHER"):
+        _archiver()._load_state("ROOM.state.json", "OTHER")
@@ -0,0 +1,169 @@
+"""Tests of the checkpoint journal.
+
+Copyright (c) 2018-2021 Cisco and/or its affiliates.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import json
+import os
+import sys
+import tarfile
+
+import pytest
+from webexteamssdk import WebexTeamsAPI
+
+from webexteamsarchiver import WebexTeamsArchiver
+from webexteamsarchiver.journal import JOURNAL_BATCH_SIZE, CheckpointJournal
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "benchmarks"))
+from mock_api import MockWebexAPI  # noqa: E402
+from room_generator import generate_room  # noqa: E402
+
+
+def _messages(*ids) -> list:
+    return [{"id": message_id, "text": f"message {message_id}"} for message_id in ids]
+
+
+def _journal_with_progress(folder: str) -> CheckpointJournal:
+    journal = CheckpointJournal(folder, "ROOM")
+    journal.add_messages(_messages("M4", "M3"))
+    journal.add_messages(_messages("M2"))
+    journal.add_person("P1", "person", {"id": "P1", "displayName": "Someone"})
+    journal.add_person("P2", "not_found", {"id": "P2", "displayName": "Person Not Found"})
+    journal.add_attachment("https://files/1", {"filename": "a.png"})
+    journal.add_download("attachments", "https://files/1", "a.png")
+    journal.flush()
+    return journal
+
+
+def test_replay(tmp_path):
+    folder = str(tmp_path / "Room")
+    _journal_with_progress(folder)
+
+    journal = CheckpointJournal(folder, "ROOM")
+
+    assert journal.message_count == 3
+    assert journal.last_message_id == "M2"
+    assert not journal.messages_complete
+    assert list(journal.read_messages()) == _messages("M4", "M3", "M2")
+    assert journal.people == {
+        "P1": {"person": {"id": "P1", "displayName": "Someone"}},
+        "P2": {"not_found": {"id": "P2", "displayName": "Person Not Found"}},
+    }
+    assert journal.attachments == {"https://files/1": {"filename": "a.png"}}
+    assert journal.downloads == {"attachments": {"https://files/1": "a.png"}}
+
+
+def test_replay_drops_truncated_last_line(tmp_path):
+    folder = str(tmp_path / "Room")
+    _journal_with_progress(folder)
+
+    path = os.path.join(folder, ".checkpoint.jsonl")
+    with open(path, "a", encoding="utf-8") as fh:
+        fh.write(json.dumps({"type": "download", "folder": "attachments", "url": "https://files/2"})[:30])
+
+    journal = CheckpointJournal(folder, "ROOM")
+    assert journal.downloads == {"attachments": {"https://files/1": "a.png"}}
+
+    # New entries start on a line of their own.
+    journal.add_messages(_messages("M1"), complete=True)
+    journal = CheckpointJournal(folder, "ROOM")
+
+    assert journal.messages_complete
+    assert journal.last_message_id == "M1"
+    assert list(journal.read_messages()) == _messages("M4", "M3", "M2", "M1")
+    with open(path, encoding="utf-8") as fh:
+        assert all(json.loads(line) for line in fh)
+
+
+def test_find(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    CheckpointJournal("Room_1", "ROOM")
+    CheckpointJournal("Other", "OTHER")
+
+    assert CheckpointJournal.find("ROOM") == "Room_1"
+    assert CheckpointJournal.find("MISSING") is None
+
+
+def test_entries_are_batched(tmp_path):
+    folder = str(tmp_path / "Room")
+    journal = CheckpointJournal(folder, "ROOM")
+    path = os.path.join(folder, ".checkpoint.jsonl")
+
+    def lines() -> int:
+        with open(path, encoding="utf-8") as fh:
+            return len(fh.readlines())
+
+    journal.add_person("P1", "person", {"id": "P1"})
+    assert lines() == 1
+
+    for number in range(JOURNAL_BATCH_SIZE):
+        journal.add_download("attachments", f"https://files/{number}", f"{number}.png")
+    assert lines() == 1 + JOURNAL_BATCH_SIZE
+
+    journal.add_download("attachments", "https://files/last", "last.png")
+    journal.flush()
+    assert lines() == 3 + JOURNAL_BATCH_SIZE
+
+    # Pages of messages are written at once.
+    journal.add_messages(_messages("M1"))
+    assert lines() == 4 + JOURNAL_BATCH_SIZE
+
+
+def test_set_aside_and_put_back(tmp_path):
+    folder = str(tmp_path / "Room")
+    journal = _journal_with_progress(folder)
+    journal.add_download("attachments", "https://files/2", "b.png")
+
+    journal.set_aside()
+    assert os.listdir(folder) == []
+    assert os.path.isfile(str(tmp_path / "Room.checkpoint.jsonl"))
+
+    journal.put_back()
+    journal.put_back()
+    assert CheckpointJournal(folder, "ROOM").downloads == {
+        "attachments": {"https://files/1": "a.png", "https://files/2": "b.png"},
+    }
+
+
+def test_archive_room_keeps_journal_until_archive_is_complete(tmp_path, monkeypatch):
+    room = generate_room(messages=50, people=3, attachment_ratio=0.1, attachment_size=(100, 1000),
+                         room_id="ROOM")
+    monkeypatch.chdir(tmp_path)
+
+    with MockWebexAPI(room) as api:
+        archiver = WebexTeamsArchiver("token")
+        archiver.sdk = WebexTeamsAPI("token", base_url=api.base_url)
+
+        def fail(*args):
+            raise OSError("disk full")
+
+        monkeypatch.setattr(archiver, "_compress_folder", fail)
+        with pytest.raises(OSError, match="disk full"):
+            archiver.archive_room("ROOM", checkpoint=True)
+
+        folder = CheckpointJournal.find("ROOM")
+        assert CheckpointJournal(folder, "ROOM").messages_complete
+        monkeypatch.undo()
+        monkeypatch.chdir(tmp_path)
+
+        filename = archiver.archive_room("ROOM", checkpoint=True)
+
+    assert CheckpointJournal.find("ROOM") is None
+    assert not any(name.endswith(".checkpoint.jsonl") for name in os.listdir(tmp_path))
+    with tarfile.open(filename) as tar:
+        assert not any(name.endswith(".checkpoint.jsonl") for name in tar.getnames())
@@ -0,0 +1,132 @@
+"""Tests of the message pagination in concurrent time windows.
+
+Copyright (c) 2018-2021 Cisco and/or its affiliates.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import datetime
+import threading
+
+import pytest
+from webexteamssdk.models.immutable import Message, Room
+
+from webexteamsarchiver import WebexTeamsArchiver
+
+START = datetime.datetime(2021, 1, 1)
+
+
+def _created(minutes: int) -> str:
+    created = START + datetime.timedelta(minutes=minutes)
+    return f"{created:%Y-%m-%dT%H:%M:%S}.000Z"
+
+
+class FakeMessagesAPI:
+    """
+    messages.list over one message per minute, newest first. With `inclusive`, a window also
+    returns the message sent exactly at `before`, the way a duplicate at a boundary would show up.
+    """
+
+    def __init__(self, count: int, inclusive: bool = False) -> None:
+        self.messages = [{"id": f"M{minute}", "roomId": "ROOM", "created": _created(minute)}
+                         for minute in reversed(range(count))]
+        self.inclusive = inclusive
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def list(self, room_id: str, before: str = None, **params):
+        with self._lock:
+            self.calls.append(before)
+
+        for message in self.messages:
+            if before is None or message["created"] < before or (self.inclusive and message["created"] == before):
+                yield Message(message)
+
+
+class FakeSDK:
+    def __init__(self, messages: FakeMessagesAPI) -> None:
+        self.messages = messages
+
+
+def _archiver(messages: FakeMessagesAPI, minutes: int) -> WebexTeamsArchiver:
+    archiver = WebexTeamsArchiver("token")
+    archiver._reset_room_information()
+    archiver.sdk = FakeSDK(messages)
+    archiver.room = Room({"id": "ROOM", "type": "direct", "created": _created(0), "lastActivity": _created(minutes)})
+    return archiver
+
+
+def _ids(messages: list) -> list:
+    return [msg.id for msg in messages]
+
+
+@pytest.mark.parametrize("shards", [2, 3, 7])
+def test_windows_match_single_pagination(shards):
+    api = FakeMessagesAPI(100)
+    archiver = _archiver(api, 99)
+
+    messages = archiver._list_messages_sharded("ROOM", shards)
+
+    assert _ids(messages) == [message["id"] for message in api.messages]
+    assert len(api.calls) == shards
+    assert api.calls[0] is None
+
+
+def test_windows_drop_duplicates():
+    # Boundaries fall on whole minutes, where a message was sent.
+    api = FakeMessagesAPI(100, inclusive=True)
+    archiver = _archiver(api, 100)
+
+    messages = archiver._list_messages_sharded("ROOM", 4)
+
+    assert _ids(messages) == [message["id"] for message in api.messages]
+
+
+def test_windows_include_messages_after_last_activity():
+    api = FakeMessagesAPI(100)
+    archiver = _archiver(api, 80)
+
+    messages = archiver._list_messages_sharded("ROOM", 4)
+
+    assert _ids(messages) == [message["id"] for message in api.messages]
+
+
+def test_windows_stop_at_known_messages():
+    api = FakeMessagesAPI(100)
+    archiver = _archiver(api, 99)
+
+    messages = archiver._list_messages_sharded("ROOM", 4, {"M60", "M59"}, since=None)
+
+    assert _ids(messages) == [f"M{minute}" for minute in range(99, 60, -1)]
+
+
+def test_shard_bounds():
+    archiver = _archiver(FakeMessagesAPI(0), 90)
+
+    assert archiver._shard_bounds(3) == [_created(60), _created(30)]
+    assert archiver._shard_bounds(3, since=archiver.room.created + datetime.timedelta(minutes=60)) == [
+        _created(80), _created(70)]
+
+
+def test_unknown_lifetime_falls_back_to_single_pagination():
+    api = FakeMessagesAPI(10)
+    archiver = _archiver(api, 9)
+    archiver.room = Room({"id": "ROOM", "type": "direct", "created": _created(9), "lastActivity": _created(9)})
+
+    messages = archiver._list_messages_sharded("ROOM", 4)
+
+    assert _ids(messages) == [message["id"] for message in api.messages]
+    assert api.calls == [None]
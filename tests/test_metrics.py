@@ -0,0 +1,98 @@
+"""Tests of the API request counters of the run metrics.
+
+Copyright (c) 2018-2021 Cisco and/or its affiliates.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import threading
+from types import SimpleNamespace
+
+import pytest
+from webexteamssdk import WebexTeamsAPI
+
+from webexteamsarchiver.metrics import RunMetrics
+from webexteamsarchiver.webexteamsarchiver import _CountingSession
+
+
+class FakeRequestsSession:
+    """Answers every request with the next of `statuses`, then 200."""
+
+    def __init__(self, *statuses) -> None:
+        self.statuses = list(statuses)
+
+    def request(self, method: str, url: str, **kwargs):
+        return SimpleNamespace(status_code=self.statuses.pop(0) if self.statuses else 200)
+
+
+@pytest.fixture
+def sdk():
+    sdk = WebexTeamsAPI("token", base_url="https://webexapis.com/v1/")
+    sdk._session._req_session = FakeRequestsSession()
+    _CountingSession.install(sdk)
+    yield sdk
+    _CountingSession.track(None)
+
+
+@pytest.mark.parametrize("method, url, endpoint", [
+    ("GET", "https://webexapis.com/v1/messages?roomId=ROOM", "messages.list"),
+    ("GET", "https://webexapis.com/v1/messages?roomId=ROOM&beforeMessage=M1&max=50", "messages.list"),
+    ("GET", "https://webexapis.com/v1/people/me", "people.me"),
+    ("GET", "https://webexapis.com/v1/people/PERSON", "people.get"),
+    ("GET", "https://webexapis.com/v1/rooms/ROOM", "rooms.get"),
+    ("POST", "https://webexapis.com/v1/messages", "messages.post"),
+])
+def test_endpoint(sdk, method, url, endpoint):
+    assert sdk._session._req_session._endpoint(method, url) == endpoint
+
+
+def test_install_once(sdk):
+    session = sdk._session._req_session
+    _CountingSession.install(sdk)
+
+    assert sdk._session._req_session is session
+    assert isinstance(session._session, FakeRequestsSession)
+
+
+def test_counts_requests_and_429s(sdk):
+    metrics = RunMetrics()
+    _CountingSession.track(metrics)
+    session = sdk._session._req_session
+    session._session.statuses = [429, 200, 404]
+
+    for url in ("rooms/ROOM", "rooms/ROOM", "people/PERSON", "messages"):
+        session.request("GET", f"https://webexapis.com/v1/{url}")
+
+    assert metrics.api_calls == {"rooms.get": 2, "people.get": 1, "messages.list": 1}
+    assert metrics.to_dict()["http_429"] == 1
+    assert metrics.to_dict()["http_retries"] == 1
+
+
+def test_counts_per_thread(sdk):
+    main, other = RunMetrics(), RunMetrics()
+    _CountingSession.track(main)
+
+    def request() -> None:
+        _CountingSession.track(other)
+        sdk._session._req_session.request("GET", "https://webexapis.com/v1/people/PERSON")
+
+    thread = threading.Thread(target=request)
+    thread.start()
+    thread.join()
+    sdk._session._req_session.request("GET", "https://webexapis.com/v1/rooms/ROOM")
+
+    assert main.api_calls == {"rooms.get": 1}
+    assert other.api_calls == {"people.get": 1}
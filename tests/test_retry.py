@@ -0,0 +1,114 @@
+"""Tests of the retry policy of the attachment session.
+
+Copyright (c) 2018-2021 Cisco and/or its affiliates.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import copy
+import time
+from collections import Counter
+
+import pytest
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import RequestHistory
+
+from webexteamsarchiver import WebexTeamsArchiver
+from webexteamsarchiver.webexteamsarchiver import HTTP_RETRY_STATUSES, _JitterRetry
+
+
+@pytest.fixture
+def counter():
+    return Counter()
+
+
+@pytest.fixture
+def session(counter):
+    retry = _JitterRetry(total=3, backoff_factor=0.01, status_forcelist=HTTP_RETRY_STATUSES,
+                         raise_on_status=False, counter=counter)
+    with requests.Session() as session:
+        session.mount("http://", HTTPAdapter(max_retries=retry))
+        yield session
+
+
+def test_backoff_has_jitter():
+    history = tuple(RequestHistory("GET", "/", None, 503, None) for _ in range(4))
+    retry = _JitterRetry(total=10, backoff_factor=1).new(history=history)
+    backoff = super(_JitterRetry, retry).get_backoff_time()
+    assert backoff == 8
+
+    times = {retry.get_backoff_time() for _ in range(50)}
+    assert all(backoff / 2 <= t <= backoff for t in times)
+    assert len(times) > 1
+
+
+def test_new_keeps_counter(counter):
+    assert _JitterRetry(total=3, counter=counter).new(total=2).counter is counter
+
+
+def test_retries_statuses(file_server, session, counter):
+    file_server.content = b"file"
+    file_server.statuses = [503, 429]
+
+    r = session.get(file_server.url)
+
+    assert r.status_code == 200 and r.content == b"file"
+    assert len(file_server.requests) == 3
+    assert counter == {"retries": 2, "http_429": 1}
+
+
+def test_honors_retry_after(file_server, session, counter):
+    file_server.content = b"file"
+    file_server.statuses = [429]
+    file_server.retry_after = 1
+
+    start = time.monotonic()
+    r = session.get(file_server.url)
+
+    assert r.status_code == 200
+    assert time.monotonic() - start >= 1
+    assert counter == {"retries": 1, "http_429": 1}
+
+
+def test_exhausted_retries_are_not_counted(file_server, session, counter):
+    file_server.statuses = [500] * 10
+
+    r = session.get(file_server.url)
+
+    # raise_on_status=False: the last response is returned as is.
+    assert r.status_code == 500
+    assert len(file_server.requests) == 4
+    assert counter == {"retries": 3}
+
+
+def test_room_sessions_count_their_own_retries(file_server):
+    file_server.content = b"file"
+    archiver = WebexTeamsArchiver("token")
+    rooms = [copy.copy(archiver), copy.copy(archiver)]
+    for room in rooms:
+        room._use_pools_of(archiver.session)
+
+    file_server.statuses = [503, 429]
+    assert rooms[0].session.get(file_server.url).content == b"file"
+    assert rooms[1].session.get(file_server.url).content == b"file"
+
+    assert rooms[0]._http_retries == {"retries": 2, "http_429": 1}
+    assert rooms[1]._http_retries == {}
+    assert archiver._http_retries == {}
+    assert rooms[0].session.headers["Authorization"] == "Bearer token"
+    assert all(room.session.get_adapter(file_server.url).poolmanager
+               is archiver.session.get_adapter(file_server.url).poolmanager for room in rooms)
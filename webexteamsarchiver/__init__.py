@@ -1 +1,3 @@
-from .webexteamsarchiver import WebexTeamsArchiver
\ No newline at end of file
+from .webexteamsarchiver import WebexTeamsArchiver
+from .cache import FileCache
+from .search_index import SearchIndex
\ No newline at end of file
@@ -0,0 +1,315 @@
+"""Direct-to-archive writer.
+
+Copyright (c) 2018-2021 Cisco and/or its affiliates.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import bz2
+import codecs
+import lzma
+import os
+import shutil
+import stat
+import tarfile
+import tempfile
+import threading
+import time
+import zipfile
+from contextlib import contextmanager
+from .compression import PARALLEL_FORMATS, is_compressed, level_filter, open_compressed_file
+
+__all__ = ['ArchiveWriter', 'TarStreamWriter']
+
+# Files up to this size are buffered in memory before being added to the
+# archive, larger ones spill over to a temporary file.
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+ARCHIVE_EXTENSIONS = {
+    "zip": ".zip",
+    "tar": ".tar",
+    "gztar": ".tar.gz",
+    "bztar": ".tar.bz2",
+    "xztar": ".tar.xz",
+    "zstd": ".tar.zst",
+}
+
+# Opens the file under an archive that is not compressed in parallel: {"file_format": function}
+TAR_FILES = {
+    "tar": open,
+    "bztar": bz2.BZ2File,
+    "xztar": lzma.LZMAFile,
+}
+
+
+class ArchiveWriter:
+    """
+    Writes files straight into a tar or zip archive instead of a staging folder.
+
+    Any number of threads can produce files at the same time through `open`. Each file
+    is buffered on its own and then appended to the archive by whichever thread holds
+    the writer lock, so the archive itself only ever has a single writer. Large files
+    of a known size are written in place while holding the lock instead, see `streams`.
+
+    Args:
+        base_name: Archive file name without extension.
+        file_format: One of the shutil.make_archive formats: zip, tar, gztar, bztar or xztar, or zstd.
+        workers: Number of threads compressing gztar and zstd archives, defaults to the number of CPUs.
+
+    Raises:
+        ValueError: Unsupported file_format.
+    """
+
+    def __init__(self, base_name: str, file_format: str, workers: int = None) -> None:
+        if file_format not in ARCHIVE_EXTENSIONS:
+            raise ValueError(f"Unsupported file_format '{file_format}' for direct archives")
+
+        self.filename = os.path.abspath(f"{base_name}{ARCHIVE_EXTENSIONS[file_format]}")
+        self._lock = threading.Lock()
+
+        self._zip = self._tar = self._fileobj = None
+        if file_format == "zip":
+            self._zip = zipfile.ZipFile(self.filename, "w", zipfile.ZIP_DEFLATED)
+        else:
+            if file_format in PARALLEL_FORMATS:
+                self._fileobj = open_compressed_file(self.filename, file_format, workers)
+            else:
+                self._fileobj = TAR_FILES[file_format](self.filename, "wb")
+            self._tar = TarStreamWriter(self._fileobj, level_filter(self._fileobj))
+
+    @contextmanager
+    def open(self, arcname: str, text: bool = False, encoding: str = "utf-8", size: int = None):
+        """
+        Yields a writable file whose contents are added to the archive as `arcname` on exit.
+
+        A binary file for which `streams(size)` is true is written straight into the archive
+        instead of going through a temporary file, holding the writer lock until it is done.
+        It is not seekable then, and must be exactly `size` bytes long or IOError is raised,
+        the archive being unusable from then on.
+        """
+
+        if not text and self.streams(size):
+            with self._lock:
+                with self._open_member(arcname, size) as member:
+                    yield member
+            return
+
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as spool:
+            yield codecs.getwriter(encoding)(spool) if text else spool
+
+            size = spool.tell()
+            spool.seek(0)
+            self._add_fileobj(spool, arcname, size)
+
+    @staticmethod
+    def streams(size: int = None) -> bool:
+        """
+        Tells whether `open` writes a binary file of `size` bytes straight into the archive.
+        Such files are best produced one at a time, as each one keeps all others waiting.
+        """
+
+        return size is not None and size > SPOOL_MAX_SIZE
+
+    def add(self, path: str, arcname: str) -> None:
+        """Adds a file or a whole folder from disk to the archive."""
+
+        with self._lock:
+            if self._tar:
+                self._tar.add(path, arcname)
+            elif os.path.isdir(path):
+                for root, _, files in os.walk(path):
+                    for name in files:
+                        full_path = os.path.join(root, name)
+                        self._write_zip(full_path, os.path.join(arcname, os.path.relpath(full_path, path)))
+            else:
+                self._write_zip(path, arcname)
+
+    def close(self) -> str:
+        """Finishes the archive and returns its file name."""
+
+        with self._lock:
+            if self._tar:
+                try:
+                    self._tar.close()
+                finally:
+                    self._fileobj.close()
+            else:
+                self._zip.close()
+
+        return self.filename
+
+    def discard(self) -> None:
+        """Closes and deletes a partially written archive."""
+
+        try:
+            self.close()
+        finally:
+            if os.path.isfile(self.filename):
+                os.remove(self.filename)
+
+    def _add_fileobj(self, fileobj, arcname: str, size: int) -> None:
+        with self._lock:
+            if self._tar:
+                self._tar.addfile(self._tarinfo(arcname, size), fileobj)
+            else:
+                with self._zip.open(self._zipinfo(arcname, size), "w") as dst:
+                    shutil.copyfileobj(fileobj, dst)
+
+    @contextmanager
+    def _open_member(self, arcname: str, size: int):
+        """Yields a _MemberWriter appending a `size` bytes member to the archive. The writer lock must be held."""
+
+        if self._zip:
+            with self._zip.open(self._zipinfo(arcname, size), "w") as dst:
+                member = _MemberWriter(dst)
+                yield member
+                member.check(arcname, size)
+            return
+
+        with self._tar.open_member(self._tarinfo(arcname, size)) as member:
+            yield member
+
+    @staticmethod
+    def _tarinfo(arcname: str, size: int) -> tarfile.TarInfo:
+        tarinfo = tarfile.TarInfo(arcname)
+        tarinfo.size = size
+        tarinfo.mtime = int(time.time())
+        tarinfo.mode = 0o644
+        return tarinfo
+
+    @staticmethod
+    def _zipinfo(arcname: str, size: int) -> zipfile.ZipInfo:
+        zipinfo = zipfile.ZipInfo(arcname, time.localtime()[:6])
+        zipinfo.compress_type = zipfile.ZIP_STORED if is_compressed(arcname) else zipfile.ZIP_DEFLATED
+        zipinfo.external_attr = 0o644 << 16
+        zipinfo.file_size = size
+        return zipinfo
+
+    def _write_zip(self, path: str, arcname: str) -> None:
+        self._zip.write(path, arcname, zipfile.ZIP_STORED if is_compressed(arcname) else None)
+
+
+class TarStreamWriter:
+    """
+    Writes a tar archive to a binary file one member after the other, like a TarFile opened
+    with mode "w|", except that the data of a member can also be written in place by the caller.
+
+    Only regular files and folders are archived, symbolic links are followed.
+
+    Args:
+        fileobj: Binary file to write to, left open by `close`.
+        filter: Function called with the TarInfo of every member before it is written, returning it.
+    """
+
+    def __init__(self, fileobj, filter=None) -> None:
+        self.fileobj = fileobj
+        self.filter = filter
+        self._offset = 0
+
+    def add(self, path: str, arcname: str) -> None:
+        """Adds a file or a whole folder from disk."""
+
+        tarinfo = self._stat_tarinfo(path, arcname)
+        if not tarinfo.isdir():
+            with open(path, "rb") as fh:
+                self.addfile(tarinfo, fh)
+            return
+
+        self._write_header(tarinfo)
+        for name in sorted(os.listdir(path)):
+            self.add(os.path.join(path, name), os.path.join(arcname, name))
+
+    def addfile(self, tarinfo: tarfile.TarInfo, fileobj) -> None:
+        """Adds a regular file member of `tarinfo.size` bytes read from `fileobj`."""
+
+        with self.open_member(tarinfo) as member:
+            shutil.copyfileobj(fileobj, member)
+
+    @contextmanager
+    def open_member(self, tarinfo: tarfile.TarInfo):
+        """
+        Yields a write-only, non-seekable file taking the data of a regular file member.
+        Unless exactly `tarinfo.size` bytes are written, IOError is raised and the archive
+        is unusable from then on.
+        """
+
+        self._write_header(tarinfo)
+        member = _MemberWriter(self.fileobj)
+        yield member
+        member.check(tarinfo.name, tarinfo.size)
+
+        self._offset += member.tell()
+        self._pad(tarfile.BLOCKSIZE)
+
+    def close(self) -> None:
+        """Writes the end of archive marker."""
+
+        self._write(tarfile.NUL * tarfile.BLOCKSIZE * 2)
+        self._pad(tarfile.RECORDSIZE)
+
+    @staticmethod
+    def _stat_tarinfo(path: str, arcname: str) -> tarfile.TarInfo:
+        st = os.stat(path)
+        tarinfo = tarfile.TarInfo(arcname)
+        tarinfo.mode = stat.S_IMODE(st.st_mode)
+        tarinfo.mtime = int(st.st_mtime)
+        tarinfo.uid, tarinfo.gid = st.st_uid, st.st_gid
+
+        if stat.S_ISDIR(st.st_mode):
+            tarinfo.type = tarfile.DIRTYPE
+        elif stat.S_ISREG(st.st_mode):
+            tarinfo.size = st.st_size
+        else:
+            raise IOError(f"{path} is neither a file nor a folder")
+
+        return tarinfo
+
+    def _write_header(self, tarinfo: tarfile.TarInfo) -> None:
+        if self.filter:
+            tarinfo = self.filter(tarinfo)
+        self._write(tarinfo.tobuf(tarfile.DEFAULT_FORMAT, tarfile.ENCODING, "surrogateescape"))
+
+    def _write(self, data: bytes) -> None:
+        self.fileobj.write(data)
+        self._offset += len(data)
+
+    def _pad(self, size: int) -> None:
+        remainder = self._offset % size
+        if remainder:
+            self._write(tarfile.NUL * (size - remainder))
+
+
+class _MemberWriter:
+    """Write-only, non-seekable file writing an archive member in place, counting its bytes."""
+
+    def __init__(self, fileobj) -> None:
+        self._fileobj = fileobj
+        self._written = 0
+
+    def write(self, data) -> int:
+        self._fileobj.write(data)
+        self._written += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._written
+
+    def seekable(self) -> bool:
+        return False
+
+    def check(self, arcname: str, size: int) -> None:
+        if self._written != size:
+            raise IOError(f"Wrote {self._written} bytes of {arcname} into the archive, expected {size}")
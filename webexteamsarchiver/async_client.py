@@ -0,0 +1,160 @@
+"""Asynchronous Webex Teams Client.
+
+Copyright (c) 2018-2021 Cisco and/or its affiliates.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import asyncio
+import logging
+import random
+from collections import Counter
+from contextlib import asynccontextmanager
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover
+    raise ImportError("archive_room_async requires aiohttp: pip install webexteamsarchiver[async]")
+
+__all__ = ['AsyncWebexClient', 'RateLimiter']
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+class RateLimiter:
+    """
+    Spaces out requests so no more than `rate` of them start per second.
+
+    Args:
+        rate: Maximum number of requests per second.
+    """
+
+    def __init__(self, rate: float) -> None:
+        self.rate = rate
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self) -> None:
+        async with self._lock:
+            now = asyncio.get_running_loop().time()
+            delay = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + 1 / self.rate
+
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class AsyncWebexClient:
+    """
+    aiohttp client for the Webex Teams endpoints used by `archive_room_async`.
+
+    All requests share one connection pool of `max_connections` connections and an optional
+    global rate limit. 429/5xx responses are retried like the synchronous archiver does:
+    Retry-After is honored when present, otherwise requests back off exponentially with jitter.
+
+    Args:
+        access_token: Webex Teams API bearer token.
+        base_url: Webex Teams API base URL, e.g. "https://webexapis.com/v1/".
+        timeout: Timeout in seconds for reading from a connection.
+        max_connections: Maximum number of requests in flight.
+        requests_per_second: Global request rate limit, None for no limit.
+        retries: Number of retries of throttled or failed requests.
+        backoff_factor: Exponential backoff factor in seconds.
+        retry_statuses: Status codes that get retried.
+        counter: Counter the retries and 429 responses are counted in
+                 ({"retries": count, "http_429": count}), or None.
+    """
+
+    def __init__(self, access_token: str, base_url: str, timeout: int, max_connections: int,
+                 requests_per_second: float, retries: int, backoff_factor: float,
+                 retry_statuses: tuple, counter: Counter = None) -> None:
+        self.base_url = base_url if base_url.endswith("/") else f"{base_url}/"
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.retry_statuses = retry_statuses
+        self.counter = counter
+        self._limiter = RateLimiter(requests_per_second) if requests_per_second else None
+        self._session = aiohttp.ClientSession(
+            headers={"Authorization": f"Bearer {access_token}"},
+            timeout=aiohttp.ClientTimeout(total=None, sock_connect=timeout, sock_read=timeout),
+            connector=aiohttp.TCPConnector(limit=max_connections),
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self._session.close()
+
+    @asynccontextmanager
+    async def request(self, method: str, url: str, **kwargs):
+        """Yields the response to the request, once it is no longer throttled or retries run out."""
+
+        if not url.startswith(("http://", "https://")):
+            url = f"{self.base_url}{url}"
+
+        for attempt in range(self.retries + 1):
+            if self._limiter:
+                await self._limiter.wait()
+
+            response = await self._session.request(method, url, **kwargs)
+            if self.counter is not None and response.status == 429:
+                self.counter["http_429"] += 1
+            if response.status not in self.retry_statuses or attempt == self.retries:
+                break
+
+            if self.counter is not None:
+                self.counter["retries"] += 1
+
+            delay = self._retry_delay(response, attempt)
+            response.release()
+            logger.debug("%s %s returned %d, retrying in %.1fs.", method, url, response.status, delay)
+            await asyncio.sleep(delay)
+
+        try:
+            yield response
+        finally:
+            response.release()
+
+    async def get_json(self, url: str, **params) -> dict:
+        """GETs `url` and returns its JSON body, raising aiohttp.ClientResponseError on failure."""
+
+        async with self.request("GET", url, params=params or None) as response:
+            response.raise_for_status()
+            return await response.json()
+
+    async def pages(self, url: str, **params):
+        """Yields the items of every page of a list endpoint, following the Link headers."""
+
+        next_url = url
+        while next_url:
+            async with self.request("GET", next_url, params=params or None) as response:
+                response.raise_for_status()
+                body = await response.json()
+                next_link = response.links.get("next")
+
+            # The next link already carries the query parameters.
+            next_url, params = (str(next_link["url"]), None) if next_link else (None, None)
+            yield body.get("items", [])
+
+    def _retry_delay(self, response, attempt: int) -> float:
+        retry_after = response.headers.get("Retry-After", "")
+        if retry_after.isdigit():
+            return float(retry_after)
+
+        backoff = self.backoff_factor * (2 ** attempt)
+        return random.uniform(backoff / 2, backoff)
@@ -0,0 +1,181 @@
+"""On-disk File Cache.
+
+Copyright (c) 2018-2021 Cisco and/or its affiliates.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+__all__ = ['FileCache']
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+class FileCache:
+    """
+    Size-bounded on-disk cache of downloaded attachments and avatars, shared across runs.
+
+    Files are stored under a hash of their URL and Content-Length, so the same file is only
+    downloaded once no matter how many rooms or runs it shows up in. Once the cache grows
+    beyond `max_size`, the least recently used files are evicted, except the ones pinned
+    by `pinned` while they are being copied.
+
+    Args:
+        directory: Cache folder. Created if it does not exist.
+        max_size: Maximum size of the cache in bytes.
+    """
+
+    def __init__(self, directory: str, max_size: int = 10 * 1024 ** 3) -> None:
+        self.directory = directory
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.size = 0
+        self._lock = threading.Lock()
+
+        # Structure: {"key": size}, least recently used first
+        self._entries = OrderedDict()
+
+        # Keys in use, which are not evicted: {"key": number of users}
+        self._pins = {}
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._load()
+
+    @staticmethod
+    def key(url: str, content_length="") -> str:
+        """Returns the cache key of the file at `url`."""
+
+        return hashlib.sha256(f"{url}\n{content_length}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> str:
+        """Returns the path of the cached file for `key`, or None if it is not cached."""
+
+        path = self.path(key)
+        with self._lock:
+            if key in self._entries:
+                try:
+                    os.utime(path)
+                except FileNotFoundError:
+                    # Removed by another process sharing the cache folder.
+                    self.size -= self._entries.pop(key)
+                else:
+                    self.hits += 1
+                    self._entries.move_to_end(key)
+                    return path
+
+            self.misses += 1
+            return None
+
+    @contextmanager
+    def pinned(self, key: str):
+        """
+        Yields the path of the cached file for `key`, or None if it is not cached, like `get`.
+        The file is not evicted until the block exits, including when it is written in the block.
+        """
+
+        with self._lock:
+            self._pins[key] = self._pins.get(key, 0) + 1
+
+        try:
+            yield self.get(key)
+        finally:
+            with self._lock:
+                self._pins[key] -= 1
+                if not self._pins[key]:
+                    del self._pins[key]
+                # Files kept beyond max_size while they were pinned can go now.
+                self._evict()
+
+    @contextmanager
+    def writer(self, key: str):
+        """Yields a binary file to fill with the contents for `key`. It is added to the cache on success."""
+
+        path = self.path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        try:
+            with open(tmp_path, "wb") as fh:
+                yield fh
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.isfile(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        with self._lock:
+            self.size -= self._entries.pop(key, 0)
+            self._entries[key] = os.path.getsize(path)
+            self.size += self._entries[key]
+            self._evict()
+
+    def path(self, key: str) -> str:
+        """Returns where the file for `key` is stored, whether or not it is cached."""
+
+        return os.path.join(self.directory, key[:2], key)
+
+    def _load(self) -> None:
+        """Indexes the files already in the cache folder, oldest first."""
+
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                if name.endswith(".tmp"):
+                    # Being written by another process, or left behind by an interrupted download.
+                    continue
+
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, name, stat.st_size))
+
+        for _, key, size in sorted(entries):
+            self._entries[key] = size
+            self.size += size
+
+        with self._lock:
+            self._evict()
+
+    def _evict(self) -> None:
+        """
+        Removes least recently used files until the cache fits `max_size`.
+        Never evicts the newest file, nor pinned files.
+        """
+
+        if self.size <= self.max_size:
+            return
+
+        # The newest file is the last one.
+        for key in list(self._entries)[:-1]:
+            if self.size <= self.max_size:
+                break
+            if key in self._pins:
+                continue
+
+            size = self._entries.pop(key)
+            self.size -= size
+            try:
+                os.remove(self.path(key))
+            except FileNotFoundError:
+                pass
+            logger.debug("Evicted %s (%d bytes) from the file cache.", key, size)
@@ -0,0 +1,237 @@
+"""Multi-core Archive Compression.
+
+Copyright (c) 2018-2021 Cisco and/or its affiliates.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import collections
+import concurrent.futures
+import logging
+import os
+import shutil
+import tarfile
+import zipfile
+import zlib
+
+__all__ = ['ParallelGzipFile', 'compress_folder', 'import_zstandard', 'is_compressed', 'level_filter',
+           'open_compressed_file', 'open_compressed_tar']
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Archive formats compressed here instead of by shutil.make_archive: {"file_format": extension}
+PARALLEL_FORMATS = {
+    "gztar": ".tar.gz",
+    "zstd": ".tar.zst",
+}
+
+# Uncompressed data per gzip member. Members are compressed independently, one per worker.
+COMPRESS_BLOCK_SIZE = 1024 * 1024
+
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+# Files that are compressed already and are stored as is.
+COMPRESSED_EXTENSIONS = {
+    ".jpg", ".jpeg", ".png", ".gif", ".webp", ".heic", ".mp4", ".mov", ".m4v", ".webm", ".mkv",
+    ".mp3", ".m4a", ".aac", ".ogg", ".zip", ".gz", ".tgz", ".bz2", ".xz", ".zst", ".7z", ".rar",
+    ".docx", ".xlsx", ".pptx",
+}
+
+# Archive folders that only hold images. Avatars are saved without an extension.
+COMPRESSED_FOLDERS = ("avatars",)
+
+
+def is_compressed(arcname: str) -> bool:
+    """Tells whether the file at `arcname` in an archive folder is compressed already."""
+
+    parts = os.path.normpath(arcname).split(os.sep)
+    return (len(parts) > 1 and parts[-2] in COMPRESSED_FOLDERS
+            or os.path.splitext(arcname)[1].lower() in COMPRESSED_EXTENSIONS)
+
+
+class ParallelGzipFile:
+    """
+    Write-only gzip file compressed on several threads.
+
+    Data is cut into COMPRESS_BLOCK_SIZE blocks that are compressed as separate gzip
+    members at the same time, zlib releasing the GIL while it compresses. Concatenated
+    gzip members are a valid gzip file that gzip, tar and Python's gzip module read as one.
+
+    Args:
+        fileobj: Binary file the compressed data is written to. Closed by `close`.
+        level: zlib compression level.
+        workers: Number of compression threads, defaults to the number of CPUs.
+    """
+
+    def __init__(self, fileobj, level: int = GZIP_LEVEL, workers: int = None) -> None:
+        self.fileobj = fileobj
+        self.level = level
+        self._block_level = level
+        self._block = bytearray()
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1)
+
+        # Compressed blocks in order, at most two per worker so memory stays bounded.
+        self._pending = collections.deque()
+        self._max_pending = 2 * self._executor._max_workers
+
+    def set_level(self, level: int) -> None:
+        """Compresses the data written from now on with `level`, 0 to store it as is."""
+
+        if level != self._block_level:
+            self._submit()
+            self._block_level = level
+
+    def write(self, data) -> int:
+        self._block += data
+        while len(self._block) >= COMPRESS_BLOCK_SIZE:
+            self._submit()
+        return len(data)
+
+    def close(self) -> None:
+        try:
+            self._submit()
+            while self._pending:
+                self.fileobj.write(self._pending.popleft().result())
+        finally:
+            self._executor.shutdown()
+            self.fileobj.close()
+
+    def _submit(self) -> None:
+        if not self._block:
+            return
+
+        block = bytes(self._block[:COMPRESS_BLOCK_SIZE])
+        del self._block[:COMPRESS_BLOCK_SIZE]
+        self._pending.append(self._executor.submit(_gzip_member, block, self._block_level))
+
+        while len(self._pending) > self._max_pending or (self._pending and self._pending[0].done()):
+            self.fileobj.write(self._pending.popleft().result())
+
+
+def _gzip_member(data: bytes, level: int) -> bytes:
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+def import_zstandard():
+    """Returns the zstandard module, which the zstd file_format requires."""
+
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError("file_format zstd requires zstandard: pip install webexteamsarchiver[zstd]")
+
+    return zstandard
+
+
+def open_compressed_file(filename: str, file_format: str, workers: int = None):
+    """
+    Opens a file for writing, compressed with all cores.
+
+    Args:
+        filename: File name.
+        file_format: "gztar" or "zstd". zstd requires the zstandard package.
+        workers: Number of compression threads, defaults to the number of CPUs.
+
+    Returns:
+        The compressed file, which closes `filename` when closed.
+    """
+
+    if file_format == "zstd":
+        compressor = import_zstandard().ZstdCompressor(level=ZSTD_LEVEL, threads=workers or -1)
+        return compressor.stream_writer(open(filename, "wb"))
+
+    return ParallelGzipFile(open(filename, "wb"), workers=workers)
+
+
+def open_compressed_tar(filename: str, file_format: str, workers: int = None) -> tuple:
+    """
+    Opens a streaming tar archive for writing, compressed with all cores.
+
+    Args:
+        filename: Archive file name.
+        file_format: "gztar" or "zstd". zstd requires the zstandard package.
+        workers: Number of compression threads, defaults to the number of CPUs.
+
+    Returns:
+        The TarFile and the compressed file under it, to be closed in that order.
+    """
+
+    fileobj = open_compressed_file(filename, file_format, workers)
+    return tarfile.open(fileobj=fileobj, mode="w|"), fileobj
+
+
+def level_filter(fileobj):
+    """
+    Returns a tarfile filter that makes a ParallelGzipFile store the files that are
+    compressed already as is. zstd needs none, it detects incompressible data itself.
+    """
+
+    def set_level(tarinfo: tarfile.TarInfo) -> tarfile.TarInfo:
+        if isinstance(fileobj, ParallelGzipFile) and tarinfo.isfile():
+            fileobj.set_level(0 if is_compressed(tarinfo.name) else fileobj.level)
+        return tarinfo
+
+    return set_level
+
+
+def compress_folder(folder: str, file_format: str, workers: int = None) -> str:
+    """
+    Compresses `folder` into an archive named after it, like shutil.make_archive(folder, file_format, folder).
+
+    gztar and zstd archives are compressed on `workers` threads, and zip archives
+    store files that are compressed already as is. Other formats are left to
+    shutil.make_archive.
+
+    Returns:
+        Name of the archive file.
+    """
+
+    if file_format == "zip":
+        return _zip_folder(folder)
+
+    if file_format not in PARALLEL_FORMATS:
+        return shutil.make_archive(folder, file_format, folder)
+
+    filename = os.path.abspath(f"{folder}{PARALLEL_FORMATS[file_format]}")
+    tar, fileobj = open_compressed_tar(filename, file_format, workers)
+    try:
+        tar.add(folder, os.curdir, filter=level_filter(fileobj))
+        tar.close()
+    finally:
+        fileobj.close()
+
+    return filename
+
+
+def _zip_folder(folder: str) -> str:
+    """Same archive as shutil.make_archive(folder, "zip", folder), with compressed files stored."""
+
+    filename = os.path.abspath(f"{folder}.zip")
+    with zipfile.ZipFile(filename, "w", zipfile.ZIP_DEFLATED) as archive:
+        for root, dirs, files in os.walk(folder):
+            arcroot = os.path.normpath(os.path.relpath(root, folder))
+            for name in sorted(dirs):
+                archive.write(os.path.join(root, name), os.path.join(arcroot, name))
+            for name in files:
+                path = os.path.join(root, name)
+                if os.path.isfile(path):
+                    arcname = os.path.join(arcroot, name)
+                    archive.write(path, arcname, zipfile.ZIP_STORED if is_compressed(arcname) else None)
+
+    return filename
@@ -0,0 +1,312 @@
+"""Range-based File Downloader.
+
+Copyright (c) 2018-2021 Cisco and/or its affiliates.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import concurrent.futures
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+import requests
+
+__all__ = ['BandwidthLimiter', 'Downloader', 'DownloadScheduler']
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Byte-range segments of one file downloaded at the same time.
+DOWNLOAD_SEGMENT_WORKERS = 4
+
+# Errors of a connection dropped halfway through a download, which can be resumed.
+RESUMABLE_ERRORS = (
+    requests.exceptions.ConnectionError,
+    requests.exceptions.ChunkedEncodingError,
+    requests.exceptions.Timeout,
+)
+
+
+class BandwidthLimiter:
+    """
+    Spaces out reads so that, across all threads, no more than `rate` bytes are downloaded per second.
+
+    Args:
+        rate: Maximum download rate in bytes per second.
+    """
+
+    def __init__(self, rate: float) -> None:
+        self.rate = rate
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def consume(self, size: int) -> None:
+        """Accounts for `size` bytes just read, waiting until the rate allows reading them."""
+
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + size / self.rate
+
+        if delay > 0:
+            time.sleep(delay)
+
+
+class DownloadScheduler:
+    """
+    Runs downloads on a pool of worker threads, largest files first, so a large file does not
+    start last and stretch the tail of the run. Keeps count of the files and bytes that are
+    queued, in flight and completed, which can be read from any thread while downloads run.
+
+    Args:
+        workers: Number of files downloaded at the same time.
+    """
+
+    def __init__(self, workers: int) -> None:
+        self.workers = workers
+        self.queued = self.in_flight = self.completed = 0
+        self.queued_bytes = self.in_flight_bytes = self.completed_bytes = 0
+        self._lock = threading.Lock()
+
+    def run(self, jobs: list, download, serial_jobs: list = ()):
+        """
+        Calls `download(*args)` for every `(size, args)` in `jobs`, `size` being the expected
+        file size in bytes (0 if unknown), then for every one in `serial_jobs`, one at a time.
+
+        Yields:
+            `(args, future)` of every download as it completes.
+        """
+
+        with self._lock:
+            self.queued += len(jobs) + len(serial_jobs)
+            self.queued_bytes += sum(size for size, _ in jobs) + sum(size for size, _ in serial_jobs)
+
+        yield from self._run_jobs(jobs, download, self.workers)
+        yield from self._run_jobs(serial_jobs, download, 1)
+
+    def status(self) -> dict:
+        """Returns the current file and byte counts."""
+
+        with self._lock:
+            return {
+                "queued": self.queued,
+                "queued_bytes": self.queued_bytes,
+                "in_flight": self.in_flight,
+                "in_flight_bytes": self.in_flight_bytes,
+                "completed": self.completed,
+                "completed_bytes": self.completed_bytes,
+            }
+
+    def _run_jobs(self, jobs: list, download, workers: int):
+        jobs = sorted(jobs, key=lambda job: job[0], reverse=True)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(self._run_job, size, download, args): args for size, args in jobs}
+            for future in concurrent.futures.as_completed(futures):
+                yield futures[future], future
+
+    def _run_job(self, size: int, download, args: tuple) -> None:
+        with self._lock:
+            self.queued -= 1
+            self.queued_bytes -= size
+            self.in_flight += 1
+            self.in_flight_bytes += size
+
+        try:
+            download(*args)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+                self.in_flight_bytes -= size
+                self.completed += 1
+                self.completed_bytes += size
+
+            logger.debug("Downloads: %d bytes queued, %d in flight, %d completed.",
+                         self.queued_bytes, self.in_flight_bytes, self.completed_bytes)
+
+
+class Downloader:
+    """
+    Downloads files with large read buffers, resuming dropped connections with HTTP Range requests.
+
+    Files larger than `segment_size` are split into byte-range segments that are downloaded
+    in parallel. The number of bytes downloaded is checked against the expected Content-Length.
+    A single Downloader can be shared by any number of threads; its bandwidth and per-host
+    connection limits then apply to all of them together.
+
+    Args:
+        session: requests Session used for the downloads.
+        timeout: Timeout in seconds for connecting and for every read.
+        chunk_size: Size in bytes of the reads from the connection.
+        segment_size: Download larger files in segments of this size. None disables segments.
+        retries: Number of times a dropped download is resumed.
+        backoff_factor: Exponential backoff factor in seconds between resumes.
+        limiter: Global download bandwidth limit, None for no limit.
+        max_host_connections: Maximum number of downloads from the same host at a time,
+                              None for no limit.
+    """
+
+    def __init__(self, session: requests.Session, timeout: int, chunk_size: int,
+                 segment_size: int = None, retries: int = 5, backoff_factor: float = 0.5,
+                 limiter: BandwidthLimiter = None, max_host_connections: int = None) -> None:
+        self.session = session
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self.segment_size = segment_size
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.limiter = limiter
+        self.max_host_connections = max_host_connections
+
+        # Structure: {"host": threading.Semaphore}
+        self._host_slots = {}
+        self._host_slots_lock = threading.Lock()
+
+    def fetch(self, url: str, fh, content_length="") -> int:
+        """
+        Writes the file at `url` into the binary file `fh`.
+
+        Args:
+            url: File URL.
+            fh: Binary file to write to. Files that are not seekable are not downloaded in segments.
+            content_length: Expected size from the HEAD request, as the Content-Length header
+                            string. Anything else, such as the 0 used when the header was
+                            missing, skips the size check.
+
+        Returns:
+            Number of bytes downloaded.
+
+        Raises:
+            IOError: The number of bytes downloaded does not match `content_length`.
+            requests.RequestException: The download failed, also after resuming it, or the
+                                       server answered with an error status.
+        """
+
+        expected = int(content_length) if isinstance(content_length, str) and content_length.isdigit() else None
+
+        if self.segment_size and expected and expected > self.segment_size and fh.seekable():
+            written = self._fetch_segments(url, fh, expected)
+        else:
+            written, _ = self._fetch_range(url, fh, 0)
+
+        if expected is not None and written != expected:
+            raise IOError(f"Downloaded {written} bytes of {url}, expected {expected}")
+
+        return written
+
+    def _fetch_segments(self, url: str, fh, size: int) -> int:
+        """Downloads a file of `size` bytes in parallel segments. Returns the number of bytes written."""
+
+        ranges = [(start, min(start + self.segment_size, size) - 1) for start in range(0, size, self.segment_size)]
+        lock = threading.Lock()
+
+        # The first segment tells whether the server supports ranges at all.
+        written, ranged = self._fetch_range(url, fh, *ranges[0], lock=lock)
+        if not ranged:
+            written += self._fetch_range(url, fh, ranges[0][1] + 1, lock=lock)[0]
+        else:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=DOWNLOAD_SEGMENT_WORKERS) as executor:
+                futures = [executor.submit(self._fetch_range, url, fh, start, end, lock) for start, end in ranges[1:]]
+                written += sum(future.result()[0] for future in futures)
+
+        fh.seek(written)
+        return written
+
+    def _fetch_range(self, url: str, fh, start: int, end: int = None, lock: threading.Lock = None) -> tuple:
+        """
+        Downloads bytes `start` to `end` (inclusive, None for the end of the file) into `fh`,
+        resuming from the last byte received when the connection drops.
+
+        Without `lock`, bytes are appended to `fh`. With it, they are written at their own
+        offset, so several ranges of the same file can be downloaded at once.
+
+        Returns:
+            Number of bytes written and whether the server honored the Range request.
+
+        Raises:
+            requests.HTTPError: The server answered with anything but 200, or 206 to a Range request.
+        """
+
+        position = start
+        ranged = True
+
+        for attempt in range(self.retries + 1):
+            headers = {"Accept-Encoding": ""}  # byte ranges only make sense on the unencoded file
+            if position or end is not None:
+                headers["Range"] = f"bytes={position}-{'' if end is None else end}"
+
+            try:
+                with self._host_slot(url):
+                    r = self.session.get(url, headers=headers, stream=True, timeout=self.timeout)
+                    try:
+                        # The session has already retried throttled and failed responses,
+                        # so an error body must not end up in the file.
+                        r.raise_for_status()
+                        if r.status_code != 200 and not (r.status_code == 206 and "Range" in headers):
+                            raise requests.HTTPError(f"Unexpected {r.status_code} response for {url}", response=r)
+
+                        # A server without range support sends the whole file instead,
+                        # skip the bytes before `position` and stop after `end`.
+                        ranged = r.status_code == 206 or "Range" not in headers
+                        skip = 0 if ranged else position
+                        for chunk in r.iter_content(chunk_size=self.chunk_size):
+                            if skip:
+                                chunk, skip = chunk[skip:], max(skip - len(chunk), 0)
+                            if end is not None and position + len(chunk) > end + 1:
+                                chunk = chunk[:end + 1 - position]
+
+                            if lock:
+                                with lock:
+                                    fh.seek(position)
+                                    fh.write(chunk)
+                            else:
+                                fh.write(chunk)
+                            position += len(chunk)
+
+                            if self.limiter:
+                                self.limiter.consume(len(chunk))
+
+                            if end is not None and position > end:
+                                break
+                    finally:
+                        r.close()
+
+                return position - start, ranged
+            except RESUMABLE_ERRORS as e:
+                if attempt == self.retries:
+                    raise
+
+                logger.debug("Download of %s dropped at byte %d, resuming: %s", url, position, e)
+                time.sleep(self.backoff_factor * (2 ** attempt))
+
+    @contextmanager
+    def _host_slot(self, url: str):
+        """Holds one of the `max_host_connections` connection slots of the URL's host."""
+
+        if not self.max_host_connections:
+            yield
+            return
+
+        host = urlsplit(url).netloc
+        with self._host_slots_lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.Semaphore(self.max_host_connections)
+            slot = self._host_slots[host]
+
+        with slot:
+            yield
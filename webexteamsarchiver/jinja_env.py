@@ -18,15 +18,16 @@ LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
-import jinja2
 import datetime
+import functools
 import re
-from hurry.filesize import size, alternative
 
-__all__ = ['env', 'sanitize_name']
+__all__ = ['get_env', 'sanitize_name']
 
 
 def filesize_format(size_bytes):
+    from hurry.filesize import size, alternative
+
     if not str(size_bytes).isdigit():
         return 0
 
@@ -72,16 +73,47 @@ def format_msg(text: str, thread: bool) -> str:
     return text
 
 
-env = jinja2.Environment(
-    autoescape=False,
-    trim_blocks=True,
-    lstrip_blocks=True,
-    keep_trailing_newline=True,
-    loader=jinja2.PackageLoader('webexteamsarchiver', 'templates')
-)
+@functools.lru_cache(maxsize=None)
+def get_env():
+    """
+    Returns the template environment, created on first use so that runs without
+    HTML or text transcripts never import jinja2.
+
+    Compiled templates are kept in jinja2's bytecode cache folder in the user's
+    temporary directory, so later runs load them instead of compiling them again.
+    Entries are keyed on the template source and the jinja2 version.
+    """
+
+    import jinja2
+
+    try:
+        bytecode_cache = jinja2.FileSystemBytecodeCache()
+    except (OSError, RuntimeError):
+        # No usable temporary directory, templates are compiled on every run.
+        bytecode_cache = None
+
+    env = jinja2.Environment(
+        autoescape=False,
+        trim_blocks=True,
+        lstrip_blocks=True,
+        keep_trailing_newline=True,
+        loader=jinja2.PackageLoader('webexteamsarchiver', 'templates'),
+        bytecode_cache=bytecode_cache,
+    )
+
+    env.filters['filesize_format'] = filesize_format
+    env.filters['person_letters'] = person_letters
+    env.filters['datetime_format'] = datetime_format
+    env.filters['sanitize_name'] = sanitize_name
+    env.filters['format_msg'] = format_msg
+
+    return env
+
+
+def __getattr__(name):
+    # `env` is created on first access. It is left out of __all__, so that a star import
+    # does not create it.
+    if name == "env":
+        return get_env()
 
-env.filters['filesize_format'] = filesize_format
-env.filters['person_letters'] = person_letters
-env.filters['datetime_format'] = datetime_format
-env.filters['sanitize_name'] = sanitize_name
-env.filters['format_msg'] = format_msg
+    raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
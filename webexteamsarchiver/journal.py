@@ -0,0 +1,229 @@
+"""Checkpoint Journal.
+
+Copyright (c) 2018-2021 Cisco and/or its affiliates.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import json
+import logging
+import os
+import threading
+import time
+
+__all__ = ['CheckpointJournal']
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+JOURNAL_FILENAME = ".checkpoint.jsonl"
+
+# People, attachment details and downloads are written and fsynced together, once this
+# many are waiting or the oldest has waited this long. Pages of messages are written at once.
+JOURNAL_BATCH_SIZE = 100
+JOURNAL_BATCH_SECONDS = 1.0
+
+
+class CheckpointJournal:
+    """
+    Append-only record of the progress of an archive run, kept inside the archive folder.
+
+    Every completed page of messages, resolved person, attachment detail and finished
+    download is appended as one JSON line. When a run is interrupted, the next run of the
+    same room replays the journal and only does the work that is still missing.
+
+    Pages of messages are on disk once `add_messages` returns. The other entries are written
+    in batches, so those recorded since the last `flush` can be lost and are then redone.
+
+    Args:
+        folder: Archive folder the journal belongs to.
+        room_id: ID of the room being archived.
+    """
+
+    def __init__(self, folder: str, room_id: str) -> None:
+        self.folder = folder
+        self.room_id = room_id
+        self.path = os.path.join(folder, JOURNAL_FILENAME)
+        self._lock = threading.Lock()
+
+        # Lines not written yet, and when the first of them was added.
+        self._pending = []
+        self._pending_since = None
+
+        # The messages themselves are read back with `read_messages`.
+        self.message_count = 0
+        self.last_message_id = None
+        self.messages_complete = False
+
+        # Structure: {"personId": {"person": dict} or {"not_found": dict}}
+        self.people = {}
+
+        # Structure: {"url": File dict}
+        self.attachments = {}
+
+        # Structure: {"folder_name": {"url": "filename"}}
+        self.downloads = {}
+
+        if os.path.isfile(self.path):
+            self._replay()
+        else:
+            os.makedirs(folder, exist_ok=True)
+            self._append({"type": "room", "room_id": room_id}, flush=True)
+
+    @staticmethod
+    def find(room_id: str, directory: str = ".") -> str:
+        """Returns the most recent archive folder in `directory` with an unfinished journal for `room_id`."""
+
+        candidates = []
+        for entry in os.scandir(directory):
+            path = os.path.join(entry.path, JOURNAL_FILENAME)
+            if not entry.is_dir() or not os.path.isfile(path):
+                continue
+
+            with open(path, "r", encoding="utf-8") as fh:
+                try:
+                    header = json.loads(fh.readline())
+                except ValueError:
+                    continue
+
+            if header.get("room_id") == room_id:
+                candidates.append((os.path.getmtime(path), entry.name))
+
+        return max(candidates)[1] if candidates else None
+
+    def add_messages(self, messages: list, complete: bool = False) -> None:
+        """Records a page of messages, and whether it was the last one."""
+
+        self._append({"type": "messages", "items": messages, "complete": complete}, flush=True)
+        self.message_count += len(messages)
+        if messages:
+            self.last_message_id = messages[-1]["id"]
+        self.messages_complete = complete
+
+    def read_messages(self):
+        """Yields the recorded messages, newest first, as dicts."""
+
+        self.flush()
+        with open(self.path, "r", encoding="utf-8") as fh:
+            for line in fh:
+                entry = json.loads(line)
+                if entry["type"] == "messages":
+                    yield from entry["items"]
+
+    def add_person(self, person_id: str, kind: str, person: dict) -> None:
+        """Records a resolved person. `kind` is "person" or "not_found"."""
+
+        self._append({"type": "person", "id": person_id, kind: person})
+        self.people[person_id] = {kind: person}
+
+    def add_attachment(self, url: str, file_metadata: dict) -> None:
+        """Records the File details of an attachment."""
+
+        self._append({"type": "attachment", "url": url, "file": file_metadata})
+        self.attachments[url] = file_metadata
+
+    def add_download(self, folder_name: str, url: str, filename: str) -> None:
+        """Records a finished download."""
+
+        self._append({"type": "download", "folder": folder_name, "url": url, "filename": filename})
+        self.downloads.setdefault(folder_name, {})[url] = filename
+
+    def flush(self) -> None:
+        """Makes sure every entry recorded so far is on disk."""
+
+        with self._lock:
+            self._write_pending()
+
+    def set_aside(self) -> None:
+        """Moves the journal next to its folder, so that compressing the folder leaves it out."""
+
+        with self._lock:
+            self._write_pending()
+            path = f"{os.path.normpath(self.folder)}{JOURNAL_FILENAME}"
+            os.replace(self.path, path)
+            self.path = path
+
+    def put_back(self) -> None:
+        """Moves a journal that was set aside back into its folder, where the next run finds it."""
+
+        with self._lock:
+            path = os.path.join(self.folder, JOURNAL_FILENAME)
+            if self.path != path:
+                os.replace(self.path, path)
+                self.path = path
+
+    def remove(self) -> None:
+        """Deletes the journal once the archive is complete."""
+
+        with self._lock:
+            self._pending = []
+        os.remove(self.path)
+
+    def _append(self, entry: dict, flush: bool = False) -> None:
+        """Appends `entry`, writing it out right away with `flush` or else with the rest of its batch."""
+
+        line = json.dumps(entry)
+        with self._lock:
+            self._pending.append(line)
+            if self._pending_since is None:
+                self._pending_since = time.monotonic()
+
+            if (flush or len(self._pending) >= JOURNAL_BATCH_SIZE
+                    or time.monotonic() - self._pending_since >= JOURNAL_BATCH_SECONDS):
+                self._write_pending()
+
+    def _write_pending(self) -> None:
+        """Writes and fsyncs the pending lines. The lock must be held."""
+
+        if not self._pending:
+            return
+
+        with open(self.path, "a", encoding="utf-8") as fh:
+            fh.write("".join(f"{line}\n" for line in self._pending))
+            fh.flush()
+            os.fsync(fh.fileno())
+
+        self._pending = []
+        self._pending_since = None
+
+    def _replay(self) -> None:
+        """Loads the progress recorded by the interrupted run."""
+
+        with open(self.path, "rb+") as fh:
+            for line in iter(fh.readline, b""):
+                try:
+                    entry = json.loads(line.decode("utf-8"))
+                except ValueError:
+                    # The run died halfway through writing its last entry, drop it
+                    # so the entries appended from now on start on a line of their own.
+                    logger.debug("Dropping truncated entry in %s.", self.path)
+                    fh.truncate(fh.tell() - len(line))
+                    break
+
+                if entry["type"] == "messages":
+                    self.message_count += len(entry["items"])
+                    if entry["items"]:
+                        self.last_message_id = entry["items"][-1]["id"]
+                    self.messages_complete = entry["complete"]
+                elif entry["type"] == "person":
+                    self.people[entry["id"]] = {k: v for k, v in entry.items() if k in ("person", "not_found")}
+                elif entry["type"] == "attachment":
+                    self.attachments[entry["url"]] = entry["file"]
+                elif entry["type"] == "download":
+                    self.downloads.setdefault(entry["folder"], {})[entry["url"]] = entry["filename"]
+
+        logger.info("Resuming from %s: %d messages, %d people, %d downloads already done.", self.path,
+                    self.message_count, len(self.people), sum(len(d) for d in self.downloads.values()))
@@ -0,0 +1,124 @@
+"""Archive Run Metrics.
+
+Copyright (c) 2018-2021 Cisco and/or its affiliates.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import logging
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+__all__ = ['RunMetrics']
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+class RunMetrics:
+    """
+    Wall time per stage and counters of one archive run.
+
+    Collecting them only costs a clock read per stage and a counter update per API call
+    or file, so it is always on. `progress_callback(stage, metrics)` is called when a stage
+    starts, when it ends and, during downloads, after every file; `download_scheduler.status()`
+    then tells how many files are left.
+
+    Args:
+        progress_callback: Called with the stage name and this RunMetrics, or None.
+        http_retries: Counter of HTTP retries and 429 responses shared by the archiver's
+                      session. Only the retries counted after this point are reported.
+    """
+
+    def __init__(self, progress_callback=None, http_retries: Counter = None) -> None:
+        self.progress_callback = progress_callback
+        self.current_stage = None
+
+        # Structure: {"stage": seconds}, in the order the stages ran
+        self.stages = {}
+
+        # HTTP requests by endpoint, every page of a list counting: {"endpoint": count}
+        self.api_calls = Counter()
+
+        # Retries and 429 responses of the API requests: {"retries": count, "http_429": count}
+        self._api_retries = Counter()
+
+        # Structure: {"counter": value}, e.g. bytes_downloaded
+        self.counters = Counter()
+
+        # DownloadScheduler of the run, once downloads start.
+        self.download_scheduler = None
+
+        self._http_retries = http_retries if http_retries is not None else Counter()
+        self._http_retries_start = Counter(self._http_retries)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str):
+        """Times the stage `name`. Stages that run more than once add up."""
+
+        self.current_stage = name
+        self.progress(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+            logger.debug("Stage %s took %.3fs.", name, self.stages[name])
+            self.current_stage = None
+            self.progress(name)
+
+    def add(self, counter: str, value: int = 1) -> None:
+        """Adds `value` to `counter`. Safe to call from any thread."""
+
+        with self._lock:
+            self.counters[counter] += value
+
+    def add_request(self, endpoint: str, status: int, retried: bool = False) -> None:
+        """Counts a request to `endpoint` answered with `status`, `retried` or not. Safe to call from any thread."""
+
+        with self._lock:
+            self.api_calls[endpoint] += 1
+            if status == 429:
+                self._api_retries["http_429"] += 1
+            if retried:
+                self._api_retries["retries"] += 1
+
+    def progress(self, stage: str = None) -> None:
+        """Reports progress of `stage`, the current stage by default, to the progress callback."""
+
+        if self.progress_callback:
+            self.progress_callback(stage or self.current_stage, self)
+
+    def to_dict(self) -> dict:
+        """Returns the metrics as a JSON serializable dict."""
+
+        http_retries = self._http_retries - self._http_retries_start + self._api_retries
+        metrics = {
+            "stages": {name: round(seconds, 3) for name, seconds in self.stages.items()},
+            "total_seconds": round(sum(self.stages.values()), 3),
+            "api_calls": dict(self.api_calls),
+            "http_retries": http_retries["retries"],
+            "http_429": http_retries["http_429"],
+            **self.counters,
+        }
+
+        if self.download_scheduler:
+            metrics["downloads"] = self.download_scheduler.status()
+
+        return metrics
@@ -0,0 +1,151 @@
+"""Compact Message Records.
+
+Copyright (c) 2018-2021 Cisco and/or its affiliates.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import sys
+from collections.abc import Sequence
+from webexteamssdk.utils import WebexTeamsDateTime
+
+__all__ = ['MessageRecord', 'ReversedView']
+
+# Message fields the archiver reads, kept in attributes of their own: {"JSON key": "attribute"}
+FIELDS = {
+    "id": "id",
+    "parentId": "parentId",
+    "personId": "personId",
+    "personEmail": "personEmail",
+    "text": "text",
+    "html": "html",
+    "files": "files",
+    "created": "_created",
+}
+
+# Fields repeated across the messages of a room, stored once per distinct value.
+INTERNED_FIELDS = ("roomId", "roomType")
+
+# Distinct key orders of the messages seen so far, so every record shares one tuple per order.
+_key_orders = {}
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class MessageRecord:
+    """
+    Message of a room, holding the same data as a webexteamssdk Message in a fraction of the memory.
+
+    The fields the archiver reads are attributes of their own and every other field of
+    the message JSON is kept in a tuple, so no dict is kept per message. The room ID and
+    type, person IDs, e-mails and parent IDs are interned, since large rooms repeat them
+    over and over. `to_dict()` gives back the original JSON, keys in the original order.
+
+    Args:
+        data: Message JSON as returned by the messages API.
+    """
+
+    __slots__ = ("id", "parentId", "personId", "personEmail", "text", "html", "files", "_created",
+                 "_keys", "_other")
+
+    def __init__(self, data: dict) -> None:
+        keys = tuple(data)
+        self._keys = _key_orders.setdefault(keys, keys)
+
+        self.id = data.get("id")
+        self.parentId = _intern(data.get("parentId"))
+        self.personId = _intern(data.get("personId"))
+        self.personEmail = _intern(data.get("personEmail"))
+        self.text = data.get("text")
+        self.html = data.get("html")
+        self.files = tuple(data["files"]) if data.get("files") is not None else None
+        self._created = data.get("created")
+
+        self._other = tuple(_intern(data[key]) if key in INTERNED_FIELDS else data[key]
+                            for key in keys if key not in FIELDS)
+
+    @property
+    def created(self):
+        """The date and time the message was created, as a WebexTeamsDateTime."""
+        return WebexTeamsDateTime.strptime(self._created) if self._created else None
+
+    @property
+    def created_raw(self) -> str:
+        """The `created` string of the message JSON, without parsing it."""
+        return self._created
+
+    @property
+    def json_data(self) -> dict:
+        """A copy of the message JSON, like webexteamssdk Message.json_data."""
+        return self.to_dict()
+
+    def __getattr__(self, item):
+        """Gives access to the other message fields, like a webexteamssdk Message."""
+
+        if item.startswith("_"):
+            raise AttributeError(item)
+
+        other = [key for key in self._keys if key not in FIELDS]
+        if item in other:
+            return self._other[other.index(item)]
+
+        raise AttributeError(f"'{self.__class__.__name__}' object has no attribute '{item}'")
+
+    def to_dict(self) -> dict:
+        """Returns the message JSON."""
+
+        other = iter(self._other)
+        data = {}
+        for key in self._keys:
+            if key not in FIELDS:
+                data[key] = next(other)
+            elif key == "files":
+                data[key] = list(self.files) if self.files is not None else None
+            else:
+                data[key] = getattr(self, FIELDS[key])
+
+        return data
+
+
+class ReversedView(Sequence):
+    """Read-only view of a list in reverse order, without copying it."""
+
+    __slots__ = ("_items",)
+
+    def __init__(self, items: list) -> None:
+        self._items = items
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("ReversedView index out of range")
+
+        return self._items[len(self._items) - 1 - index]
+
+    def __iter__(self):
+        return reversed(self._items)
+
+    def __reversed__(self):
+        return iter(self._items)
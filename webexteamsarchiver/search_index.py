@@ -0,0 +1,201 @@
+"""SQLite Search Index.
+
+Copyright (c) 2018-2021 Cisco and/or its affiliates.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import datetime
+import logging
+import sqlite3
+from collections import namedtuple
+from .records import MessageRecord
+
+__all__ = ['SearchIndex', 'SearchResult', 'AttachmentResult']
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+SearchResult = namedtuple("SearchResult", "id parent_id person_id person_email display_name created text")
+AttachmentResult = namedtuple("AttachmentResult", "message_id url filename size content_type")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id TEXT PRIMARY KEY,
+    parent_id TEXT,
+    person_id TEXT,
+    person_email TEXT,
+    created TEXT,
+    text TEXT
+);
+CREATE INDEX IF NOT EXISTS messages_created ON messages (created);
+CREATE INDEX IF NOT EXISTS messages_person_id ON messages (person_id);
+CREATE TABLE IF NOT EXISTS people (
+    id TEXT PRIMARY KEY,
+    display_name TEXT,
+    email TEXT
+);
+CREATE TABLE IF NOT EXISTS attachments (
+    message_id TEXT,
+    url TEXT,
+    filename TEXT,
+    size INTEGER,
+    content_type TEXT,
+    PRIMARY KEY (message_id, url)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(text, content='messages', content_rowid='rowid');
+CREATE VIRTUAL TABLE IF NOT EXISTS attachments_fts USING fts5(filename, content='attachments', content_rowid='rowid');
+"""
+
+
+class SearchIndex:
+    """
+    SQLite database of a room's messages, people and attachments, with FTS5 full-text indexes
+    on message text and attachment file names.
+
+    `archive_room(..., search_index=True)` writes one next to the transcripts as roomTitle.sqlite.
+    Open it again with `SearchIndex(path)` to search it without reading the transcripts.
+
+    Args:
+        path: Database file. Created if it does not exist.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._db = sqlite3.connect(path)
+        self._db.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._db.close()
+
+    def add_room(self, messages: list, people: dict, attachments: dict) -> None:
+        """
+        Adds the room in a single transaction and rebuilds the full-text indexes.
+
+        Args:
+            messages: MessageRecord or webexteamssdk Message objects.
+            people: {"personId": Person} of the message authors.
+            attachments: {"url": File} of the files in the messages.
+        """
+
+        with self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO messages VALUES (?, ?, ?, ?, ?, ?)",
+                ((msg.id, getattr(msg, "parentId", None), msg.personId, msg.personEmail,
+                  msg.created_raw if isinstance(msg, MessageRecord) else msg.json_data.get("created"), msg.text)
+                 for msg in messages)
+            )
+            self._db.executemany(
+                "INSERT OR REPLACE INTO people VALUES (?, ?, ?)",
+                ((person_id, person.displayName, person.emails[0] if person.emails else None)
+                 for person_id, person in people.items())
+            )
+            self._db.executemany(
+                "INSERT OR REPLACE INTO attachments VALUES (?, ?, ?, ?, ?)",
+                ((msg.id, url, attachments[url].filename, _to_int(attachments[url].content_length),
+                  attachments[url].content_type)
+                 for msg in messages if msg.files for url in msg.files if url in attachments)
+            )
+            self._db.execute("INSERT INTO messages_fts (messages_fts) VALUES ('rebuild')")
+            self._db.execute("INSERT INTO attachments_fts (attachments_fts) VALUES ('rebuild')")
+
+        logger.debug("Indexed %d messages in %s.", len(messages), self.path)
+
+    def search(self, query: str = None, person: str = None, since=None, until=None,
+               limit: int = 100) -> list:
+        """
+        Searches messages, newest first.
+
+        Args:
+            query: FTS5 query on the message text, e.g. 'budget AND "q3 forecast"'.
+            person: Sender's person ID or e-mail address.
+            since: Only messages created at or after this datetime or ISO 8601 string.
+            until: Only messages created before this datetime or ISO 8601 string.
+            limit: Maximum number of results.
+
+        Returns:
+            List of SearchResult.
+        """
+
+        sql = (
+            "SELECT m.id, m.parent_id, m.person_id, m.person_email, p.display_name, m.created, m.text "
+            "FROM messages m LEFT JOIN people p ON p.id = m.person_id"
+        )
+        conditions, params = [], []
+
+        if query:
+            conditions.append("m.rowid IN (SELECT rowid FROM messages_fts WHERE messages_fts MATCH ?)")
+            params.append(query)
+
+        if person:
+            conditions.append("(m.person_id = ? OR m.person_email = ? COLLATE NOCASE)")
+            params += [person, person]
+
+        if since:
+            conditions.append("m.created >= ?")
+            params.append(_to_timestamp(since))
+
+        if until:
+            conditions.append("m.created < ?")
+            params.append(_to_timestamp(until))
+
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+
+        sql += " ORDER BY m.created DESC LIMIT ?"
+        params.append(limit)
+
+        return [SearchResult(*row) for row in self._db.execute(sql, params)]
+
+    def search_attachments(self, query: str, limit: int = 100) -> list:
+        """
+        Searches attachments by file name.
+
+        Args:
+            query: FTS5 query on the file name, e.g. 'report*'.
+            limit: Maximum number of results.
+
+        Returns:
+            List of AttachmentResult.
+        """
+
+        rows = self._db.execute(
+            "SELECT message_id, url, filename, size, content_type FROM attachments "
+            "WHERE rowid IN (SELECT rowid FROM attachments_fts WHERE attachments_fts MATCH ?) LIMIT ?",
+            (query, limit)
+        )
+        return [AttachmentResult(*row) for row in rows]
+
+
+def _to_int(value) -> int:
+    return int(value) if str(value).isdigit() else None
+
+
+def _to_timestamp(value) -> str:
+    """Formats a datetime like the `created` timestamps of the Webex Teams API. Strings are used as is."""
+
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo:
+            value = value.astimezone(datetime.timezone.utc)
+        return f"{value.strftime('%Y-%m-%dT%H:%M:%S')}.{value.microsecond // 1000:03d}Z"
+
+    return str(value)
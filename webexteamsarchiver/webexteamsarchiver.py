@@ -19,22 +19,38 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 import concurrent.futures
+import copy
+import itertools
 import os
+import random
 import re
 import requests
 import shutil
+import tempfile
+import threading
 import logging
 import json
 import datetime
-from collections import namedtuple
+from collections import namedtuple, Counter
+from contextlib import contextmanager
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlsplit
+from urllib3.util.retry import Retry
 from webexteamssdk import WebexTeamsAPI
 from webexteamssdk.exceptions import MalformedResponse, ApiError
-from webexteamssdk.models.immutable import Person
-from webexteamssdk.generator_containers import GeneratorContainer
-from .jinja_env import env as jinja_env
-from .jinja_env import sanitize_name
-
-__all__ = ['WebexTeamsArchiver', 'File', 'UserNotFound', 'UserApiFailed']
+from webexteamssdk.models.immutable import Person, Room
+from .archive_writer import ArchiveWriter
+from .cache import FileCache
+from .compression import compress_folder as compress_archive_folder, import_zstandard
+from .downloader import BandwidthLimiter, Downloader, DownloadScheduler, DOWNLOAD_SEGMENT_WORKERS
+from .journal import CheckpointJournal
+from .metrics import RunMetrics
+from .records import MessageRecord, ReversedView
+from .search_index import SearchIndex
+from .jinja_env import get_env as jinja_env
+from .jinja_env import sanitize_name, datetime_format
+
+__all__ = ['WebexTeamsArchiver', 'File', 'UserNotFound', 'UserApiFailed', 'ArchiveResult']
 
 File = namedtuple(
     "File", "content_disposition content_length content_type filename deleted")
@@ -47,9 +63,133 @@ UserApiFailed = namedtuple(
     "UserApiFailed", "id emails displayName avatar"
 )
 
+ArchiveResult = namedtuple(
+    "ArchiveResult", "room_id filename error metrics"
+)
+
+# Message as the transcript templates render it: author and files already resolved,
+# `created` already formatted and `replies` holding the thread's RenderMessages.
+RenderMessage = namedtuple(
+    "RenderMessage", "id created text html display_name email avatar files replies"
+)
+
+# Page of a paginated HTML transcript, as listed on its index page.
+HtmlPage = namedtuple("HtmlPage", "filename title messages first last images")
+
+# Client, per-stage concurrency limits and in-flight downloads of an archive_room_async run.
+_AsyncPipeline = namedtuple(
+    "_AsyncPipeline", "client people_slots probe_slots download_slots downloads"
+)
+
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+# Retries for attachment/avatar requests. 429 and 503 responses wait for
+# their Retry-After header, everything else backs off exponentially.
+HTTP_RETRIES = 5
+HTTP_BACKOFF_FACTOR = 0.5
+HTTP_RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Transcripts are rendered straight to disk: Jinja yields RENDER_BUFFER_ITEMS
+# template chunks at a time into a file with a WRITE_BUFFER_SIZE bytes buffer.
+RENDER_BUFFER_ITEMS = 100
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+# Image attachments previewed per page on the index page of paginated HTML transcripts.
+INDEX_IMAGES = 6
+
+# Messages recorded per checkpoint journal entry.
+CHECKPOINT_PAGE_SIZE = 1000
+
+
+class _JitterRetry(Retry):
+    """
+    Retry policy that adds random jitter to urllib3's exponential backoff, and counts the
+    retries and 429 responses in `counter` ({"retries": count, "http_429": count}).
+    """
+
+    _counter_lock = threading.Lock()
+
+    def __init__(self, *args, counter: Counter = None, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.counter = counter
+
+    def new(self, **kwargs):
+        retry = super().new(**kwargs)
+        retry.counter = self.counter
+        return retry
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        # Raises instead when the retries are exhausted, which is not counted as a retry.
+        retry = super().increment(method, url, response, error, _pool, _stacktrace)
+
+        if self.counter is not None:
+            with self._counter_lock:
+                self.counter["retries"] += 1
+                if response is not None and response.status == 429:
+                    self.counter["http_429"] += 1
+
+        return retry
+
+    def get_backoff_time(self) -> float:
+        backoff = super().get_backoff_time()
+        return random.uniform(backoff / 2, backoff)
+
+
+class _CountingSession:
+    """
+    Stands in for the requests Session of a webexteamssdk RestSession and counts every HTTP
+    request sent through it, every page of a list and every request the SDK repeats after a
+    429 included, in the RunMetrics the calling thread is archiving for (see `track`).
+    """
+
+    _local = threading.local()
+    _install_lock = threading.Lock()
+
+    def __init__(self, rest_session) -> None:
+        self._rest_session = rest_session
+        self._session = rest_session._req_session
+
+    def __getattr__(self, item):
+        return getattr(self._session, item)
+
+    @classmethod
+    def install(cls, sdk) -> None:
+        """Puts a _CountingSession under the RestSession of `sdk`, unless it has one already."""
+
+        rest_session = getattr(sdk, "_session", None)
+        with cls._install_lock:
+            if hasattr(rest_session, "_req_session") and not isinstance(rest_session._req_session, cls):
+                rest_session._req_session = cls(rest_session)
+
+    @classmethod
+    def track(cls, metrics: RunMetrics) -> None:
+        """Counts the requests made from the current thread in `metrics` from now on."""
+        cls._local.metrics = metrics
+
+    def request(self, method: str, url: str, *args, **kwargs):
+        response = self._session.request(method, url, *args, **kwargs)
+
+        metrics = getattr(self._local, "metrics", None)
+        if metrics:
+            metrics.add_request(self._endpoint(method, url), response.status_code,
+                                response.status_code == 429 and self._rest_session.wait_on_rate_limit)
+
+        return response
+
+    def _endpoint(self, method: str, url: str) -> str:
+        """Names the endpoint of `url` like "messages.list", "people.me" or "rooms.get"."""
+
+        path = urlsplit(url).path
+        base_path = urlsplit(self._rest_session.base_url).path
+        parts = (path[len(base_path):] if path.startswith(base_path) else path).strip("/").split("/")
+
+        if method != "GET":
+            return f"{parts[0]}.{method.lower()}"
+        if len(parts) == 1:
+            return f"{parts[0]}.list"
+        return f"{parts[0]}.me" if parts[1] == "me" else f"{parts[0]}.get"
+
 
 class WebexTeamsArchiver:
     """
@@ -59,17 +199,83 @@ class WebexTeamsArchiver:
         access_token: User's personal Webex Teams API bearer token.
         single_request_timeout: Timeout in seconds for the API requests.
         special_token: The supplied access_token has access to all messages in a space.
+        file_cache: Cache of downloaded attachments and avatars, shared across runs.
 
     Raises:
         webexteamssdkException: An error occurred calling the Webex Teams API.
     """
 
-    def __init__(self, access_token: str, single_request_timeout: int = 60, special_token: bool = False) -> None:
+    # Archive folder names in use by this process, so concurrent runs never share one.
+    _reserved_folder_names = set()
+    _reserved_folder_names_lock = threading.Lock()
+
+    def __init__(self, access_token: str, single_request_timeout: int = 60, special_token: bool = False,
+                 file_cache: FileCache = None) -> None:
         self.access_token = access_token
         self.special_token = special_token
+        self.single_request_timeout = single_request_timeout
+        self.file_cache = file_cache
+
+        # People looked up by the rooms of the same archive_rooms call, including the lookups
+        # still in flight: {"personId": Future}
+        self._people_cache = None
+        self._people_cache_lock = None
+
+        # Downloader of the same archive_rooms call, so its bandwidth and per-host limits cover all rooms.
+        self._shared_downloader = None
+
+        # Called with the stage name and the RunMetrics as a run progresses.
+        self._progress_callback = None
+
+        # Retries and 429 responses of the session below: {"retries": count, "http_429": count}
+        self._http_retries = Counter()
         self.sdk = WebexTeamsAPI(
             self.access_token, single_request_timeout=single_request_timeout)
 
+        # Shared by every file_details/_download_file call, so connections
+        # to the file servers are kept alive and reused across threads.
+        self.session = requests.Session()
+        self.session.headers["Authorization"] = f"Bearer {self.access_token}"
+        self._pool_size = 0
+        self._resize_session_pool(15)
+
+    def _resize_session_pool(self, pool_size: int) -> None:
+        """Mounts a retrying connection pool that can hold at least `pool_size` connections per host."""
+
+        if pool_size <= self._pool_size:
+            return
+
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=self._retry())
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._pool_size = pool_size
+
+    def _retry(self) -> _JitterRetry:
+        """Returns the retry policy of the session, counting retries in `_http_retries`."""
+
+        return _JitterRetry(
+            total=HTTP_RETRIES,
+            backoff_factor=HTTP_BACKOFF_FACTOR,
+            status_forcelist=HTTP_RETRY_STATUSES,
+            raise_on_status=False,
+            counter=self._http_retries,
+        )
+
+    def _use_pools_of(self, session: requests.Session) -> None:
+        """
+        Replaces the session with one that sends requests through the connection pools of `session`,
+        but counts its retries in a `_http_retries` of its own. The new session must not be closed,
+        which would close the pools of `session`.
+        """
+
+        self._http_retries = Counter()
+        self.session = requests.Session()
+        self.session.headers.update(session.headers)
+        for prefix in ("https://", "http://"):
+            adapter = HTTPAdapter(max_retries=self._retry())
+            adapter.poolmanager = session.get_adapter(prefix).poolmanager
+            self.session.mount(prefix, adapter)
+
     def file_details(self, url: str) -> File:
         """
         Retrieves the file details using the Webex Teams attachments endpoint.
@@ -83,30 +289,35 @@ class WebexTeamsArchiver:
         """
 
         headers = {
-            "Authorization": f"Bearer {self.access_token}",
             "Accept-Encoding": "",  # ensures content-length always gets returned
         }
 
-        r = requests.head(url, headers=headers)
-        if r.status_code == 404:
+        r = self.session.head(url, headers=headers, timeout=self.single_request_timeout)
+        return self._file_from_headers(url, r.status_code, r.headers)
+
+    @staticmethod
+    def _file_from_headers(url: str, status_code: int, headers) -> File:
+        """Builds the File details from the status code and headers of a HEAD request to `url`."""
+
+        if status_code == 404:
             # Item must have been deleted since url was retrieved
             return File("", 0, "", "", True)
 
-        if r.ok:
+        if 200 <= status_code < 400:
             filename_re = re.search(r"filename=\"(.+?)\"",
-                                    r.headers.get("Content-Disposition", ""), re.I)
+                                    headers.get("Content-Disposition", ""), re.I)
 
             if not filename_re:
                 new_filename = re.sub(r'^.+/([^/]+)$', r'\1', url)
                 message = (
-                    f"Set filename to '{new_filename}' in {r.headers.get('Content-Disposition', '')} for url {url}"
+                    f"Set filename to '{new_filename}' in {headers.get('Content-Disposition', '')} for url {url}"
                 )
                 logger.debug(message)
                 filename_re = re.search(r"filename=\"(.+?)\"", f"filename=\"{new_filename}\"", re.I)
 
-            return File(r.headers.get("Content-Disposition", ""),
-                        r.headers.get("Content-Length", 0),
-                        r.headers.get("Content-Type", ""),
+            return File(headers.get("Content-Disposition", ""),
+                        headers.get("Content-Length", 0),
+                        headers.get("Content-Type", ""),
                         sanitize_name(filename_re.group(1)),
                         False)
         else:
@@ -133,15 +344,44 @@ class WebexTeamsArchiver:
                 reverse_order: Order messages by most recent on the bottom.
                 download_attachments: Download attachments sent to the room.
                 download_avatars: Download avatar images.
-                download_workers: Number of download workers for downloading files.
+                download_workers: Number of download workers for downloading files and
+                                  retrieving their details.
+                download_chunk_size: Read buffer size in bytes for downloads.
+                segment_size: Download files larger than this many bytes as parallel
+                              byte-range segments of this size.
+                max_bandwidth: Download bandwidth limit in bytes per second, for attachments
+                               and avatars together.
+                max_host_connections: Maximum number of downloads from the same host at a time.
+                people_workers: Number of concurrent people API lookups.
+                message_shards: Split the room's lifetime into this many time windows and page
+                                their messages concurrently.
                 timestamp_format: Timestamp strftime format.
-                file_format: Archive format as supported by shutil.make_archive
-                
+                file_format: Archive format as supported by shutil.make_archive, or "zstd" for a
+                             .tar.zst archive (pip install webexteamsarchiver[zstd]).
+                compress_workers: Number of threads compressing gztar and zstd archives, defaults
+                                  to the number of CPUs.
+                html_pages: Split the HTML version into pages of this many messages, or "month"
+                            for a page per month, linked from roomTitle.html.
+                ndjson: Write the json version as newline-delimited JSON, one message per line.
+                search_index: Write roomTitle.sqlite, a SQLite full-text index of the messages,
+                              people and attachments that `SearchIndex` can query.
+                direct_archive: Write straight into the compressed archive, without an archive folder.
+                incremental: Only fetch messages posted since the previous incremental run.
+                state_file: Incremental state file, defaults to roomId.state.json.
+                checkpoint: Journal progress inside the archive folder so an interrupted run
+                            of the same room resumes where it stopped. Failed downloads are
+                            recorded in space_details.json instead of aborting the archive.
+                stats: Write the run's metrics (`self.metrics`) into space_details.json.
+                progress_callback: Called with the stage name and `self.metrics` when a stage
+                                   starts and ends, and after every download.
+
 
         Returns:
-            Name of archive file.
+            Name of archive file. Stage timings, API calls, retries and bytes of the run are
+            left in `self.metrics`.
 
         Raises:
+            ImportError: file_format is zstd and zstandard is not installed.
             IOError: Error occurred while creating/writing to files.
             shutil.Error: Error occurred creating/copying/deleting files/folders.
             ValueError: Exception message will contain more details.
@@ -155,101 +395,613 @@ class WebexTeamsArchiver:
         download_attachments = options.get("download_attachments", True)
         download_avatars = options.get("download_avatars", True)
         download_workers = options.get("download_workers", 15)
+        people_workers = options.get("people_workers", 10)
+        message_shards = options.get("message_shards", None)
+        download_chunk_size = options.get("download_chunk_size", WRITE_BUFFER_SIZE)
+        segment_size = options.get("segment_size", None)
+        max_bandwidth = options.get("max_bandwidth", None)
+        max_host_connections = options.get("max_host_connections", None)
         timestamp_format = options.get("timestamp_format", "%Y-%m-%dT%H:%M:%S")
         file_format = options.get("file_format", "gztar")
+        compress_workers = options.get("compress_workers", None)
+        html_pages = options.get("html_pages", None)
+        ndjson = options.get("ndjson", False)
+        search_index = options.get("search_index", False)
+        direct_archive = options.get("direct_archive", False)
+        incremental = options.get("incremental", False)
+        state_file = options.get("state_file", f"{sanitize_name(room_id)}.state.json")
+        checkpoint = options.get("checkpoint", False)
+        stats = options.get("stats", False)
+        self._progress_callback = options.get("progress_callback", None)
 
         if delete_folder and not compress_folder:
             raise ValueError("delete_folder cannot be True while compress_folder is False") 
 
-        self._gather_room_information(room_id, download_avatars)
+        if file_format == "zstd" and compress_folder:
+            # Fail before downloading anything rather than when compressing.
+            import_zstandard()
+
+        # bool is an int, but html_pages=True is not a page size.
+        if html_pages is not None and html_pages != "month" and (
+                isinstance(html_pages, bool) or not isinstance(html_pages, int) or html_pages < 1):
+            raise ValueError("html_pages must be a positive number of messages or \"month\"")
+
+        if direct_archive and not compress_folder:
+            raise ValueError("direct_archive cannot be True while compress_folder is False")
+
+        if direct_archive and checkpoint:
+            raise ValueError("direct_archive cannot be True while checkpoint is True")
+
+        if message_shards is not None and not (isinstance(message_shards, int) and message_shards > 0):
+            raise ValueError("message_shards must be a positive number")
+
+        if message_shards and message_shards > 1 and checkpoint:
+            raise ValueError("message_shards cannot be set while checkpoint is True")
+
+        # The rooms of an archive_rooms call share the connection pool it sized for all of them.
+        if not self._shared_downloader:
+            self._resize_session_pool(download_workers * (DOWNLOAD_SEGMENT_WORKERS if segment_size else 1))
+        self._downloader = self._shared_downloader or Downloader(
+            self.session, self.single_request_timeout, download_chunk_size, segment_size, HTTP_RETRIES,
+            HTTP_BACKOFF_FACTOR, BandwidthLimiter(max_bandwidth) if max_bandwidth else None,
+            max_host_connections)
+
+        state = self._load_state(state_file, room_id) if incremental else None
+        self._journal = None
+        try:
+            self._gather_room_information(room_id, download_avatars, download_workers, people_workers, state,
+                                          checkpoint, message_shards)
+        except Exception:
+            if self._journal:
+                self._journal.flush()
+                self._release_folder_name()
+            raise
+
+        self._archive_writer = (ArchiveWriter(self.archive_folder_name, file_format, compress_workers)
+                                if direct_archive else None)
 
         # Prepare folder
         self._setup_folder(download_attachments, download_avatars, html_format)
         try:
             self._archive(reverse_order, download_attachments, download_avatars, download_workers,
-                          text_format, html_format, json_format, timestamp_format)
-            
-            if compress_folder:
-                filename = self._compress_folder(file_format)
-            else:
-                filename = self.archive_folder_name
+                          text_format, html_format, json_format, timestamp_format, ndjson, html_pages,
+                          search_index, stats)
+
+            if self._journal:
+                # Out of the archive, but not deleted until the archive is complete.
+                self._journal.set_aside()
+
+            with self.metrics.stage("compress"):
+                if direct_archive:
+                    filename = self._archive_writer.close()
+                elif compress_folder:
+                    filename = self._compress_folder(file_format, compress_workers)
+                else:
+                    filename = self.archive_folder_name
+
+            if direct_archive or compress_folder:
+                self.metrics.add("archive_bytes", os.path.getsize(filename))
         except Exception:
-            self._tear_down_folder()
+            if direct_archive:
+                self._archive_writer.discard()
+
+            if self._journal:
+                logger.error("Archiving room %s stopped, archive_room with checkpoint=True resumes from %s.",
+                             room_id, self.archive_folder_name)
+                self._journal.put_back()
+                self._journal.flush()
+                self._release_folder_name()
+            else:
+                self._tear_down_folder()
             raise
 
+        if self._journal:
+            self._journal.remove()
+
+        if incremental:
+            self._save_state(state_file, state, download_attachments, download_avatars,
+                             not delete_folder and not direct_archive)
+
+        if delete_folder:
+            self._tear_down_folder()
+
+        return filename
+
+    def archive_rooms(self, room_ids: list, room_workers: int = 4, **options) -> list:
+        """
+        Archives several Webex Teams rooms concurrently. Rooms share the HTTP connection pool,
+        the file cache and the people already looked up, and a room that fails to archive
+        does not stop the others.
+
+        Args:
+            room_ids: IDs of the rooms to archive, e.g. from `self.sdk.rooms.list()`.
+            room_workers: Number of rooms archived at the same time.
+            options: Same arguments and options as `archive_room`.
+
+        Returns:
+            ArchiveResult for every room, in the order of `room_ids`. `filename` is set
+            if the room was archived, `error` holds the exception raised otherwise.
+            `metrics` holds the room's RunMetrics.to_dict(), None if it failed before
+            its run started.
+        """
+
+        self._resize_session_pool(room_workers * options.get("download_workers", 15)
+                                  * (DOWNLOAD_SEGMENT_WORKERS if options.get("segment_size", None) else 1))
+        people_cache = {}
+        people_cache_lock = threading.Lock()
+        max_bandwidth = options.get("max_bandwidth", None)
+        downloader = Downloader(
+            self.session, self.single_request_timeout, options.get("download_chunk_size", WRITE_BUFFER_SIZE),
+            options.get("segment_size", None), HTTP_RETRIES, HTTP_BACKOFF_FACTOR,
+            BandwidthLimiter(max_bandwidth) if max_bandwidth else None, options.get("max_host_connections", None))
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=room_workers) as executor:
+            return list(executor.map(
+                lambda room_id: self._archive_room_worker(room_id, people_cache, people_cache_lock, downloader,
+                                                          options), room_ids))
+
+    def _archive_room_worker(self, room_id: str, people_cache: dict, people_cache_lock: threading.Lock,
+                             downloader: Downloader, options: dict) -> ArchiveResult:
+        """Archives one room of `archive_rooms` on a copy of this archiver, so per-room state is not shared."""
+
+        worker = copy.copy(self)
+        worker._people_cache = people_cache
+        worker._people_cache_lock = people_cache_lock
+        worker.metrics = None
+
+        # Same connections, host slots and bandwidth limit as the other rooms, own retry counts.
+        worker._use_pools_of(self.session)
+        worker._shared_downloader = copy.copy(downloader)
+        worker._shared_downloader.session = worker.session
+
+        try:
+            filename, error = worker.archive_room(room_id, **options), None
+        except Exception as e:
+            logger.error("Failed to archive room %s: %s", room_id, e)
+            filename, error = None, e
+
+        return ArchiveResult(room_id, filename, error, worker.metrics.to_dict() if worker.metrics else None)
+
+    async def archive_room_async(self, room_id: str, text_format: bool = True, html_format: bool = True,
+                                 json_format: bool = True, **options) -> str:
+        """
+        Archives a Webex Teams room like `archive_room`, using asyncio and aiohttp
+        (pip install webexteamsarchiver[async]).
+
+        Message pagination, people lookups, attachment details and downloads all overlap in one
+        event loop: people and files are looked up as soon as the page mentioning them arrives,
+        and files start downloading as soon as their details are known. The archive produced is
+        the same as the one produced by `archive_room`.
+
+        Args:
+            room_id: ID of the room to archive.
+            text_format: Create a text version of the archive.
+            html_format: Create an HTML version of the archive.
+            json_format: Create a json version of the archive.
+
+            Options:
+                Same as `archive_room`, except for direct_archive, incremental, checkpoint,
+                message_shards, stats and progress_callback, plus:
+                max_connections: Maximum number of requests in flight.
+                requests_per_second: Global request rate limit.
+
+        Returns:
+            Name of archive file.
+
+        Raises:
+            ImportError: aiohttp, or zstandard for the zstd file_format, is not installed.
+            IOError: Error occurred while creating/writing to files.
+            shutil.Error: Error occurred creating/copying/deleting files/folders.
+            ValueError: Exception message will contain more details.
+            aiohttp.ClientError: An error occurred calling the Webex Teams API.
+        """
+        import asyncio
+        from .async_client import AsyncWebexClient
+
+        # Configure options
+        compress_folder = options.get("compress_folder", True)
+        delete_folder = options.get("delete_folder", False)
+        reverse_order = options.get("reverse_order", True)
+        download_attachments = options.get("download_attachments", True)
+        download_avatars = options.get("download_avatars", True)
+        download_workers = options.get("download_workers", 15)
+        people_workers = options.get("people_workers", 10)
+        timestamp_format = options.get("timestamp_format", "%Y-%m-%dT%H:%M:%S")
+        file_format = options.get("file_format", "gztar")
+        compress_workers = options.get("compress_workers", None)
+        html_pages = options.get("html_pages", None)
+        ndjson = options.get("ndjson", False)
+        search_index = options.get("search_index", False)
+        max_connections = options.get("max_connections", 100)
+        requests_per_second = options.get("requests_per_second", None)
+
+        if delete_folder and not compress_folder:
+            raise ValueError("delete_folder cannot be True while compress_folder is False")
+
+        if file_format == "zstd" and compress_folder:
+            # Fail before downloading anything rather than when compressing.
+            import_zstandard()
+
+        # bool is an int, but html_pages=True is not a page size.
+        if html_pages is not None and html_pages != "month" and (
+                isinstance(html_pages, bool) or not isinstance(html_pages, int) or html_pages < 1):
+            raise ValueError("html_pages must be a positive number of messages or \"month\"")
+
+        for option in ("direct_archive", "incremental", "checkpoint", "message_shards", "stats",
+                       "progress_callback"):
+            if options.get(option):
+                raise ValueError(f"{option} is not supported by archive_room_async")
+
+        if self.file_cache:
+            raise ValueError("file_cache is not supported by archive_room_async")
+
+        self._archive_writer = None
+        self._journal = None
+        self._progress_callback = None
+        loop = asyncio.get_running_loop()
+
+        async with AsyncWebexClient(self.access_token, self.sdk.base_url, self.single_request_timeout,
+                                    max_connections, requests_per_second, HTTP_RETRIES,
+                                    HTTP_BACKOFF_FACTOR, HTTP_RETRY_STATUSES, self._http_retries) as client:
+            await self._gather_room_async(client, room_id)
+
+            # Prepare folder
+            self._setup_folder(download_attachments, download_avatars, html_format)
+            try:
+                downloads = await self._collect_room_async(
+                    _AsyncPipeline(client, asyncio.Semaphore(people_workers), asyncio.Semaphore(download_workers),
+                                   asyncio.Semaphore(download_workers), []),
+                    room_id, download_attachments, download_avatars)
+
+                # Transcripts render on a thread while the remaining files download.
+                transcripts = loop.run_in_executor(None, self._write_transcripts, reverse_order,
+                                                   download_attachments, download_avatars, text_format,
+                                                   html_format, json_format, timestamp_format, ndjson,
+                                                   html_pages, search_index)
+                try:
+                    await asyncio.gather(transcripts, *downloads)
+                except Exception:
+                    # A thread cannot be cancelled, the folder is torn down once it is done writing.
+                    await self._cancel_async_tasks(downloads)
+                    await asyncio.gather(transcripts, return_exceptions=True)
+                    raise
+
+                self._write_space_details()
+
+                if compress_folder:
+                    filename = await loop.run_in_executor(None, self._compress_folder, file_format,
+                                                          compress_workers)
+                else:
+                    filename = self.archive_folder_name
+            except Exception:
+                self._tear_down_folder()
+                raise
+
         if delete_folder:
             self._tear_down_folder()
 
         return filename
 
+    async def _gather_room_async(self, client, room_id: str) -> None:
+        """Gets the room and its creator."""
+
+        self._reset_room_information()
+
+        self.api_calls["rooms.get"] += 1
+        room = Room(await client.get_json(f"rooms/{room_id}"))
+
+        self.api_calls["people.get"] += 1
+        async with client.request("GET", f"people/{room.creatorId}") as response:
+            if response.status == 404:
+                room_creator = UserNotFound(
+                    id=room.creatorId,
+                    emails=["unknown"],
+                    displayName="Person Not Found",
+                    avatar=None,
+                )
+            else:
+                response.raise_for_status()
+                room_creator = Person(await response.json())
+
+        self._set_room(room, room_creator)
+
+    async def _collect_room_async(self, pipeline, room_id: str, download_attachments: bool,
+                                  download_avatars: bool) -> list:
+        """
+        Pages through the room's messages, looking up people and files as they show up.
+
+        Returns:
+            The download tasks still in flight.
+        """
+
+        import asyncio
+
+        params = {"roomId": room_id}
+        if self.room.type == "group" and not self.special_token:
+            self.api_calls["people.me"] += 1
+            if Person(await pipeline.client.get_json("people/me")).type == "bot":
+                params["mentionedPeople"] = "me"
+
+        # Structure: {"personId": asyncio.Task}, {"url": asyncio.Task}
+        person_tasks = {}
+        file_tasks = {}
+
+        self.messages = []
+        try:
+            async for items in pipeline.client.pages("messages", **params):
+                self.api_calls["messages.list"] += 1
+                for item in items:
+                    msg = MessageRecord(item)
+                    self.messages.append(msg)
+
+                    if msg.personId and msg.personId not in person_tasks:
+                        person_tasks[msg.personId] = asyncio.ensure_future(
+                            self._get_person_async(pipeline, msg.personId, msg.personEmail, download_avatars))
+
+                    for url in msg.files or []:
+                        if url not in file_tasks:
+                            file_tasks[url] = asyncio.ensure_future(
+                                self._file_details_async(pipeline, url, download_attachments))
+
+            logger.debug("Retrieved %d messages from room %s.", len(self.messages), room_id)
+
+            self.messages_with_threads = self.messages
+            self._organize_by_threads(self.messages)
+
+            # Awaited in the order they were first seen, to match archive_room.
+            for person_id, task in person_tasks.items():
+                self.people[person_id] = await task
+
+            for url, task in file_tasks.items():
+                self.attachments[url] = await task
+        except Exception:
+            await self._cancel_async_tasks(list(person_tasks.values()), list(file_tasks.values()),
+                                           pipeline.downloads)
+            raise
+
+        self._link_people(self.messages, download_avatars)
+        return pipeline.downloads
+
+    @staticmethod
+    async def _cancel_async_tasks(*task_lists) -> None:
+        """
+        Cancels the tasks of `task_lists` and waits until they are done, along with
+        the tasks they append to the lists in the meantime.
+        """
+
+        import asyncio
+
+        while True:
+            tasks = [task for tasks in task_lists for task in tasks if not task.done()]
+            if not tasks:
+                return
+
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _get_person_async(self, pipeline, person_id: str, person_email: str, download_avatar: bool):
+        """Retrieves a person and schedules the download of their avatar."""
+
+        import asyncio
+
+        async with pipeline.people_slots:
+            self.api_calls["people.get"] += 1
+            async with pipeline.client.request("GET", f"people/{person_id}") as response:
+                if response.status == 404:
+                    person = UserNotFound(
+                        id=str(person_id),
+                        emails=[str(person_email)],
+                        displayName="Person Not Found",
+                        avatar=None,
+                    )
+                elif response.status >= 400:
+                    logger.error("Failed to retrieve person %s: %d %s", person_id, response.status, response.reason)
+                    person = UserApiFailed(
+                        id=str(person_id),
+                        emails=[str(person_email)],
+                        displayName="User API Failed",
+                        avatar=None,
+                    )
+                else:
+                    person = Person(await response.json())
+
+        if download_avatar and person.avatar:
+            pipeline.downloads.append(asyncio.ensure_future(
+                self._download_file_async(pipeline, "avatars", person.avatar, person_id)))
+
+        return person
+
+    async def _file_details_async(self, pipeline, url: str, download: bool) -> File:
+        """Retrieves the file details and schedules the download of the file."""
+
+        import asyncio
+
+        async with pipeline.probe_slots:
+            self.api_calls["file_details"] += 1
+            headers = {
+                "Accept-Encoding": "",  # ensures content-length always gets returned
+            }
+            async with pipeline.client.request("HEAD", url, headers=headers, allow_redirects=False) as response:
+                file_metadata = self._file_from_headers(url, response.status, response.headers)
+
+        if download and not file_metadata.deleted:
+            pipeline.downloads.append(asyncio.ensure_future(
+                self._download_file_async(pipeline, "attachments", url, file_metadata.filename,
+                                          file_metadata.content_length)))
+
+        return file_metadata
+
+    async def _download_file_async(self, pipeline, folder_name: str, url: str, filename: str,
+                                   content_length="") -> None:
+        """
+        Download file from Webex Teams. The file is written on the default executor, so disk
+        writes do not block the event loop.
+
+        Raises:
+            IOError: The number of bytes downloaded does not match `content_length`, see Downloader.fetch.
+            aiohttp.ClientResponseError: The download failed.
+        """
+
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        expected = int(content_length) if isinstance(content_length, str) and content_length.isdigit() else None
+
+        async with pipeline.download_slots:
+            async with pipeline.client.request("GET", url) as response:
+                response.raise_for_status()
+
+                output = self._open_output(f"{folder_name}/{filename}", text=False)
+                fh = await loop.run_in_executor(None, output.__enter__)
+                try:
+                    written = 0
+                    async for chunk in response.content.iter_chunked(WRITE_BUFFER_SIZE):
+                        await loop.run_in_executor(None, fh.write, chunk)
+                        written += len(chunk)
+
+                    if expected is not None and written != expected:
+                        raise IOError(f"Downloaded {written} bytes of {url}, expected {expected}")
+                except BaseException as e:
+                    await loop.run_in_executor(None, output.__exit__, type(e), e, e.__traceback__)
+                    raise
+
+                await loop.run_in_executor(None, output.__exit__, None, None, None)
+
     def _archive(self, reverse_order: bool, download_attachments: bool,
                  download_avatars: bool, download_workers: int, text_format: bool,
-                 html_format: bool, json_format: bool, timestamp_format: str) -> None:
+                 html_format: bool, json_format: bool, timestamp_format: str, ndjson: bool = False,
+                 html_pages=None, search_index: bool = False, stats: bool = False) -> None:
         """
         Collects room messages and attachments using Webex Teams
         APIs and writes them to text/html files.
         """
 
+        self._write_transcripts(reverse_order, download_attachments, download_avatars, text_format, html_format,
+                                json_format, timestamp_format, ndjson, html_pages, search_index)
+
+        links = {}
+        if download_attachments:
+            links["attachments"] = self.attachments
+
+        if download_avatars:
+            links["avatars"] = self.avatars
+
+        with self.metrics.stage("downloads"):
+            self._download_files(links, download_workers)
+        logger.debug("Attachments and avatars download completed.")
+
+        self._write_space_details(stats)
+
+    def _write_transcripts(self, reverse_order: bool, download_attachments: bool, download_avatars: bool,
+                           text_format: bool, html_format: bool, json_format: bool, timestamp_format: str,
+                           ndjson: bool = False, html_pages=None, search_index: bool = False) -> None:
+        """Writes the text/html/json transcripts of the gathered room messages."""
+
         if reverse_order:
-            self.messages_with_threads = list(reversed(list(self.messages_with_threads)))
+            self.messages_with_threads = ReversedView(self.messages)
         else:
-            self.messages_with_threads = list(self.messages_with_threads)
-
-        if html_format:
-            self._create_html_transcript(self.messages_with_threads, self.attachments, self.people,
-                                         download_avatars, timestamp_format)
+            self.messages_with_threads = self.messages
+
+        if text_format or (html_format and not html_pages):
+            with self.metrics.stage("render_model"):
+                render_model = self._build_render_model(self.messages_with_threads, download_avatars,
+                                                        timestamp_format)
+
+        if html_format and html_pages:
+            with self.metrics.stage("html"):
+                self._create_html_pages(self.messages_with_threads, download_attachments, download_avatars,
+                                        timestamp_format, html_pages)
+            logger.debug("HTML pages completed.")
+        elif html_format:
+            with self.metrics.stage("html"):
+                self._create_html_transcript(render_model, timestamp_format)
             logger.debug("HTML transcript completed.")
 
         if text_format:
-            self._create_text_transcript(
-                self.messages_with_threads, self.attachments, self.people, timestamp_format)
+            with self.metrics.stage("text"):
+                self._create_text_transcript(render_model, timestamp_format)
             logger.debug("Text transcript completed.")
 
         if json_format:
-            self._create_json_transcript(self.messages)
+            with self.metrics.stage("json"):
+                self._create_json_transcript(self.messages, ndjson)
             logger.debug("JSON transcript completed.")
 
-        if download_attachments:
-            self._download_files(
-                "attachments", self.attachments, download_workers)
-            logger.debug("Attachments download completed.")
+        if search_index:
+            with self.metrics.stage("search_index"):
+                self._create_search_index()
+            logger.debug("Search index completed.")
 
-        if download_avatars:
-            self._download_files("avatars", self.avatars, download_workers)
-            logger.debug("Avatars download completed.")
+    def _write_space_details(self, stats: bool = False) -> None:
+        """Writes space information to json file, and with `stats` the metrics of the run so far."""
 
-        # Write space information to json file
-        with open(os.path.join(os.getcwd(), self.archive_folder_name, f"space_details.json"), "w", encoding="utf-8") as fh:
+        with self._open_output("space_details.json") as fh:
             space_details = {
                 "space": self.room.to_dict(),
                 "creator": self.room_creator._asdict() if isinstance(self.room_creator, UserNotFound)
                 else self.room_creator.to_dict(),
             }
+            if self.failed_downloads:
+                space_details["failed_downloads"] = self.failed_downloads
+            if stats:
+                space_details["stats"] = self.metrics.to_dict()
             json.dump(space_details, fh)
 
         logger.info("Room %s archived successfully.", self.room.id)
 
     def _setup_folder(self, download_attachments: bool,
                       download_avatars, html_format: bool) -> None:
-        """Creates a folder roomTitle_roomId to store archive."""
+        """
+        Creates a folder roomTitle_roomId to store archive. Direct archives have no folder,
+        so only the static HTML assets get added to the archive.
+        """
+
+        if self._archive_writer:
+            if html_format:
+                basepath = os.path.dirname(os.path.realpath(__file__))
+                for static_folder in (".css", ".js", ".fonts"):
+                    self._archive_writer.add(f"{basepath}/static/{static_folder}", static_folder)
+            return
 
-        os.makedirs(self.archive_folder_name)
+        # The folder already exists when resuming a checkpointed run.
+        os.makedirs(self.archive_folder_name, exist_ok=True)
 
         if download_attachments:
-            os.makedirs(f"{self.archive_folder_name}/attachments")
+            os.makedirs(f"{self.archive_folder_name}/attachments", exist_ok=True)
 
         if download_avatars:
-            os.makedirs(f"{self.archive_folder_name}/avatars")
+            os.makedirs(f"{self.archive_folder_name}/avatars", exist_ok=True)
 
         if html_format:
             basepath = os.path.dirname(os.path.realpath(__file__))
+            for static_folder in (".css", ".js", ".fonts"):
+                if os.path.isdir(f"{self.archive_folder_name}/{static_folder}"):
+                    shutil.rmtree(f"{self.archive_folder_name}/{static_folder}")
+                shutil.copytree(f"{basepath}/static/{static_folder}",
+                                f"{self.archive_folder_name}/{static_folder}")
+
+    @contextmanager
+    def _open_output(self, path: str, text: bool = True, size: int = None):
+        """
+        Opens `path` for writing inside the archive folder, or inside the archive itself for direct
+        archives. `size` is the expected size of the file if known, see ArchiveWriter.open.
+        """
 
-            shutil.copytree(f"{basepath}/static/.css",
-                            f"{self.archive_folder_name}/.css")
-            shutil.copytree(f"{basepath}/static/.js",
-                            f"{self.archive_folder_name}/.js")
-            shutil.copytree(f"{basepath}/static/.fonts",
-                            f"{self.archive_folder_name}/.fonts")
+        if self._archive_writer:
+            with self._archive_writer.open(path, text=text, size=size) as fh:
+                yield fh
+                self.metrics.add("bytes_written", fh.tell())
+        elif text:
+            with open(os.path.join(os.getcwd(), self.archive_folder_name, path), "w",
+                      encoding="utf-8", buffering=WRITE_BUFFER_SIZE) as fh:
+                yield fh
+                self.metrics.add("bytes_written", fh.tell())
+        else:
+            with open(os.path.join(os.getcwd(), self.archive_folder_name, path), "wb",
+                      buffering=WRITE_BUFFER_SIZE) as fh:
+                yield fh
+                self.metrics.add("bytes_written", fh.tell())
 
     def _tear_down_folder(self) -> None:
         """Deletes the roomTitle_roomId folder in case an exception was raised."""
@@ -257,8 +1009,75 @@ class WebexTeamsArchiver:
         if os.path.isdir(self.archive_folder_name):
             shutil.rmtree(self.archive_folder_name, ignore_errors=False)
 
-    def _gather_room_information(self, room_id: str, download_avatars: bool) -> None:
-        """Calls Webex Teams APIs to get room information and messages."""
+    def _gather_room_information(self, room_id: str, download_avatars: bool, download_workers: int,
+                                 people_workers: int, state: dict = None, checkpoint: bool = False,
+                                 message_shards: int = None) -> None:
+        """
+        Calls Webex Teams APIs to get room information and messages.
+
+        If `state` from a previous incremental run is given, only messages newer than the ones
+        it holds are fetched, and its people and attachments are reused instead of looked up again.
+        With `checkpoint`, progress is journaled in the archive folder, and the unfinished
+        checkpointed run of this room, if any, is resumed. With `message_shards`, messages are
+        paged in that many time windows concurrently.
+        """
+
+        self._reset_room_information()
+
+        with self.metrics.stage("room"):
+            room = self.sdk.rooms.get(room_id)
+
+            try:
+                room_creator = self.sdk.people.get(room.creatorId)
+            except ApiError as e:
+                if e.response.status_code == 404:
+                    room_creator = UserNotFound(
+                        id=room.creatorId,
+                        emails=["unknown"],
+                        displayName="Person Not Found",
+                        avatar=None,
+                    )
+                else:
+                    logger.error(e)
+                    raise
+
+        self._set_room(room, room_creator, CheckpointJournal.find(room_id) if checkpoint else None)
+
+        if state:
+            self._restore_state(state)
+            known_messages = self._load_state_messages(state)
+        else:
+            known_messages = []
+
+        with self.metrics.stage("messages"):
+            if checkpoint:
+                self._journal = CheckpointJournal(self.archive_folder_name, room_id)
+                self._restore_journal()
+                self.messages = self._list_messages_checkpointed(room_id, {m.id for m in known_messages})
+            elif message_shards and message_shards > 1:
+                self._journal = None
+                self.messages = self._list_messages_sharded(
+                    room_id, message_shards, {m.id for m in known_messages},
+                    known_messages[0].created if known_messages else None)
+            else:
+                self._journal = None
+                self.messages = self._list_messages(room_id, {m.id for m in known_messages})
+
+        if state:
+            logger.debug("Merged %d new messages into %d archived messages.",
+                         len(self.messages), len(known_messages))
+            self.messages += known_messages
+
+        self.messages_with_threads = self.messages
+        person_emails, urls = self._organize_by_threads(self.messages)
+        with self.metrics.stage("people"):
+            self._resolve_people(person_emails, people_workers)
+        with self.metrics.stage("file_details"):
+            self._probe_attachments(urls, download_workers)
+        self._link_people(self.messages, download_avatars)
+
+    def _reset_room_information(self) -> None:
+        """Clears the state of the previous run."""
 
         # Structure: {"personId": webexteamssdk.models.immutable.Person}
         self.people = {}
@@ -272,148 +1091,725 @@ class WebexTeamsArchiver:
         # Threads: {"parentId": [webexteamssdk.models.immutable.Message, ...]}
         self.threads = {}
 
-        self.room = self.sdk.rooms.get(room_id)
+        # Files downloaded by a previous incremental run: {"folder_name": {"url": "path"}}
+        self.previous_downloads = {}
+
+        # Downloads that failed in a checkpointed run: {"folder_name": {"url": "error"}}
+        self.failed_downloads = {}
+
+        # Stage timings and counters of this run.
+        self.metrics = RunMetrics(self._progress_callback, self._http_retries)
+
+        # API requests made during this run: {"endpoint": count}
+        self.api_calls = self.metrics.api_calls
+        _CountingSession.install(self.sdk)
+        _CountingSession.track(self.metrics)
+
+        # Queued, in flight and completed downloads of this run, once downloads start.
+        self.download_scheduler = None
+
+    def _set_room(self, room, room_creator, resume_folder: str = None) -> None:
+        """Sets the room being archived and reserves its archive folder name, or `resume_folder` if given."""
+
+        self.room = room
+        self.room_creator = room_creator
+
+        if resume_folder:
+            with self._reserved_folder_names_lock:
+                if resume_folder not in self._reserved_folder_names:
+                    self._reserved_folder_names.add(resume_folder)
+                    self.archive_folder_name = resume_folder
+                    return
 
         timestamp = datetime.datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
-        self.archive_folder_name = f"{sanitize_name(self.room.title)}_{timestamp}"
+        self.archive_folder_name = self._reserve_folder_name(f"{sanitize_name(self.room.title)}_{timestamp}")
+
+    def _reserve_folder_name(self, name: str) -> str:
+        """Returns `name`, with a numeric suffix if another run already uses it."""
+
+        with self._reserved_folder_names_lock:
+            candidate, suffix = name, 1
+            while candidate in self._reserved_folder_names or os.path.exists(candidate):
+                suffix += 1
+                candidate = f"{name}_{suffix}"
+
+            self._reserved_folder_names.add(candidate)
+            return candidate
+
+    def _release_folder_name(self) -> None:
+        """Lets a later run of this process reuse the archive folder, to resume an interrupted checkpointed run."""
+
+        with self._reserved_folder_names_lock:
+            self._reserved_folder_names.discard(self.archive_folder_name)
+
+    def _list_messages(self, room_id: str, known_ids: set = None) -> list:
+        """
+        Pages through the room's messages once and returns them as a list.
+
+        Every renderer works off this snapshot, so the messages endpoint is only
+        paginated a single time per run (`self.api_calls["messages.list"]` counts its pages).
+        Messages are returned newest first, so when `known_ids` is given, pagination
+        stops at the first message that was already archived. They are kept as
+        MessageRecords, which take far less memory than the SDK's Message objects.
+        """
+
+        pages = (MessageRecord(msg.to_dict()) for msg in self._message_pages(room_id))
+
+        if known_ids:
+            messages = []
+            for msg in pages:
+                if msg.id in known_ids:
+                    break
+                messages.append(msg)
+        else:
+            messages = list(pages)
+
+        logger.debug("Retrieved %d messages from room %s.", len(messages), room_id)
+        return messages
+
+    def _list_messages_checkpointed(self, room_id: str, known_ids: set) -> list:
+        """
+        Same as `_list_messages`, recording the messages in the checkpoint journal as they are
+        paginated. Pagination picks up after the last message the journal already holds.
+        """
+
+        journal = self._journal
+
+        messages = [MessageRecord(m) for m in journal.read_messages()]
+
+        if not journal.messages_complete:
+            if journal.last_message_id:
+                pages = self._message_pages(room_id, beforeMessage=journal.last_message_id)
+            else:
+                pages = self._message_pages(room_id)
+
+            page = []
+            for msg in pages:
+                if msg.id in known_ids:
+                    break
+
+                data = msg.to_dict()
+                messages.append(MessageRecord(data))
+                page.append(data)
+                if len(page) == CHECKPOINT_PAGE_SIZE:
+                    journal.add_messages(page)
+                    page = []
+
+            journal.add_messages(page, complete=True)
+
+        logger.debug("Retrieved %d messages from room %s.", len(messages), room_id)
+        return messages
+
+    def _list_messages_sharded(self, room_id: str, shards: int, known_ids: set = None, since=None) -> list:
+        """
+        Same as `_list_messages`, paging `shards` time windows of the room concurrently.
+
+        The time from the room's creation, or `since`, to its last activity is split into
+        equal windows, each paged newest first from its upper bound (`before`) down to its
+        first message older than the window. Concatenated newest first, the windows hold the
+        same messages in the same order as a single pagination: the newest window has no
+        upper bound, so messages posted since `lastActivity` are not missed, the oldest runs
+        to the start of the room, and a message the API returns in two windows is kept once.
+        """
+
+        bounds = self._shard_bounds(shards, since)
+        if not bounds:
+            return self._list_messages(room_id, known_ids)
+
+        params = self._message_params()
+
+        # Windows newest first: [(before, oldest), ...]
+        windows = list(zip([None] + bounds, bounds + [None]))
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(windows)) as executor:
+            pages = list(executor.map(
+                lambda window: self._list_message_window(room_id, params, known_ids or set(), *window), windows))
+
+        messages = []
+        seen_ids = set()
+        for window_messages, reached_known in pages:
+            for msg in window_messages:
+                if msg.id not in seen_ids:
+                    seen_ids.add(msg.id)
+                    messages.append(msg)
+
+            # Older windows only hold messages that were archived already.
+            if reached_known:
+                break
+
+        logger.debug("Retrieved %d messages from room %s in %d windows.", len(messages), room_id, len(windows))
+        return messages
+
+    def _list_message_window(self, room_id: str, params: dict, known_ids: set, before: str, oldest: str) -> tuple:
+        """
+        Pages the messages sent before `before` and no earlier than `oldest`, newest first.
+
+        Returns:
+            The messages, and whether paging stopped at a message in `known_ids`.
+        """
+
+        _CountingSession.track(self.metrics)
+
+        messages = []
+        for msg in self.sdk.messages.list(room_id, before=before, **params):
+            data = msg.to_dict()
+            if data.get("id") in known_ids:
+                return messages, True
+            if oldest and data.get("created", "") < oldest:
+                break
+            messages.append(MessageRecord(data))
+
+        return messages, False
+
+    def _shard_bounds(self, shards: int, since=None) -> list:
+        """
+        Splits the room's lifetime, or the time since `since`, into `shards` windows.
+
+        Returns:
+            The boundaries between windows, newest first, in the API's datetime format.
+            Empty when the room's creation or last activity is unknown.
+        """
+
+        start = since or self.room.created
+        end = self.room.lastActivity
+        if not start or not end or end <= start:
+            return []
+
+        step = (end - start) / shards
+        bounds = [start + step * index for index in range(shards - 1, 0, -1)]
+        return [f"{bound:%Y-%m-%dT%H:%M:%S}.{bound.microsecond // 1000:03}Z" for bound in bounds]
+
+    def _message_params(self) -> dict:
+        """Returns the messages.list parameters: bots can only list the messages they are mentioned in."""
+
+        if self.room.type == "group" and not self.special_token:
+            if self.sdk.people.me().type == "bot":
+                return {"mentionedPeople": "me"}
+
+        return {}
+
+    def _message_pages(self, room_id: str, **params):
+        """Returns the SDK generator paginating the room's messages, newest first."""
+
+        params.update(self._message_params())
+        return self.sdk.messages.list(room_id, **params)
+
+    def _organize_by_threads(self, messages: list) -> tuple:
+        """
+        Extracts threaded messages from all messages.
+
+        Returns:
+            {"personId": "personEmail"} of the message authors and the list of unique file URLs.
+        """
+
+        # Structure: {"personId": "personEmail of the first message seen"}
+        person_emails = {}
+
+        # Unique file URLs in the order they were first seen: {"url": None}
+        urls = {}
+
+        # Messages are newest first, threads list their replies oldest first.
+        for msg in reversed(messages):
+            if getattr(msg, "parentId", None):
+                if msg.parentId in self.threads:
+                    self.threads[msg.parentId].append(msg)
+                else:
+                    self.threads[msg.parentId] = [msg]
+
+        for msg in messages:
+            if msg.personId and msg.personId not in person_emails:
+                person_emails[msg.personId] = msg.personEmail
+
+            if msg.files:
+                for url in msg.files:
+                    urls[url] = None
+
+        return person_emails, list(urls)
+
+    def _link_people(self, messages: list, download_avatars: bool) -> None:
+        """Fills in missing message e-mails from the resolved people and lists their avatars."""
+
+        for msg in messages:
+            if msg.personId and not msg.personEmail:
+                person = self.people[msg.personId]
+                if isinstance(person, Person) and isinstance(person.emails, list) and len(person.emails) > 0:
+                    msg.personEmail = person.emails[0]
+
+        if download_avatars:
+            for person_id, person in self.people.items():
+                if person.avatar:
+                    self.avatars[person.avatar] = File("", "", "", person_id, False)
+
+    def _resolve_people(self, person_emails: dict, workers: int) -> None:
+        """
+        Looks up every person in `person_emails` concurrently and stores them in `self.people`.
+
+        Args:
+            person_emails: {"personId": "personEmail"} of the people to look up.
+            workers: Number of concurrent people API calls.
+        """
+
+        person_ids = [person_id for person_id in person_emails if person_id not in self.people]
+
+        # Lookups made or being made by other rooms are waited for instead of repeated.
+        # Structure: {"personId": Future}
+        other_rooms = {}
+        lookups = {}
+        if self._people_cache is not None:
+            with self._people_cache_lock:
+                for person_id in person_ids:
+                    if person_id in self._people_cache:
+                        other_rooms[person_id] = self._people_cache[person_id]
+                    else:
+                        lookups[person_id] = self._people_cache[person_id] = concurrent.futures.Future()
+
+            person_ids = list(lookups)
+
+        try:
+            self._look_up_people(person_ids, person_emails, workers, lookups)
+        except Exception as e:
+            # The rooms waiting for these lookups fail the same way, the next ones try again.
+            for person_id, future in lookups.items():
+                if not future.done():
+                    with self._people_cache_lock:
+                        del self._people_cache[person_id]
+                    future.set_exception(e)
+            raise
+
+        for person_id, future in other_rooms.items():
+            self.people[person_id] = future.result()
+
+    def _look_up_people(self, person_ids: list, person_emails: dict, workers: int, lookups: dict) -> None:
+        """Retrieves `person_ids` from the API, resolving their `lookups` futures for the other rooms."""
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            people = executor.map(
+                self._get_person, person_ids, [person_emails[person_id] for person_id in person_ids])
+
+            for person_id, person in zip(person_ids, people):
+                self.people[person_id] = person
+
+                if person_id in lookups:
+                    if isinstance(person, UserApiFailed):
+                        # Left for the next room to try again.
+                        with self._people_cache_lock:
+                            del self._people_cache[person_id]
+                    lookups[person_id].set_result(person)
 
+                if self._journal and isinstance(person, Person):
+                    self._journal.add_person(person_id, "person", person.to_dict())
+                elif self._journal and isinstance(person, UserNotFound):
+                    self._journal.add_person(person_id, "not_found", person._asdict())
+
+        if self._journal:
+            self._journal.flush()
+
+    def _probe_attachments(self, urls: list, workers: int) -> None:
+        """
+        Retrieves the file details of every URL concurrently and stores them in `self.attachments`.
+
+        Args:
+            urls: Unique file URLs, in the order they should appear in `self.attachments`.
+            workers: Number of concurrent HEAD requests.
+        """
+
+        urls = [url for url in urls if url not in self.attachments]
+        self.api_calls["file_details"] += len(urls)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            for url, file_metadata in zip(urls, executor.map(self.file_details, urls)):
+                self.attachments[url] = file_metadata
+
+                if self._journal:
+                    self._journal.add_attachment(url, file_metadata._asdict())
+
+        if self._journal:
+            self._journal.flush()
+
+    def _get_person(self, person_id: str, person_email: str):
+        """Retrieves a person, falling back to UserNotFound/UserApiFailed if the API call fails."""
+
+        _CountingSession.track(self.metrics)
         try:
-            self.room_creator = self.sdk.people.get(self.room.creatorId)
+            return self.sdk.people.get(person_id)
         except ApiError as e:
             if e.response.status_code == 404:
-                self.room_creator = UserNotFound(
-                    id=self.room.creatorId,
-                    emails=["unknown"],
+                return UserNotFound(
+                    id=str(person_id),
+                    emails=[str(person_email)],
                     displayName="Person Not Found",
                     avatar=None,
                 )
             else:
                 logger.error(e)
-                raise
+                return UserApiFailed(
+                    id=str(person_id),
+                    emails=[str(person_email)],
+                    displayName="User API Failed",
+                    avatar=None,
+                )
 
-        if self.room.type == "group" and self.sdk.people.me().type == "bot" and not self.special_token:
-            self.messages = self.sdk.messages.list(
-                room_id, mentionedPeople="me")
-        else:
-            self.messages = self.sdk.messages.list(room_id)
+    def _load_state(self, state_file: str, room_id: str) -> dict:
+        """Reads the incremental state file, returning None if there is none yet."""
 
-        self.messages_with_threads = self.messages
-        self._organize_by_threads(self.messages, download_avatars)
+        if not os.path.isfile(state_file):
+            logger.info("No incremental state found at %s, archiving the whole room.", state_file)
+            return None
 
-    def _organize_by_threads(self, messages: GeneratorContainer, download_avatars: bool) -> None:
-        """Extracts threaded messages from all messages."""
+        with open(state_file, "r", encoding="utf-8") as fh:
+            state = json.load(fh)
 
-        for index, msg in enumerate(messages):
-            if hasattr(msg, "parentId"):
-                if msg.parentId in self.threads:
-                    self.threads[msg.parentId].insert(0, msg)
-                else:
-                    self.threads[msg.parentId] = [msg]
+        if state["room_id"] != room_id:
+            raise ValueError(f"State file {state_file} belongs to room {state['room_id']}, not {room_id}")
 
-            if msg.personId and msg.personId not in self.people:
-                try:
-                    self.people[msg.personId] = self.sdk.people.get(
-                        msg.personId)
-
-                    if not msg.personEmail:
-                        if isinstance(self.people[msg.personId], Person) and \
-                            isinstance(self.people[msg.personId].emails, list) and \
-                                len(self.people[msg.personId].emails) > 0:
-
-                            msg.personEmail = self.people[msg.personId].emails[0]
-
-                except ApiError as e:
-                    if e.response.status_code == 404:
-                        self.people[msg.personId] = UserNotFound(
-                            id=str(msg.personId),
-                            emails=[str(msg.personEmail)],
-                            displayName="Person Not Found",
-                            avatar=None,
-                        )
-                    else:
-                        logger.error(e)
-                        self.people[msg.personId] = UserApiFailed(
-                            id=str(msg.personId),
-                            emails=[str(msg.personEmail)],
-                            displayName="User API Failed",
-                            avatar=None,
-                        )
-
-                if download_avatars and self.people[msg.personId].avatar:
-                    self.avatars[self.people[msg.personId].avatar] = File(
-                        "", "", "", msg.personId, False)
+        return state
 
-            if msg.files:
-                for url in msg.files:
-                    file_metadata = self.file_details(url)
-                    self.attachments[url] = file_metadata
+    def _load_state_messages(self, state: dict) -> list:
+        """Reads the messages archived by previous incremental runs, newest first."""
+
+        # State files written before the messages file held the messages themselves.
+        if "messages" in state:
+            return [MessageRecord(m) for m in state["messages"]]
+
+        messages = []
+        remaining = state["messages_bytes"]
+        with open(state["messages_file"], "rb") as fh:
+            # Lines past messages_bytes were appended by a run that failed before saving its state.
+            for line in fh:
+                if remaining <= 0:
+                    break
+                remaining -= len(line)
+                messages.append(MessageRecord(json.loads(line)))
+
+        messages.reverse()
+        return messages
+
+    def _restore_state(self, state: dict) -> None:
+        """Loads the people, attachments and downloads recorded by a previous incremental run."""
+
+        for person_id, person in state["people"].items():
+            self.people[person_id] = Person(person)
+
+        for person_id, person in state["people_not_found"].items():
+            self.people[person_id] = UserNotFound(**person)
+
+        for url, file_metadata in state["attachments"].items():
+            self.attachments[url] = File(**file_metadata)
+
+        archive_folder = state["archive_folder"]
+        if archive_folder and os.path.isdir(archive_folder):
+            for folder_name, downloads in state["downloads"].items():
+                self.previous_downloads[folder_name] = {
+                    url: os.path.join(archive_folder, folder_name, filename) for url, filename in downloads.items()
+                }
+
+    def _restore_journal(self) -> None:
+        """Loads the people and attachments recorded by the interrupted checkpointed run."""
+
+        for person_id, entry in self._journal.people.items():
+            if "person" in entry:
+                self.people[person_id] = Person(entry["person"])
+            else:
+                self.people[person_id] = UserNotFound(**entry["not_found"])
+
+        for url, file_metadata in self._journal.attachments.items():
+            self.attachments[url] = File(**file_metadata)
+
+    def _save_state(self, state_file: str, previous_state: dict, download_attachments: bool,
+                    download_avatars: bool, keep_folder: bool) -> None:
+        """
+        Writes the incremental state file used by the next incremental run.
+
+        Messages go to a separate messages file, oldest first, one JSON message per line.
+        Each run only appends the messages it fetched, and the state file records how many
+        bytes of it are valid, so it stays small however large the room gets.
+        """
+
+        if previous_state and "messages_file" in previous_state:
+            messages_file = previous_state["messages_file"]
+            offset = previous_state["messages_bytes"]
+            new_messages = self.messages[:len(self.messages) - previous_state["message_count"]]
+        else:
+            messages_file = f"{os.path.splitext(state_file)[0]}.messages.ndjson"
+            offset = 0
+            new_messages = self.messages
+
+        with open(messages_file, "r+b" if offset else "wb") as fh:
+            fh.seek(offset)
+            fh.truncate()
+            for msg in reversed(new_messages):
+                fh.write(json.dumps(msg.to_dict()).encode("utf-8") + b"\n")
+            messages_bytes = fh.tell()
+            fh.flush()
+            os.fsync(fh.fileno())
+
+        downloads = {}
+        if download_attachments:
+            downloads["attachments"] = {
+                url: f.filename for url, f in self.attachments.items() if not f.deleted
+            }
+
+        if download_avatars:
+            downloads["avatars"] = {url: f.filename for url, f in self.avatars.items()}
+
+        # UserApiFailed is left out on purpose so those people get looked up again next time.
+        state = {
+            "room_id": self.room.id,
+            "archive_folder": os.path.abspath(self.archive_folder_name) if keep_folder else None,
+            "messages_file": messages_file,
+            "messages_bytes": messages_bytes,
+            "message_count": len(self.messages),
+            "people": {
+                person_id: person.to_dict() for person_id, person in self.people.items() if isinstance(person, Person)
+            },
+            "people_not_found": {
+                person_id: person._asdict() for person_id, person in self.people.items()
+                if isinstance(person, UserNotFound)
+            },
+            "attachments": {url: f._asdict() for url, f in self.attachments.items()},
+            "downloads": downloads,
+        }
+
+        with open(f"{state_file}.tmp", "w", encoding="utf-8") as fh:
+            json.dump(state, fh)
+        os.replace(f"{state_file}.tmp", state_file)
+
+    def _build_render_model(self, messages: list, download_avatars: bool, timestamp_format: str) -> list:
+        """
+        Resolves everything the transcript templates need in a single pass over the messages.
 
-        return
+        Returns:
+            RenderMessage for every message that is not a reply, in the order of `messages`.
+        """
 
-    def _create_text_transcript(self, messages: list, attachments: dict, people: dict,
-                                timestamp_format: str) -> None:
+        # Structure: {"personId": (displayName, fallback e-mail, avatar src)}
+        authors = {}
+        for person_id, person in self.people.items():
+            if not person.avatar:
+                avatar = None
+            elif download_avatars:
+                avatar = f"./avatars/{person_id}"
+            else:
+                avatar = person.avatar
+
+            authors[person_id] = (person.displayName, person.emails[0] if person.emails else "unknown", avatar)
+
+        unknown_author = ("Person Not Found", "unknown", None)
+
+        def render_message(msg, replies):
+            display_name, email, avatar = authors.get(msg.personId, unknown_author)
+            return RenderMessage(
+                id=msg.id,
+                created=datetime_format(msg.created, timestamp_format),
+                text=msg.text,
+                html=msg.html,
+                display_name=display_name,
+                email=msg.personEmail or email,
+                avatar=avatar,
+                files=[self.attachments[url] for url in msg.files] if msg.files else [],
+                replies=replies,
+            )
+
+        return [
+            render_message(msg, [render_message(reply, []) for reply in self.threads.get(msg.id, [])])
+            for msg in messages if not getattr(msg, "parentId", None)
+        ]
+
+    def _create_text_transcript(self, messages: list, timestamp_format: str) -> None:
         """Writes room messages to a text file."""
 
-        template = jinja_env.get_template("default.txt")
-        text_transcript = template.render(
+        template = jinja_env().get_template("default.txt")
+        text_transcript = template.stream(
             room=self.room,
             room_creator=self.room_creator,
             messages=messages,
-            attachments=attachments,
-            people=people,
             timestamp_format=timestamp_format,
-            threads=self.threads
         )
 
-        with open(os.path.join(os.getcwd(), self.archive_folder_name, f"{self.archive_folder_name}.txt"), "w", encoding="utf-8") as fh:
-            fh.write(text_transcript)
+        text_transcript.enable_buffering(RENDER_BUFFER_ITEMS)
 
-    def _create_json_transcript(self, messages: GeneratorContainer) -> None:
-        """Writes room messages to a JSON file."""
+        with self._open_output(f"{self.archive_folder_name}.txt") as fh:
+            text_transcript.dump(fh)
 
-        data = {
-            "items": [m.to_dict() for m in messages]
-        }
-        with open(os.path.join(os.getcwd(), self.archive_folder_name, f"{self.archive_folder_name}.json"), "w", encoding="utf-8") as fh:
-            json.dump(data, fh)
-
-    def _create_html_transcript(self, messages: list, attachments: dict, people: dict,
-                                download_avatars: dict, timestamp_format: str) -> None:
-        """Writes room messages to an HTML file."""
+    def _create_json_transcript(self, messages: list, ndjson: bool = False) -> None:
+        """
+        Writes room messages to a JSON file one message at a time, so no second copy of
+        the room is built in memory. With `ndjson`, writes one message per line instead.
+        """
 
-        template = jinja_env.get_template("default.html")
-        html = template.render(
+        if ndjson:
+            with self._open_output(f"{self.archive_folder_name}.ndjson") as fh:
+                for msg in messages:
+                    fh.write(json.dumps(msg.to_dict()))
+                    fh.write("\n")
+            return
+
+        # Same output as json.dump({"items": [...]}, fh).
+        with self._open_output(f"{self.archive_folder_name}.json") as fh:
+            fh.write('{"items": [')
+            for index, msg in enumerate(messages):
+                if index:
+                    fh.write(", ")
+                fh.write(json.dumps(msg.to_dict()))
+            fh.write("]}")
+
+    def _create_search_index(self) -> None:
+        """Writes the room's messages, people and attachments to a SQLite full-text index."""
+
+        filename = f"{self.archive_folder_name}.sqlite"
+
+        if self._archive_writer:
+            # SQLite needs a real file, build it aside and add it to the archive once complete.
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                with SearchIndex(os.path.join(tmp_dir, filename)) as index:
+                    index.add_room(self.messages, self.people, self.attachments)
+                self._copy_to_output(os.path.join(tmp_dir, filename), filename)
+            return
+
+        path = os.path.join(self.archive_folder_name, filename)
+        if os.path.isfile(path):
+            # Left behind by an interrupted checkpointed run.
+            os.remove(path)
+
+        with SearchIndex(path) as index:
+            index.add_room(self.messages, self.people, self.attachments)
+
+        self.metrics.add("bytes_written", os.path.getsize(path))
+
+    def _create_html_transcript(self, messages: list, timestamp_format: str, filename: str = None,
+                                navigation: dict = None) -> None:
+        """Writes room messages to an HTML file, roomTitle.html unless `filename` is given."""
+
+        template = jinja_env().get_template("default.html")
+        html = template.stream(
             room=self.room,
             room_creator=self.room_creator,
             messages=messages,
-            attachments=attachments,
-            people=people,
-            download_avatars=download_avatars,
             timestamp_format=timestamp_format,
-            threads=self.threads
+            navigation=navigation,
         )
 
-        with open(os.path.join(os.getcwd(), self.archive_folder_name, f"{self.archive_folder_name}.html"), "w", encoding="utf-8") as fh:
-            fh.write(html)
+        html.enable_buffering(RENDER_BUFFER_ITEMS)
 
-    def _download_files(self, folder_name: str, links: dict, workers: int) -> None:
-        """Downloads files given a list of URL links."""
+        with self._open_output(filename or f"{self.archive_folder_name}.html") as fh:
+            html.dump(fh)
 
-        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
-            result = {
-                executor.submit(self._download_file, folder_name, url, links[url].filename): url for url in links if not links[url].deleted
+    def _create_html_pages(self, messages: list, download_attachments: bool, download_avatars: bool,
+                           timestamp_format: str, html_pages) -> None:
+        """
+        Writes room messages to HTML pages of `html_pages` messages each, or one page per month
+        for "month". Replies stay on the page of the message they reply to, and roomTitle.html
+        becomes an index page linking to every page and, if they are downloaded, to its first images.
+        """
+
+        pages = self._paginate(messages, html_pages)
+        filenames = [f"{self.archive_folder_name}_{label}.html" for label, _ in pages]
+        index = []
+
+        for number, (label, page_messages) in enumerate(pages):
+            title = label if html_pages == "month" else f"Page {label}"
+            navigation = {
+                "index": f"{self.archive_folder_name}.html",
+                "title": title,
+                "previous": filenames[number - 1] if number > 0 else None,
+                "next": filenames[number + 1] if number + 1 < len(pages) else None,
             }
 
-            # Do this to check if any downloads failed.
-            for future in concurrent.futures.as_completed(result):
+            render_model = self._build_render_model(page_messages, download_avatars, timestamp_format)
+            self._create_html_transcript(render_model, timestamp_format, filenames[number], navigation)
+
+            images = (
+                f for msg in render_model for m in [msg, *msg.replies] for f in m.files
+                if not f.deleted and f.content_type.startswith("image/")
+            ) if download_attachments else ()
+            index.append(HtmlPage(filenames[number], title, len(page_messages), render_model[0].created,
+                                  render_model[-1].created, list(itertools.islice(images, INDEX_IMAGES))))
+
+        template = jinja_env().get_template("index.html")
+        html = template.stream(
+            room=self.room,
+            room_creator=self.room_creator,
+            pages=index,
+            timestamp_format=timestamp_format,
+        )
+
+        with self._open_output(f"{self.archive_folder_name}.html") as fh:
+            html.dump(fh)
+
+    @staticmethod
+    def _paginate(messages: list, html_pages) -> list:
+        """
+        Splits the messages that are not replies into pages.
+
+        Returns:
+            [("label", [Message, ...])], labeled with the page number, or the month for "month".
+        """
+
+        roots = [msg for msg in messages if not getattr(msg, "parentId", None)]
+
+        if html_pages == "month":
+            # Structure: {"YYYY-MM": [Message, ...]}, in the order of `messages`
+            months = {}
+            for msg in roots:
+                months.setdefault(msg.created.strftime("%Y-%m"), []).append(msg)
+            return list(months.items())
+
+        return [(str(number + 1), roots[start:start + html_pages])
+                for number, start in enumerate(range(0, len(roots), html_pages))]
+
+    def _download_files(self, links: dict, workers: int) -> None:
+        """
+        Downloads files given their URL links, largest first.
+
+        Args:
+            links: {"folder_name": {"url": File}} of the files to download.
+            workers: Number of files downloaded at the same time.
+        """
+
+        jobs, serial_jobs = [], []
+        for folder_name, files in links.items():
+            # Files the interrupted checkpointed run already downloaded.
+            done = self._journal.downloads.get(folder_name, {}) if self._journal else {}
+
+            for url, f in files.items():
+                if not f.deleted and url not in done:
+                    size = int(f.content_length) if str(f.content_length).isdigit() else 0
+                    job = (size, (folder_name, url, f.filename, f.content_length))
+
+                    # Files written straight into the archive hold it until they are done,
+                    # download them one at a time once the others are in.
+                    if self._archive_writer and not self.file_cache and self._archive_writer.streams(size):
+                        serial_jobs.append(job)
+                    else:
+                        jobs.append(job)
+
+        self.download_scheduler = self.metrics.download_scheduler = DownloadScheduler(workers)
+        for (folder_name, url, filename, _), future in self.download_scheduler.run(jobs, self._download_file,
+                                                                                  serial_jobs):
+            self.metrics.progress()
+
+            if not self._journal:
+                # Do this to check if any downloads failed.
                 future.result()
+                continue
 
-    def _download_file(self, folder_name: str, url: str, filename: str) -> None:
-        """Download file from Webex Teams."""
+            try:
+                future.result()
+            except Exception as e:
+                logger.error("Failed to download %s: %s", url, e)
+                self.failed_downloads.setdefault(folder_name, {})[url] = str(e)
 
-        headers = {
-            "Authorization": f"Bearer {self.access_token}"
-        }
+                partial = os.path.join(self.archive_folder_name, folder_name, filename)
+                if os.path.isfile(partial):
+                    os.remove(partial)
+            else:
+                self._journal.add_download(folder_name, url, filename)
+
+        if self._journal:
+            self._journal.flush()
+
+    def _download_file(self, folder_name: str, url: str, filename: str, content_length="") -> None:
+        """Download file from Webex Teams, unless the previous incremental archive or the file cache has it."""
 
         # https://stackoverflow.com/questions/16694907/how-to-download-
         # large-file-in-python-with-requests-py
@@ -422,11 +1818,53 @@ class WebexTeamsArchiver:
         #     with open(os.path.join(os.getcwd(), self.archive_folder_name, folder_name, f"{filename}"), "wb") as f:
         #         shutil.copyfileobj(r.raw, f)
 
-        r = requests.get(url, headers=headers, stream=True)
-        with open(os.path.join(os.getcwd(), self.archive_folder_name, folder_name, f"{filename}"), "wb") as f:
-            for chunk in r.iter_content(chunk_size=1024):
-                f.write(chunk)
+        path = f"{folder_name}/{filename}"
+
+        # Reuse the copy from the previous incremental archive, if it is still around.
+        previous = self.previous_downloads.get(folder_name, {}).get(url)
+        if previous and os.path.isfile(previous):
+            self._copy_to_output(previous, path)
+            self.metrics.add("files_reused")
+            return
+
+        if not self.file_cache:
+            size = int(content_length) if isinstance(content_length, str) and content_length.isdigit() else None
+            with self._open_output(path, text=False, size=size) as f:
+                self.metrics.add("bytes_downloaded", self._downloader.fetch(url, f, content_length))
+            self.metrics.add("files_downloaded")
+            return
+
+        # Pinned, so another room or thread cannot evict the file before it is copied.
+        key = FileCache.key(url, content_length)
+        with self.file_cache.pinned(key) as cached:
+            if cached:
+                try:
+                    self._copy_to_output(cached, path)
+                    self.metrics.add("files_reused")
+                    return
+                except FileNotFoundError:
+                    logger.debug("%s left the file cache, downloading it again.", url)
+
+            with self.file_cache.writer(key) as f:
+                self.metrics.add("bytes_downloaded", self._downloader.fetch(url, f, content_length))
+            self.metrics.add("files_downloaded")
+            self._copy_to_output(self.file_cache.path(key), path)
+
+    def _copy_to_output(self, src: str, path: str) -> None:
+        """Puts the file `src` at `path` in the archive, hardlinking it when possible."""
+
+        self.metrics.add("bytes_written", os.path.getsize(src))
+
+        if self._archive_writer:
+            self._archive_writer.add(src, path)
+            return
+
+        dst = os.path.join(os.getcwd(), self.archive_folder_name, path)
+        try:
+            os.link(src, dst)
+        except OSError:
+            shutil.copyfile(src, dst)
 
-    def _compress_folder(self, file_format: str) -> str:
+    def _compress_folder(self, file_format: str, workers: int = None) -> str:
         """Compress `archive_folder_name` folder with the format defined by file_format param"""
-        return shutil.make_archive(self.archive_folder_name, file_format, self.archive_folder_name)
+        return compress_archive_folder(self.archive_folder_name, file_format, workers)